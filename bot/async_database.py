@@ -0,0 +1,91 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from bot.config import Config
+
+# Storage backend selected by DB_BACKEND; both modules expose the same functions
+if Config.DB_BACKEND == "sqlite":
+    from bot import sqlite_backend as database
+else:
+    from bot import database
+
+# One worker per pooled connection, so a query never waits on the pool itself
+_executor = ThreadPoolExecutor(max_workers=Config.DB_POOL_MAX, thread_name_prefix="db")
+
+async def run_db(func, *args, timeout=None, **kwargs):
+    """Run a blocking database function on the database executor
+
+    The event loop only ever awaits here. If no connection can be obtained
+    the call is retried with exponential backoff on asyncio.sleep, so a slow
+    or restarting database never stalls the gateway heartbeat.
+
+    Args:
+        func (callable): Synchronous function from the storage backend
+        timeout (float, optional): Seconds to wait per attempt. Defaults to Config.DB_QUERY_TIMEOUT.
+
+    Returns:
+        Whatever func returns
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(func, *args, **kwargs)
+    timeout = timeout if timeout is not None else Config.DB_QUERY_TIMEOUT
+    delay = Config.DB_RETRY_BASE_DELAY
+
+    for attempt in range(1, Config.DB_MAX_RETRIES + 1):
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(_executor, call), timeout)
+        except database.DatabaseUnavailable as e:
+            # Nothing reached the server, so retrying cannot double-apply a write
+            if attempt == Config.DB_MAX_RETRIES:
+                print(f"Database unavailable after {attempt} attempts: {e}")
+                raise
+            print(f"Database unavailable, retrying in {delay:.1f} seconds... ({attempt}/{Config.DB_MAX_RETRIES})")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, Config.DB_RETRY_MAX_DELAY)
+
+def _awaitable(func, timeout=None):
+    """Wrap a bot.database function so it can be awaited from a cog"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_db(func, *args, timeout=timeout, **kwargs)
+    return wrapper
+
+def shutdown():
+    """Close the connection pool and stop the executor"""
+    _executor.shutdown(wait=True)
+    database.close_pool()
+
+# Same names as bot.database, but awaitable
+init_db = _awaitable(database.init_db)
+run_migrations = _awaitable(database.run_migrations, timeout=Config.DB_MIGRATION_TIMEOUT)
+check_hot_query_indexes = _awaitable(database.check_hot_query_indexes)
+get_user_balance = _awaitable(database.get_user_balance)
+add_coins = _awaitable(database.add_coins)
+deduct_coins = _awaitable(database.deduct_coins)
+apply_balance_deltas = _awaitable(database.apply_balance_deltas)
+transfer_coins = _awaitable(database.transfer_coins)
+settle_bet = _awaitable(database.settle_bet)
+claim_daily = _awaitable(database.claim_daily)
+update_daily_cooldown = _awaitable(database.update_daily_cooldown)
+get_daily_cooldown = _awaitable(database.get_daily_cooldown)
+save_rate_limit_snapshot = _awaitable(database.save_rate_limit_snapshot)
+load_rate_limit_snapshot = _awaitable(database.load_rate_limit_snapshot)
+add_to_conversation = _awaitable(database.add_to_conversation)
+add_conversation_batch = _awaitable(database.add_conversation_batch)
+get_conversation_history = _awaitable(database.get_conversation_history)
+clear_conversation_history = _awaitable(database.clear_conversation_history)
+save_blackjack_game = _awaitable(database.save_blackjack_game)
+get_blackjack_game = _awaitable(database.get_blackjack_game)
+delete_blackjack_game = _awaitable(database.delete_blackjack_game)
+get_leaderboard = _awaitable(database.get_leaderboard)
+get_balances = _awaitable(database.get_balances)
+get_all_balances = _awaitable(database.get_all_balances)
+get_user_stats = _awaitable(database.get_user_stats)
+init_audio_tts_table = _awaitable(database.init_audio_tts_table)
+store_audio_tts = _awaitable(database.store_audio_tts)
+get_latest_audio_tts = _awaitable(database.get_latest_audio_tts)
+get_audio_tts_by_id = _awaitable(database.get_audio_tts_by_id)
+cleanup_old_audio_tts = _awaitable(database.cleanup_old_audio_tts)
+referenced_audio_tts_hashes = _awaitable(database.referenced_audio_tts_hashes)
+delete_audio_tts_by_hash = _awaitable(database.delete_audio_tts_by_hash)
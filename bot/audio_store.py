@@ -0,0 +1,128 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+from bot.config import Config
+
+class AudioStore:
+    """Content-addressed store for generated audio clips on local disk
+
+    Each clip is saved once under the SHA-256 of its bytes, so the same text
+    spoken twice shares one file. Files are written to a temporary name and
+    renamed into place, so readers never see a partial clip. The database
+    only keeps a metadata row pointing at the hash.
+
+    Recency is the file's modification time, which is bumped whenever a clip
+    is used; when the store grows past `max_bytes` the least recently used
+    clips are removed first.
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = root or Config.AUDIO_STORE_DIR
+        self.max_bytes = max_bytes or Config.AUDIO_STORE_MAX_BYTES
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        self.total_bytes = 0  # Set by load()
+
+    def load(self):
+        """Measure the clips already on disk
+
+        Walks the whole store, so run it off the event loop.
+        """
+        total = sum(size for _, _, size in self._scan())
+        with self._lock:
+            self.total_bytes = total
+
+    def path(self, digest):
+        """Where a clip with this hash lives (two-level fan-out keeps directories small)"""
+        return os.path.join(self.root, digest[:2], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def put(self, data):
+        """Save a clip, returning its hash; saving the same bytes again is free
+
+        Returns:
+            str: Hex SHA-256 of the clip
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        target = self.path(digest)
+        if os.path.exists(target):
+            self.touch(digest)
+            return digest
+
+        directory = os.path.dirname(target)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, target)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            self.total_bytes += len(data)
+        return digest
+
+    def touch(self, digest):
+        """Mark a clip as recently used"""
+        try:
+            os.utime(self.path(digest))
+        except FileNotFoundError:
+            pass
+
+    def remove(self, digest):
+        """Delete a clip; does nothing if it is already gone"""
+        target = self.path(digest)
+        try:
+            size = os.path.getsize(target)
+            os.remove(target)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self.total_bytes -= size
+
+    def _scan(self):
+        """(mtime, digest, size) for every clip on disk"""
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.startswith(".tmp-"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(directory, name))
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, name, stat.st_size
+
+    def evict(self, max_bytes=None):
+        """Remove the least recently used clips until the store fits
+
+        Returns:
+            list: Hashes of the removed clips
+        """
+        limit = max_bytes if max_bytes is not None else self.max_bytes
+        clips = sorted(self._scan())
+        total = sum(size for _, _, size in clips)
+        evicted = []
+        for _, digest, size in clips:
+            if total <= limit:
+                break
+            try:
+                os.remove(self.path(digest))
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted.append(digest)
+        with self._lock:
+            self.total_bytes = total
+        return evicted
+
+    def needs_eviction(self):
+        return self.total_bytes > self.max_bytes
@@ -0,0 +1,209 @@
+import asyncio
+from collections import OrderedDict
+
+from bot import async_database
+from bot.config import Config
+
+class BalanceCache:
+    """Write-behind cache of user balances for the economy system
+
+    Reads and writes are served from memory. Every change is also recorded
+    as a pending delta, and the deltas are written to the users table in one
+    batched statement every BALANCE_FLUSH_INTERVAL seconds and on shutdown.
+    All mutations are plain synchronous code, so they are atomic with respect
+    to other coroutines on the event loop. Past `max_size` users, the least
+    recently used balances with nothing left to write are dropped; they are
+    reloaded from the database on next use.
+    """
+
+    def __init__(self, flush_interval=None, max_size=None):
+        self.flush_interval = flush_interval or Config.BALANCE_FLUSH_INTERVAL
+        self.max_size = max_size or Config.BALANCE_CACHE_SIZE
+        self._balances = OrderedDict()  # user_id: current balance, least recently used first
+        self._pending = {}   # user_id: change not yet written to the database
+        self._writing = {}   # user_id: change in the batch being written right now
+        self._loading = {}   # user_id: in-flight load from the database
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+
+    async def get(self, user_id):
+        """Get a user's balance, loading it from the database on first use"""
+        if user_id in self._balances:
+            self._balances.move_to_end(user_id)
+            return self._balances[user_id]
+
+        # Share one database read between concurrent callers
+        load = self._loading.get(user_id)
+        if load is None:
+            load = asyncio.ensure_future(async_database.get_user_balance(user_id))
+            self._loading[user_id] = load
+            load.add_done_callback(lambda _: self._loading.pop(user_id, None))
+        stored = await load
+
+        if user_id not in self._balances:
+            self._balances[user_id] = stored + self._pending.get(user_id, 0)
+            self._evict(keep=user_id)
+        return self._balances[user_id]
+
+    def _evict(self, keep=None):
+        """Drop the least recently used clean balances (never `keep`) until the cache fits"""
+        excess = len(self._balances) - self.max_size
+        if excess <= 0:
+            return
+        stale = []
+        for user_id in self._balances:
+            if len(stale) == excess:
+                break
+            # Balances with unwritten changes stay, or reloading them would lose the change
+            if user_id != keep and user_id not in self._pending and user_id not in self._writing:
+                stale.append(user_id)
+        for user_id in stale:
+            del self._balances[user_id]
+
+    def peek(self, user_id):
+        """A user's balance if it is already in memory, otherwise None"""
+        return self._balances.get(user_id)
+
+    def snapshot(self):
+        """Copy of every balance currently held in memory"""
+        return dict(self._balances)
+
+    def _apply(self, user_id, delta):
+        """Apply a change to a loaded balance, refusing to go below zero"""
+        new_balance = self._balances[user_id] + delta
+        if new_balance < 0:
+            return None
+        self._balances[user_id] = new_balance
+        self._pending[user_id] = self._pending.get(user_id, 0) + delta
+        return new_balance
+
+    async def credit(self, user_id, amount):
+        """Add coins to a balance
+
+        Returns:
+            int: The new balance, or None if a negative amount would overdraw it
+        """
+        await self.get(user_id)
+        return self._apply(user_id, amount)
+
+    async def debit(self, user_id, amount):
+        """Remove coins from a balance
+
+        Returns:
+            int: The new balance, or None if the user has insufficient funds
+        """
+        await self.get(user_id)
+        return self._apply(user_id, -amount)
+
+    async def transfer(self, from_user_id, to_user_id, amount):
+        """Move coins between two users as one in-memory step
+
+        Returns:
+            tuple: (sender_balance, receiver_balance), or (sender_balance, None)
+            if the sender has insufficient funds
+        """
+        await self.get(from_user_id)
+        await self.get(to_user_id)
+        sender_balance = self._apply(from_user_id, -amount)
+        if sender_balance is None:
+            return self._balances[from_user_id], None
+        return sender_balance, self._apply(to_user_id, amount)
+
+    async def settle(self, user_id, stake, payout):
+        """Take a stake and pay out winnings as one in-memory step
+
+        Returns:
+            int: The new balance, or None if the user cannot cover the stake
+        """
+        balance = await self.get(user_id)
+        if balance < stake:
+            return None
+        return self._apply(user_id, payout - stake)
+
+    def observe(self, user_id, stored_balance, delta):
+        """Account for a change that was written straight to the database
+
+        Args:
+            user_id (int): Discord user ID
+            stored_balance (int): Balance the database returned after the change
+            delta (int): How much the change added to the balance
+
+        Returns:
+            int: The balance as this cache now sees it
+        """
+        if user_id in self._balances:
+            self._balances[user_id] += delta
+            self._balances.move_to_end(user_id)
+            return self._balances[user_id]
+        balance = self._balances[user_id] = stored_balance + self._pending.get(user_id, 0)
+        self._evict(keep=user_id)
+        return balance
+
+    async def refresh(self, user_ids=None):
+        """Reload stored balances after another process changed them
+
+        Pending changes are kept and re-applied on top of the fresh value.
+        This holds the flush lock, so a batch of ours that is still being
+        written cannot be counted twice or lost. Users with a load in flight
+        are refreshed too, so the older load result is ignored.
+
+        Args:
+            user_ids (list, optional): Users to reload; every cached user if None
+
+        Returns:
+            dict: user_id: balance for each refreshed user
+        """
+        async with self._flush_lock:
+            if user_ids is None:
+                user_ids = list(self._balances)
+            user_ids = [user_id for user_id in user_ids
+                        if user_id in self._balances or user_id in self._loading]
+            if not user_ids:
+                return {}
+            stored = await async_database.get_balances(user_ids)
+            for user_id, coins in stored.items():
+                self._balances[user_id] = coins + self._pending.get(user_id, 0)
+            return {user_id: self._balances[user_id] for user_id in stored}
+
+    async def flush(self):
+        """Write all pending changes to the database in one batch"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            self._writing = batch
+            try:
+                await async_database.apply_balance_deltas(
+                    [(user_id, delta) for user_id, delta in batch.items() if delta])
+            except Exception as e:
+                # Put the batch back so the next flush retries it
+                for user_id, delta in batch.items():
+                    self._pending[user_id] = self._pending.get(user_id, 0) + delta
+                print(f"❌ Failed to flush {len(batch)} cached balances: {e}")
+            finally:
+                self._writing = {}
+            self._evict()
+
+    async def _flush_loop(self):
+        """Flush pending changes on a fixed interval"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        """Start the background flush task"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the background flush task and write out anything still pending"""
+        if self._flush_task is not None:
+            # Cancel only between flushes so a batch is never cut off mid-write
+            async with self._flush_lock:
+                self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
@@ -0,0 +1,70 @@
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """Small LRU cache whose entries also expire after `ttl` seconds
+
+    Keeps hit and miss counts so the hit rate can be reported.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key: (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """Get a live entry, counting the lookup as a hit or a miss"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        """Store an entry, evicting the least recently used one if full"""
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Remove an entry"""
+        entry = self._data.pop(key, None)
+        return entry[1] if entry is not None else default
+
+    def discard_values(self, values):
+        """Remove every entry whose value is in `values`"""
+        values = set(values)
+        if values:
+            for key in [key for key, (_, value) in self._data.items() if value in values]:
+                del self._data[key]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        """Size and hit/miss counters for logging or admin commands"""
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
@@ -1,8 +1,8 @@
 import discord
 from discord.ext import commands
-from groq import Groq
 import asyncio
 from collections import deque, defaultdict
+from contextlib import aclosing
 import time
 import random
 import datetime
@@ -11,6 +11,22 @@ import os
 import io
 from gtts import gTTS  # Google Text-to-Speech
 from .config import Config
+from .balance_cache import BalanceCache
+from .ranking import RankingService
+from .rate_limiter import RateLimiter
+from .history_store import ConversationStore
+from .economy import Economy
+from .cache import TTLCache
+from .invalidation import InvalidationBus
+from .llm_client import LLMClient
+from .llm_scheduler import LLMOverloaded, PRIORITY_TEXT
+from .streaming import EditThrottle, stream_to_channel
+from .response_cache import ResponseCache
+from .context_builder import build_context
+from .summarizer import ConversationSummarizer
+from .retrieval import RetrievalIndex
+from .mention_batcher import MentionBatcher
+from .nickname_engine import NicknameEngine, desired_nickname
 
 
 class ChatCog(commands.Cog):
@@ -18,25 +34,118 @@ class ChatCog(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
-        # Initialize Groq client with API key (uses the OpenAI-compatible interface)
-        self.groq_client = Groq(
-            api_key=Config.GROQ_API_KEY,
-            base_url="https://api.groq.com"  # Fixed the base URL
-        )
+        # Shared async Groq client (OpenAI-compatible interface) used by every AI feature
+        self.llm = LLMClient()
+        self.edit_throttle = EditThrottle()  # Paces streamed reply edits per channel
+        # Running per-channel summaries of turns that fell out of the history window
+        self.summarizer = ConversationSummarizer(self.llm) if Config.SUMMARY_ENABLED else None
+        # Shares replies between identical prompts over identical recent history
+        self.response_cache = ResponseCache() if Config.RESPONSE_CACHE_ENABLED else None
+        # Held while a channel's history is read for a reply and appended to
+        self.channel_locks = defaultdict(asyncio.Lock)
+        # Bursts of mentions in a channel are answered with one completion
+        self.mention_batcher = MentionBatcher(self._reply_to_mentions, self.channel_locks)
         self.conversation_history = defaultdict(
             lambda: deque(maxlen=Config.MAX_CONTEXT_MESSAGES))
-        self.user_message_timestamps = defaultdict(list)
+        # Batched persistence of conversation turns to message_history
+        self.conversation_store = ConversationStore()
+        # Local vector index over stored turns for recalling relevant older messages
+        self.retrieval = RetrievalIndex(self.conversation_store) if Config.RETRIEVAL_ENABLED else None
+        self.rate_limiter = RateLimiter()
         self.creator = Config.BOT_CREATOR
         self.user_coins = defaultdict(
             lambda: 50_000)  # Default bank balance: ₱50,000
         self.daily_cooldown = defaultdict(int)
+        # Write-behind balance cache shared by all economy commands
+        self.balance_cache = BalanceCache() if Config.BALANCE_CACHE_ENABLED else None
+        # In-memory wealth ranking for leaderboard and profile lookups
+        self.ranking = RankingService(watch_top=Config.LEADERBOARD_SIZE)
+        # Single-step economy operations over the cache (or the database)
+        self.economy = Economy(self.ranking, self.balance_cache)
+        self.profile_cache = TTLCache(maxsize=512, ttl=Config.PROFILE_CACHE_TTL)
+        self._leaderboard_cache = {}  # guild_id: last leaderboard embed and the ranking version it shows
+        self._owner_user = None
         self.blackjack_games = {}
+        # Keeps the caches above coherent with other bot processes sharing the database
+        self.invalidation_bus = None
+        if Config.CACHE_INVALIDATION_ENABLED:
+            self.invalidation_bus = InvalidationBus()
+            self.invalidation_bus.subscribe("users", self._on_users_changed)
+            self.invalidation_bus.subscribe("blackjack_games", self._on_games_changed)
+            self.invalidation_bus.subscribe("message_history", self._on_history_changed)
         self.ADMIN_ROLE_ID = 1345727357662658603
         
-        # Setup regular nickname update check
-        self.nickname_update_task = bot.loop.create_task(self._regular_nickname_scan())
+        # Keeps nicknames in the server format as members and roles change
+        self.nickname_engine = NicknameEngine(bot)
         print("ChatCog initialized")
 
+    async def cog_load(self):
+        """Start background flushing of balances and history, and build the ranking"""
+        if self.balance_cache:
+            self.balance_cache.start()
+        self.conversation_store.start()
+        self.nickname_engine.start()
+        if self.invalidation_bus:
+            self.invalidation_bus.start()
+        try:
+            overrides = self.balance_cache.snapshot() if self.balance_cache else None
+            await self.ranking.rebuild(overrides)
+        except Exception as e:
+            # Leaderboard and profiles fall back to the database until a rebuild succeeds
+            print(f"❌ Failed to build ranking index: {e}")
+        if Config.RATE_LIMIT_SNAPSHOT:
+            try:
+                from bot.async_database import load_rate_limit_snapshot
+                self.rate_limiter.restore(await load_rate_limit_snapshot())
+            except Exception as e:
+                print(f"❌ Failed to restore rate limiter state: {e}")
+
+    async def cog_unload(self):
+        """Write any cached balances and buffered history before the cog goes away"""
+        if self.invalidation_bus:
+            await self.invalidation_bus.stop()
+        await self.mention_batcher.stop()
+        await self.nickname_engine.stop()
+        if self.summarizer:
+            await self.summarizer.stop()
+        await self.llm.aclose()
+        if self.balance_cache:
+            await self.balance_cache.stop()
+        await self.conversation_store.stop()
+        if Config.RATE_LIMIT_SNAPSHOT:
+            try:
+                from bot.async_database import save_rate_limit_snapshot
+                await save_rate_limit_snapshot(self.rate_limiter.snapshot())
+            except Exception as e:
+                print(f"❌ Failed to save rate limiter state: {e}")
+
+    async def _on_users_changed(self, user_ids):
+        """Another process changed balances or daily claims"""
+        if user_ids is None:
+            self.profile_cache.clear()
+        else:
+            for user_id in user_ids:
+                self.profile_cache.pop(user_id)
+        await self.economy.refresh(user_ids)
+
+    async def _on_games_changed(self, user_ids):
+        """Another process started or ended a blackjack game"""
+        if user_ids is None:
+            self.profile_cache.clear()
+            return
+        for user_id in user_ids:
+            self.profile_cache.pop(user_id)
+
+    async def _on_history_changed(self, channel_ids):
+        """Another process cleared a channel's conversation history"""
+        for channel_id in channel_ids or []:
+            if channel_id in self.conversation_history:
+                self.conversation_history[channel_id].clear()
+            if self.summarizer:
+                self.summarizer.clear(channel_id)
+            if self.retrieval:
+                self.retrieval.clear(channel_id)
+
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
         """No longer automatically connects to voice channels - only on explicit command"""
@@ -51,155 +160,25 @@ class ChatCog(commands.Cog):
         
     @commands.Cog.listener()
     async def on_member_join(self, member):
-        """Automatically format nickname of new members when they join"""
-        # Skip bots
-        if member.bot:
-            return
-            
-        # Use centralized configuration from config.py
-        role_emoji_map = Config.ROLE_EMOJI_MAP
-        
-        # Get member's roles sorted by position (highest first)
-        member_roles = sorted(member.roles, key=lambda r: r.position, reverse=True)
-        
-        # Find the highest role that's in our mapping
-        highest_matched_role_id = None
-        for role in member_roles:
-            if role.id in role_emoji_map:
-                highest_matched_role_id = role.id
-                break
-        
-        # If no matching role found, use default (no emoji)
-        # We'll still convert their name to Unicode bold style
-        if not highest_matched_role_id:
-            # Use a default format with no emoji for @everyone
-            emoji = ""  # No emoji for default users
-            role_name = "@everyone"
-        else:
-            # Get the emoji for this role
-            emoji = role_emoji_map[highest_matched_role_id]
-            role_name = "Role"  # We don't need exact role name here
-        
-        # Format the name
-        original_name = member.display_name
-        
-        # Clean name of all emojis
-        clean_name = original_name
-        
-        # Special case for cloud emoji (both variants)
-        clean_name = clean_name.replace("☁️", "").replace("☁", "")
-        
-        # Handle all other emojis from the role map
-        for emoji_value in role_emoji_map.values():
-            while emoji_value in clean_name:
-                clean_name = clean_name.replace(emoji_value, '')
-        
-        # Remove any extra spaces
-        clean_name = clean_name.strip()
-        
-        # Convert to Unicode bold style using config
-        formatted_name = ''.join(Config.UNICODE_MAP.get(c, c) for c in clean_name)
-        
-        # Add the role emoji
-        new_name = f"{formatted_name} {emoji}"
-        
-        # Skip if the name is already correctly formatted
-        if member.display_name == new_name:
-            return
-            
-        # Update the name
-        try:
-            await member.edit(nick=new_name)
-            print(f"[Join] Set new member {member.name}'s nickname to {new_name}")
-        except Exception as e:
-            print(f"[Join] Failed to update new member {member.name}'s nickname: {e}")
+        """Format the nickname of new members when they join"""
+        self.nickname_engine.mark_dirty(member)
 
     @commands.Cog.listener()
     async def on_member_update(self, before, after):
-        """Automatically update nickname when a user's roles change or they change their nickname"""
-        # Add debug logging to see when this event fires
-        print(f"[Debug] Member update detected for {after.name}:")
-        print(f"[Debug] - Roles changed: {before.roles != after.roles}")
-        print(f"[Debug] - Nickname changed: {before.display_name != after.display_name}")
-        print(f"[Debug] - Before nickname: {before.display_name}")
-        print(f"[Debug] - After nickname: {after.display_name}")
-        
-        # Only process if roles have changed OR nickname has changed
-        if before.roles == after.roles and before.display_name == after.display_name:
-            print(f"[Debug] - No relevant changes for {after.name}, skipping")
-            return
-            
-        # Use centralized configuration from config.py
-        role_emoji_map = Config.ROLE_EMOJI_MAP
-        role_names = Config.ROLE_NAMES
-        
-        # Skip bots
-        if after.bot:
-            return
-            
-        # Get member's roles sorted by position (highest first)
-        member_roles = sorted(after.roles, key=lambda r: r.position, reverse=True)
-        
-        # Find the highest role that's in our mapping
-        highest_matched_role_id = None
-        for role in member_roles:
-            if role.id in role_emoji_map:
-                highest_matched_role_id = role.id
-                break
-        
-        # If no matching role found, use default (no emoji)
-        # We'll still convert their name to Unicode bold style
-        if not highest_matched_role_id:
-            # Use a default format with no emoji for @everyone
-            emoji = ""  # No emoji for default users
-            role_name = "@everyone"
-        else:
-            # Get the emoji for this role
-            emoji = role_emoji_map[highest_matched_role_id]
-            role_name = "Role"  # We don't need exact role name here
-        
-        # Format the name - same as in setupnn
-        original_name = after.display_name
-        
-        # Clean name of all emojis
-        clean_name = original_name
-        
-        # Special case for cloud emoji (both variants)
-        clean_name = clean_name.replace("☁️", "").replace("☁", "")
-        
-        # Handle all other emojis from the role map
-        for emoji_value in role_emoji_map.values():
-            while emoji_value in clean_name:
-                clean_name = clean_name.replace(emoji_value, '')
-        
-        # Remove any extra spaces
-        clean_name = clean_name.strip()
-        
-        # Convert to Unicode bold style using config
-        formatted_name = ''.join(Config.UNICODE_MAP.get(c, c) for c in clean_name)
-        
-        # Add the role emoji
-        new_name = f"{formatted_name} {emoji}"
-        
-        # Skip if the name is already correctly formatted
-        if after.display_name == new_name:
-            return
-            
-        # Update the name (silently - no notifications)
-        try:
-            await after.edit(nick=new_name)
-            
-            # Determine what triggered the update
-            if before.roles != after.roles and before.display_name != after.display_name:
-                trigger = "role and nickname change"
-            elif before.roles != after.roles:
-                trigger = "role change"
-            else:
-                trigger = "nickname change"
-                
-            print(f"[Auto] Updated {after.name}'s nickname to {new_name} due to {trigger}")
-        except Exception as e:
-            print(f"[Auto] Failed to update {after.name}'s nickname: {e}")
+        """Re-check the nickname when a member's roles or name change"""
+        if before.roles != after.roles or before.display_name != after.display_name:
+            self.nickname_engine.mark_dirty(after)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before, after):
+        """Re-check everyone with a mapped role that moved or changed"""
+        self.nickname_engine.mark_role(after)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        """A mapped role is gone, so its former members may need another emoji"""
+        if role.id in Config.ROLE_EMOJI_MAP:
+            await self.nickname_engine.sweep(role.guild)
 
     async def _connect(self, channel):
         """Helper method to connect to a voice channel"""
@@ -213,130 +192,107 @@ class ChatCog(commands.Cog):
             except Exception as e:
                 print(f"Error auto-connecting to voice channel: {e}")
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        """Listen for messages that mention the bot and respond to them"""
-        # Ignore messages from the bot itself
-        if message.author.bot:
-            return
+    async def handle_mention(self, message, content):
+        """Reply to a message that mentions the bot (routed here by MessageRouter)
 
-        # Enhanced mention detection - check multiple ways
-        is_mentioned = False
-        content = message.content
-
-        # Check for specific user ID mention for a fun easter egg
-        if '1346359556711776299' in message.content:
-            is_mentioned = True
-            content = message.content.replace('1346359556711776299',
-                                              '').strip()
-            if not content:
-                content = "Bakit mo ako tinatawag gamit ang ID ko?"
-            print(
-                f"✅ Bot secret ID mention detected from {message.author.name}")
-
-        # Check if the bot is directly mentioned
-        elif self.bot.user.id in [user.id for user in message.mentions]:
-            is_mentioned = True
-            # Clean up the mention in different possible formats
-            content = content.replace(f'<@{self.bot.user.id}>', '').strip()
-            content = content.replace(f'<@!{self.bot.user.id}>', '').strip()
-
-        # Only proceed if the bot was mentioned
-        if is_mentioned:
-            # Debug log for mention detection
-            print(
-                f"✅ Bot mentioned by {message.author.name} with content: {content}"
-            )
+        Args:
+            message (discord.Message): The mentioning message
+            content (str): Its text with the mention removed
+        """
+        # Debug log for mention detection
+        print(
+            f"✅ Bot mentioned by {message.author.name} with content: {content}"
+        )
 
-            # Skip if there's no actual content after removing the mention
-            if not content:
-                await message.channel.send(
-                    f"**Oy {message.author.mention}!** Bakit mo ako tinatawag? May gusto ka bang sabihin?"
-                )
-                return
+        # Skip if there's no actual content after removing the mention
+        if not content:
+            await message.channel.send(
+                f"**Oy {message.author.mention}!** Bakit mo ako tinatawag? May gusto ka bang sabihin?"
+            )
+            return
 
-            # Check for rate limiting
-            if self.is_rate_limited(message.author.id):
-                await message.channel.send(
-                    f"**Huy {message.author.mention}!** Ang bilis mo naman magtype! Sandali lang muna, naglo-load pa ako. Parang text blast ka eh! 😅"
-                )
-                return
+        # Check for rate limiting (this also counts the message)
+        if self.is_rate_limited(message.author.id):
+            await message.channel.send(
+                f"**Huy {message.author.mention}!** Ang bilis mo naman magtype! Sandali lang muna, naglo-load pa ako. Parang text blast ka eh! 😅"
+            )
+            return
 
-            # Add timestamp for rate limiting
-            self.user_message_timestamps[message.author.id].append(time.time())
+        # Answered together with any other mentions in the next MENTION_BATCH_WINDOW
+        self.mention_batcher.submit(message.channel, (message.author, content))
 
-            # Prepare conversation history for the channel
-            channel_history = list(
-                self.conversation_history[message.channel.id])
-            channel_history.append({"is_user": True, "content": content})
+    async def _reply_to_mentions(self, channel, mentions):
+        """Answer a batch of (author, content) mentions in one channel with a single reply"""
+        if len(mentions) == 1:
+            content = mentions[0][1]
+        else:
+            lines = "\n".join(f"{author.display_name}: {text}" for author, text in mentions)
+            content = ("Sabay-sabay na nag-mention sa iyo ang mga ito. "
+                       f"Sagutin mo ang bawat isa, tawagin mo sila sa pangalan nila:\n{lines}")
 
-            # Get AI response with typing indicator
-            async with message.channel.typing():
-                response = await self.get_ai_response(channel_history)
-                self.add_to_conversation(message.channel.id, True, content)
-                self.add_to_conversation(message.channel.id, False, response)
+        # Prepare conversation history for the channel
+        channel_history = list(await self.get_channel_history(channel.id))
+        channel_history.append({"is_user": True, "content": content})
 
-                # Send AI response as plain text - no embed to match SimSimi style
-                await message.channel.send(response)
+        # Get AI response with typing indicator
+        async with channel.typing():
+            # Send AI response as plain text - no embed to match SimSimi style
+            response = await self.send_ai_reply(
+                channel, channel_history, self.use_response_cache("mention"))
+            self.add_to_conversation(channel.id, True, content)
+            self.add_to_conversation(channel.id, False, response)
 
     # ========== HELPER FUNCTIONS ==========
-    def get_user_balance(self, user_id):
+    async def get_user_balance(self, user_id):
         """Get user's balance with aggressive Tagalog flair"""
-        from bot.database import get_user_balance
-        return get_user_balance(user_id)
+        return await self.economy.get_balance(user_id)
 
-    def add_coins(self, user_id, amount):
+    async def add_coins(self, user_id, amount):
         """Add coins to user's balance"""
-        from bot.database import add_coins
-        return add_coins(user_id, amount)
+        return await self.economy.credit(user_id, amount)
 
-    def deduct_coins(self, user_id, amount):
+    async def deduct_coins(self, user_id, amount):
         """Deduct coins from user's balance"""
-        from bot.database import deduct_coins
-        result = deduct_coins(user_id, amount)
+        result = await self.economy.settle_bet(user_id, amount, 0)
         return result is not None
 
-    def is_rate_limited(self, user_id):
-        """Check if user is spamming commands"""
-        current_time = time.time()
-        if user_id not in self.user_message_timestamps:
-            self.user_message_timestamps[user_id] = []
-        # Filter out old timestamps
-        self.user_message_timestamps[user_id] = [
-            ts for ts in self.user_message_timestamps[user_id]
-            if current_time - ts < Config.RATE_LIMIT_PERIOD
-        ]
-        return len(self.user_message_timestamps[user_id]
-                   ) >= Config.RATE_LIMIT_MESSAGES
+    def is_rate_limited(self, user_id, scope="chat"):
+        """Check if user is spamming commands, counting this attempt if allowed"""
+        return not self.rate_limiter.hit(user_id, scope)
+
+    async def get_channel_history(self, channel_id):
+        """Get a channel's conversation history, restoring it from the database after a restart"""
+        history = self.conversation_history[channel_id]
+        await self.conversation_store.ensure_loaded(channel_id, history)
+        if self.retrieval:
+            await self.retrieval.ensure_loaded(channel_id)
+        return history
 
     def add_to_conversation(self, channel_id, is_user, content):
         """Add a message to the conversation history"""
-        self.conversation_history[channel_id].append({
+        history = self.conversation_history[channel_id]
+        if self.summarizer and len(history) == history.maxlen:
+            # The oldest turn is about to be evicted; fold it into the summary
+            self.summarizer.add_evicted(channel_id, history[0])
+        history.append({
             "is_user": is_user,
             "content": content
         })
+        self.conversation_store.record(channel_id, is_user, content)
+        if self.retrieval:
+            self.retrieval.add(channel_id, is_user, content)
         return len(self.conversation_history[channel_id])
 
     # ========== ECONOMY COMMANDS ==========
     @commands.command(name="daily")
     async def daily(self, ctx):
         """Claim your daily ₱10,000 pesos"""
-        from bot.database import get_daily_cooldown, update_daily_cooldown
-        from datetime import datetime, timedelta
-        import pytz
-
-        # Get Philippines timezone for proper cooldown calculation
-        ph_timezone = pytz.timezone('Asia/Manila')
-        current_time = datetime.now(ph_timezone)
+        # Check the 24 hour cooldown and pay out in a single database round trip
+        new_balance, remaining = await self.economy.claim_daily(ctx.author.id, 10_000, 86400)
 
-        # Get last daily claim time from database
-        last_claim = get_daily_cooldown(ctx.author.id)
-
-        # Check if enough time has passed (24 hours)
-        if last_claim and current_time - last_claim < timedelta(days=1):
+        if new_balance is None:
             # Calculate remaining time
-            remaining_time = timedelta(days=1) - (current_time - last_claim)
-            hours, remainder = divmod(remaining_time.seconds, 3600)
+            hours, remainder = divmod(remaining, 3600)
             minutes, seconds = divmod(remainder, 60)
 
             await ctx.send(
@@ -344,14 +300,8 @@ class ChatCog(commands.Cog):
                 f"⏰ REMAINING TIME: **{hours}h {minutes}m {seconds}s** 😤")
             return
 
-        # Update cooldown in the database
-        update_daily_cooldown(ctx.author.id)
-
-        # Add coins
-        self.add_coins(ctx.author.id, 10_000)
-
         await ctx.send(
-            f"🎉 {ctx.author.mention} NAKA-CLAIM KA NA NG DAILY MO NA **₱10,000**! BALANCE MO NGAYON: **₱{self.get_user_balance(ctx.author.id):,}**"
+            f"🎉 {ctx.author.mention} NAKA-CLAIM KA NA NG DAILY MO NA **₱10,000**! BALANCE MO NGAYON: **₱{new_balance:,}**"
         )
 
     @commands.command(name="give")
@@ -362,11 +312,11 @@ class ChatCog(commands.Cog):
                 "**TANGA KA BA?** WALA KANG TINUKOY NA USER! 😤")
         if amount <= 0:
             return await ctx.send("**BOBO!** WALANG NEGATIVE NA PERA! 😤")
-        if not self.deduct_coins(ctx.author.id, amount):
+        sender_balance, receiver_balance = await self.economy.transfer(ctx.author.id, member.id, amount)
+        if receiver_balance is None:
             return await ctx.send(
-                f"**WALA KANG PERA!** {ctx.author.mention} BALANCE MO: **₱{self.get_user_balance(ctx.author.id):,}** 😤"
+                f"**WALA KANG PERA!** {ctx.author.mention} BALANCE MO: **₱{sender_balance:,}** 😤"
             )
-        self.add_coins(member.id, amount)
         await ctx.send(
             f"💸 {ctx.author.mention} NAGBIGAY KA NG **₱{amount:,}** KAY {member.mention}! WAG MO SANA PAGSISIHAN YAN! 😤"
         )
@@ -380,12 +330,16 @@ class ChatCog(commands.Cog):
             )
         if bet < 0:
             return await ctx.send("**BOBO!** WALANG NEGATIVE NA BET! 😤")
-        if bet > 0 and not self.deduct_coins(ctx.author.id, bet):
+        result = random.choice(['h', 't'])
+        winnings = bet * 2 if choice == result else 0
+
+        # Take the bet and pay any winnings in one step
+        new_balance = await self.economy.settle_bet(ctx.author.id, bet, winnings)
+        if new_balance is None:
             return await ctx.send(
-                f"**WALA KANG PERA!** {ctx.author.mention} BALANCE MO: **₱{self.get_user_balance(ctx.author.id):,}** 😤"
+                f"**WALA KANG PERA!** {ctx.author.mention} BALANCE MO: **₱{await self.get_user_balance(ctx.author.id):,}** 😤"
             )
 
-        result = random.choice(['h', 't'])
         win_message = random.choice([
             "**CONGRATS! NANALO KA! 🎉**", "**SCAMMER KANANGINA MO! 🏆**",
             "**NICE ONE! NAKA-JACKPOT KA! 💰**"
@@ -397,14 +351,12 @@ class ChatCog(commands.Cog):
         ])
 
         if choice == result:
-            winnings = bet * 2
-            self.add_coins(ctx.author.id, winnings)
             await ctx.send(
-                f"🎲 **{win_message}**\nRESULTA: **{result.upper()}**\nNANALO KA NG **₱{winnings:,}**!\nBALANCE MO NGAYON: **₱{self.get_user_balance(ctx.author.id):,}**"
+                f"🎲 **{win_message}**\nRESULTA: **{result.upper()}**\nNANALO KA NG **₱{winnings:,}**!\nBALANCE MO NGAYON: **₱{new_balance:,}**"
             )
         else:
             await ctx.send(
-                f"🎲 **{lose_message}**\nRESULTA: **{result.upper()}**\nTALO KA NG **₱{bet:,}**!\nBALANCE MO NGAYON: **₱{self.get_user_balance(ctx.author.id):,}**"
+                f"🎲 **{lose_message}**\nRESULTA: **{result.upper()}**\nTALO KA NG **₱{bet:,}**!\nBALANCE MO NGAYON: **₱{new_balance:,}**"
             )
 
     @commands.command(name="blackjack", aliases=["bj"])
@@ -412,9 +364,9 @@ class ChatCog(commands.Cog):
         """Play a game of Blackjack"""
         if bet <= 0:
             return await ctx.send("**TANGA!** WALANG NEGATIVE NA BET! 😤")
-        if not self.deduct_coins(ctx.author.id, bet):
+        if not await self.deduct_coins(ctx.author.id, bet):
             return await ctx.send(
-                f"**WALA KANG PERA!** {ctx.author.mention} BALANCE MO: **₱{self.get_user_balance(ctx.author.id):,}** 😤"
+                f"**WALA KANG PERA!** {ctx.author.mention} BALANCE MO: **₱{await self.get_user_balance(ctx.author.id):,}** 😤"
             )
 
         # Initialize game
@@ -445,10 +397,11 @@ class ChatCog(commands.Cog):
 
         player_value = self._calculate_hand_value(game["player_hand"])
         if player_value > 21:
+            # The stake was taken when the game started; nothing to pay out
+            del self.blackjack_games[ctx.author.id]
             await ctx.send(
                 f"**BUST!** YOUR HAND: {self._format_hand(game['player_hand'])}\nTALO KA NG **₱{game['bet']:,}**! 😤"
             )
-            del self.blackjack_games[ctx.author.id]
             return
 
         await ctx.send(
@@ -458,11 +411,12 @@ class ChatCog(commands.Cog):
     @commands.command(name="stand")
     async def stand(self, ctx):
         """End your turn in Blackjack"""
-        if ctx.author.id not in self.blackjack_games:
+        # Ending the game before paying out means a second g!stand cannot settle it again
+        game = self.blackjack_games.pop(ctx.author.id, None)
+        if game is None:
             return await ctx.send(
                 "**TANGA!** WALA KANG BLACKJACK GAME NA NAGSISIMULA! 😤")
 
-        game = self.blackjack_games[ctx.author.id]
         dealer_value = self._calculate_hand_value(game["dealer_hand"])
         player_value = self._calculate_hand_value(game["player_hand"])
 
@@ -474,12 +428,12 @@ class ChatCog(commands.Cog):
         # Determine the winner
         if dealer_value > 21 or player_value > dealer_value:
             winnings = game["bet"] * 2
-            self.add_coins(ctx.author.id, winnings)
+            await self.economy.settle_bet(ctx.author.id, 0, winnings)
             await ctx.send(
                 f"🎲 **YOU WIN!**\nYOUR HAND: {self._format_hand(game['player_hand'])}\nDEALER'S HAND: {self._format_hand(game['dealer_hand'])}\nNANALO KA NG **₱{winnings:,}**! 🎉"
             )
         elif player_value == dealer_value:
-            self.add_coins(ctx.author.id, game["bet"])
+            await self.economy.settle_bet(ctx.author.id, 0, game["bet"])
             await ctx.send(
                 f"🎲 **IT'S A TIE!**\nYOUR HAND: {self._format_hand(game['player_hand'])}\nDEALER'S HAND: {self._format_hand(game['dealer_hand'])}\nNAKUHA MO ULIT ANG **₱{game['bet']:,}** MO! 😐"
             )
@@ -488,8 +442,6 @@ class ChatCog(commands.Cog):
                 f"🎲 **YOU LOSE!**\nYOUR HAND: {self._format_hand(game['player_hand'])}\nDEALER'S HAND: {self._format_hand(game['dealer_hand'])}\nTALO KA NG **₱{game['bet']:,}**! 😤"
             )
 
-        del self.blackjack_games[ctx.author.id]
-
     def _create_deck(self):
         """Create a shuffled deck of cards"""
         deck = [2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11] * 4
@@ -514,7 +466,7 @@ class ChatCog(commands.Cog):
     @commands.command(name="balance")
     async def balance(self, ctx):
         """Check your current balance"""
-        balance = self.get_user_balance(ctx.author.id)
+        balance = await self.get_user_balance(ctx.author.id)
         embed = discord.Embed(
             title="💰 **ACCOUNT BALANCE**",
             description=f"{ctx.author.mention}'s balance: **₱{balance:,}**",
@@ -708,43 +660,158 @@ class ChatCog(commands.Cog):
                 f"**ERROR:** May problema sa pagpapakita ng commands: {e}")
 
     # ========== AI CHAT COMMANDS ==========
-    async def get_ai_response(self, conversation_history):
-        """Get response from Groq AI with conversation context"""
-        try:
-            # Normal, helpful system message for Mistral-SABA-24B model
-            system_message = f"""Ikaw ay Ginsilog Bot, gawa ni Mason Calix. kapag tinanong lang pero kung ano functions mo as a bot gawin mo!
+    def build_ai_messages(self, conversation_history, channel_id=None):
+        """Turn a channel's history (and its running summary) into chat completion messages within the token budget"""
+        # Normal, helpful system message for Mistral-SABA-24B model
+        system_message = f"""Ikaw ay Ginsilog Bot, gawa ni Mason Calix. kapag tinanong lang pero kung ano functions mo as a bot gawin mo!
 
 """
 
-            # Construct messages
-            messages = [{"role": "system", "content": system_message}]
-
-            for msg in conversation_history:
-                messages.append({
-                    "role": "user" if msg["is_user"] else "assistant",
-                    "content": msg["content"]
-                })
-
-            # Use the updated API format with proper parameters for Groq API
-            response = await asyncio.to_thread(
-                self.groq_client.chat.completions.create,
-                model=Config.GROQ_MODEL,  # Using the model from config
-                messages=messages,
-                temperature=Config.TEMPERATURE,
-                max_tokens=Config.
-                MAX_TOKENS,  # Using standard max_tokens parameter
-                top_p=1,
-                stream=False)
+        # Older context that no longer fits in the history window
+        summary = self.summarizer.summary(channel_id) if self.summarizer and channel_id else None
+        if summary:
+            system_message += f"Buod ng naunang usapan sa channel na ito:\n{summary}\n"
+
+        # Older turns related to the newest message, found in the local retrieval index
+        if self.retrieval and channel_id and conversation_history:
+            recalled = self.retrieval.search(
+                channel_id, conversation_history[-1]["content"],
+                exclude_recent=Config.MAX_CONTEXT_MESSAGES)
+            if recalled:
+                lines = "\n".join(
+                    f"- {'User' if turn['is_user'] else 'Ikaw'}: {turn['content'][:Config.RETRIEVAL_SNIPPET_CHARS]}"
+                    for turn in recalled)
+                system_message += f"Mga kaugnay na naunang mensahe:\n{lines}\n"
+
+        # Construct messages, trimming older turns to CONTEXT_TOKEN_BUDGET
+        trimmed = []
+        messages = build_context(system_message, conversation_history, trimmed=trimmed)
+        if self.summarizer and channel_id:
+            # Turns the budget left out are summarized now rather than when they leave the history
+            for turn in trimmed:
+                self.summarizer.add_evicted(channel_id, turn)
+        return messages
+
+    AI_ERROR_REPLY = "Ay sorry ha! May error sa system ko. Pwede mo ba ulit subukan? Mejo nagkaka-aberya ang AI ko eh. Pasensya na! 😅"
+    AI_BUSY_REPLY = "Grabe, ang daming nagtatanong sa akin ngayon! Subukan mo ulit mamaya-maya ha. 😅"
+
+    def use_response_cache(self, source):
+        """Whether replies for this command (or "mention"/"voice") may come from the cache"""
+        return self.response_cache is not None and source not in Config.RESPONSE_CACHE_BYPASS
+
+    async def get_ai_response(self, conversation_history, use_cache=True, channel_id=None,
+                              guild_id=None, priority=PRIORITY_TEXT):
+        """Get response from Groq AI with conversation context"""
+        try:
+            messages = self.build_ai_messages(conversation_history, channel_id)
+
+            # Scheduled fairly against other guilds, within the LLM_TIMEOUT deadline
+            info = {}
+
+            async def complete():
+                reply = await self.llm.complete(messages, top_p=1, guild_id=guild_id,
+                                                channel_id=channel_id, priority=priority, info=info)
+                if not (reply or "").strip():
+                    # Fails the request so the blank reply is neither cached nor shared
+                    raise RuntimeError("The model returned an empty reply")
+                return reply
+
+            if use_cache and self.response_cache is not None:
+                key = ResponseCache.key(Config.GROQ_MODEL, messages)
+                # Replies from the fallback model are not cached under the primary's key
+                response = await self.response_cache.get_or_create(
+                    key, complete, lambda reply: info.get("model") == Config.GROQ_MODEL)
+            else:
+                response = await complete()
 
             # Just return the AI response directly without filtering
-            return response.choices[0].message.content
+            return response
+
+        except LLMOverloaded as e:
+            print(f"⚠️ AI request shed: {e}")
+            return self.AI_BUSY_REPLY
 
         except Exception as e:
             print(f"Error getting AI response: {e}")
             print(f"Error details: {type(e).__name__}")
 
             # More friendly error message
-            return "Ay sorry ha! May error sa system ko. Pwede mo ba ulit subukan? Mejo nagkaka-aberya ang AI ko eh. Pasensya na! 😅"
+            return self.AI_ERROR_REPLY
+
+    async def stream_ai_response(self, messages, status, guild_id=None, channel_id=None):
+        """Stream a response from Groq AI, yielding text as it is generated
+
+        Sets status["failed"] if the request did not complete or produced
+        no text, and status["model"] to the model that answered.
+        """
+        received = False  # Whether any visible text has been yielded
+        try:
+            async with aclosing(self.llm.stream(messages, top_p=1, guild_id=guild_id,
+                                                channel_id=channel_id, info=status)) as chunks:
+                async for chunk in chunks:
+                    received = received or bool(chunk.strip())
+                    yield chunk
+            if not received:
+                raise RuntimeError("The model returned an empty reply")
+        except LLMOverloaded as e:
+            status["failed"] = e
+            print(f"⚠️ AI request shed: {e}")
+            yield self.AI_BUSY_REPLY
+        except Exception as e:
+            status["failed"] = e
+            print(f"Error streaming AI response: {e}")
+            print(f"Error details: {type(e).__name__}")
+            if not received:
+                yield self.AI_ERROR_REPLY
+
+    async def send_ai_reply(self, channel, conversation_history, use_cache=True):
+        """Reply in a channel, streaming the text in as it is generated
+
+        A cached reply, or one an identical request is already generating,
+        is sent in one piece instead.
+
+        Returns:
+            str: The complete reply
+        """
+        guild_id = channel.guild.id if getattr(channel, "guild", None) else None
+        if not Config.STREAM_REPLIES:
+            response = await self.get_ai_response(conversation_history, use_cache, channel.id, guild_id)
+            await channel.send(response)
+            return response
+
+        messages = self.build_ai_messages(conversation_history, channel.id)
+        key = None
+        if use_cache and self.response_cache is not None:
+            key = ResponseCache.key(Config.GROQ_MODEL, messages)
+            response = self.response_cache.lookup(key)
+            pending = self.response_cache.inflight(key) if response is None else None
+            if pending is not None:
+                try:
+                    response = await asyncio.shield(pending)
+                except Exception:
+                    response = self.AI_ERROR_REPLY
+            if response is not None:
+                await channel.send(response)
+                return response
+            self.response_cache.begin(key)
+
+        status = {}
+        try:
+            async with aclosing(self.stream_ai_response(messages, status, guild_id, channel.id)) as chunks:
+                response = await stream_to_channel(channel, chunks, self.edit_throttle)
+        except BaseException as e:
+            status.setdefault("failed", e)
+            raise
+        finally:
+            if key is not None:
+                if "failed" in status:
+                    error = status["failed"]
+                    self.response_cache.abandon(
+                        key, error if isinstance(error, Exception) else RuntimeError("Request cancelled"))
+                else:
+                    self.response_cache.complete(
+                        key, response, status.get("model") == Config.GROQ_MODEL)
+        return response
 
     @commands.command(name="usap")
     async def usap(self, ctx, *, message: str):
@@ -755,22 +822,18 @@ class ChatCog(commands.Cog):
             )
             return
 
-        # Add timestamp to rate limiting
-        self.user_message_timestamps[ctx.author.id].append(time.time())
-
-        # Prepare conversation history
-        channel_history = list(self.conversation_history[ctx.channel.id])
-        channel_history.append({"is_user": True, "content": message})
+        # Serialized with other replies in this channel so history turns never interleave
+        async with self.channel_locks[ctx.channel.id], ctx.typing():
+            # Prepare conversation history
+            channel_history = list(await self.get_channel_history(ctx.channel.id))
+            channel_history.append({"is_user": True, "content": message})
 
-        # Get AI response with typing indicator
-        async with ctx.typing():
-            response = await self.get_ai_response(channel_history)
+            # Send AI response as plain text (no embed)
+            response = await self.send_ai_reply(
+                ctx.channel, channel_history, self.use_response_cache("usap"))
             self.add_to_conversation(ctx.channel.id, True, message)
             self.add_to_conversation(ctx.channel.id, False, response)
 
-            # Send AI response as plain text (no embed)
-            await ctx.send(response)
-
     @commands.command(name="asklog")
     async def asklog(self, ctx, *, message: str):
         """Chat with Ginsilog AI and log to specific channel"""
@@ -780,22 +843,18 @@ class ChatCog(commands.Cog):
             )
             return
 
-        # Add timestamp to rate limiting
-        self.user_message_timestamps[ctx.author.id].append(time.time())
-
-        # Prepare conversation history
-        channel_history = list(self.conversation_history[ctx.channel.id])
-        channel_history.append({"is_user": True, "content": message})
+        # Serialized with other replies in this channel so history turns never interleave
+        async with self.channel_locks[ctx.channel.id], ctx.typing():
+            # Prepare conversation history
+            channel_history = list(await self.get_channel_history(ctx.channel.id))
+            channel_history.append({"is_user": True, "content": message})
 
-        # Get AI response with typing indicator
-        async with ctx.typing():
-            response = await self.get_ai_response(channel_history)
+            # Send AI response to the current channel
+            response = await self.send_ai_reply(
+                ctx.channel, channel_history, self.use_response_cache("asklog"))
             self.add_to_conversation(ctx.channel.id, True, message)
             self.add_to_conversation(ctx.channel.id, False, response)
 
-            # Send AI response to the current channel
-            await ctx.send(response)
-
             # Log the conversation to the designated channel ID
             log_channel = self.bot.get_channel(1345733998357512215)
             if log_channel:
@@ -806,7 +865,16 @@ class ChatCog(commands.Cog):
     @commands.command(name="clear")
     async def clear_history(self, ctx):
         """Clear the conversation history for the current channel"""
-        self.conversation_history[ctx.channel.id].clear()
+        async with self.channel_locks[ctx.channel.id]:
+            self.conversation_history[ctx.channel.id].clear()
+            if self.summarizer:
+                self.summarizer.clear(ctx.channel.id)
+            if self.retrieval:
+                self.retrieval.clear(ctx.channel.id)
+            try:
+                await self.conversation_store.clear(ctx.channel.id)
+            except Exception as e:
+                print(f"❌ Failed to clear stored history for channel {ctx.channel.id}: {e}")
 
         # Create polite embed for clearing history with blue left border (Discohook style)
         clear_embed = discord.Embed(
@@ -1083,6 +1151,47 @@ class ChatCog(commands.Cog):
 
 # ========== ADMIN COMMANDS ==========
 
+    @commands.command(name="aicache")
+    @commands.check(lambda ctx: any(role.id in Config.ADMIN_ROLE_IDS for role in ctx.author.roles))  # Admin roles check
+    async def aicache(self, ctx):
+        """Show AI response cache metrics"""
+        if self.response_cache is None:
+            await ctx.send("**AI response cache is disabled.**")
+            return
+        stats = self.response_cache.stats()
+        embed = discord.Embed(title="**AI RESPONSE CACHE**", color=Config.EMBED_COLOR_INFO)
+        embed.add_field(name="Hit rate", value=f"{stats['hit_rate']:.1%}", inline=True)
+        embed.add_field(name="Hits / misses", value=f"{stats['hits']:,} / {stats['misses']:,}", inline=True)
+        embed.add_field(name="Coalesced", value=f"{stats['coalesced']:,}", inline=True)
+        embed.add_field(name="Entries", value=f"{stats['size']:,}", inline=True)
+        embed.add_field(name="In flight", value=f"{stats['in_flight']:,}", inline=True)
+        await ctx.send(embed=embed)
+
+    @commands.command(name="aiqueue")
+    @commands.check(lambda ctx: any(role.id in Config.ADMIN_ROLE_IDS for role in ctx.author.roles))  # Admin roles check
+    async def aiqueue(self, ctx):
+        """Show AI request scheduler and resilience metrics"""
+        stats = self.llm.scheduler.stats()
+        embed = discord.Embed(title="**AI REQUEST QUEUE**", color=Config.EMBED_COLOR_INFO)
+        embed.add_field(name="Running", value=f"{stats['running']} / {self.llm.scheduler.max_concurrency}", inline=True)
+        embed.add_field(name="Queued", value=f"{stats['queued']:,}", inline=True)
+        embed.add_field(name="Shed", value=f"{stats['shed']:,} of {stats['dispatched'] + stats['shed']:,}", inline=True)
+        embed.add_field(name="Wait p50 / p99", value=f"{stats['wait_p50']:.2f}s / {stats['wait_p99']:.2f}s", inline=True)
+        lines = []
+        for guild_id, depth in stats["busiest_guilds"]:
+            guild = self.bot.get_guild(guild_id) if guild_id else None
+            lines.append(f"{guild.name if guild else guild_id or 'DM'}: {depth} waiting")
+        embed.add_field(name="Busiest guilds", value="\n".join(lines) or "Walang nakapila", inline=False)
+
+        resilience = self.llm.resilience_stats()
+        breakers = "\n".join(f"{model}: {state}" for model, state in resilience["breakers"].items())
+        embed.add_field(name="Circuit breakers", value=breakers or "Wala pang tawag", inline=False)
+        embed.add_field(name="Hedges won", value=(
+            f"{resilience['hedge_wins']:,} / {resilience['hedges']:,} ({resilience['hedge_win_rate']:.0%})"), inline=True)
+        embed.add_field(name="Hedge after", value=f"{resilience['hedge_delay']:.2f}s", inline=True)
+        embed.add_field(name="Sent to fallback", value=f"{resilience['fallbacks']:,}", inline=True)
+        await ctx.send(embed=embed)
+
     @commands.command(name="sagad")
     @commands.check(lambda ctx: any(role.id in Config.ADMIN_ROLE_IDS for role in ctx.author.roles))  # Admin roles check
     async def sagad(self, ctx, amount: int, member: discord.Member):
@@ -1095,7 +1204,7 @@ class ChatCog(commands.Cog):
             return await ctx.send("**BOBO!** WALA KANG TINUKOY NA USER!",
                                   delete_after=10)
 
-        self.add_coins(member.id, amount)
+        await self.add_coins(member.id, amount)
         await ctx.send(
             f"**ETO NA TOL GALING KAY BOSS MASON!** NAG-DAGDAG KA NG **₱{amount:,}** KAY {member.mention}! WAG MO ABUSUHIN YAN!",
             delete_after=10)
@@ -1111,15 +1220,16 @@ class ChatCog(commands.Cog):
         if not member:
             return await ctx.send("**BOBO!** WALA KANG TINUKOY NA USER!",
                                   delete_after=10)
-        if self.user_coins.get(member.id, 0) < amount:
+        balance = await self.get_user_balance(member.id)
+        if balance < amount:
             return await ctx.send(
-                f"**WALA KANG PERA!** {member.mention} BALANCE MO: **₱{self.user_coins.get(member.id, 0):,}**",
+                f"**WALA KANG PERA!** {member.mention} BALANCE MO: **₱{balance:,}**",
                 delete_after=10)
 
-        self.add_coins(member.id, -amount)  # Deduct coins
+        new_balance = await self.add_coins(member.id, -amount)  # Deduct coins
         await ctx.send(
             f"**BINAWASAN NI BOSS MASON KASI TANGA KA!** {member.mention} lost **₱{amount:,}**. "
-            f"New balance: **₱{self.user_coins.get(member.id, 0):,}**",
+            f"New balance: **₱{new_balance:,}**",
             delete_after=10)
 
     @commands.command(name="goodmorning")
@@ -1636,11 +1746,21 @@ class ChatCog(commands.Cog):
     @commands.command(name="leaderboard")
     async def leaderboard(self, ctx):
         """Display wealth rankings"""
-        # Import the database function
-        from bot.database import get_leaderboard
-
-        # Get top 20 users by balance from the database
-        sorted_users = get_leaderboard(20)
+        # Serve the cached embed while the top of the ranking is unchanged
+        cached = self._leaderboard_cache.get(ctx.guild.id)
+        if (cached and self.ranking.ready
+                and cached["version"] == self.ranking.top_version
+                and time.monotonic() - cached["built_at"] < Config.LEADERBOARD_CACHE_TTL):
+            return await ctx.send(embed=cached["embed"])
+
+        # Get top users by balance from the ranking index (database until it is built)
+        if self.ranking.ready:
+            version = self.ranking.top_version
+            sorted_users = self.ranking.top(Config.LEADERBOARD_SIZE)
+        else:
+            from bot.async_database import get_leaderboard
+            version = None
+            sorted_users = await get_leaderboard(Config.LEADERBOARD_SIZE)
 
         # Create the embed with cleaner design and consistent width (fewer emojis)
         embed = discord.Embed(
@@ -1675,28 +1795,62 @@ class ChatCog(commands.Cog):
         embed.description += f"\n\n{leaderboard_text}"
 
         # Add owner's profile picture to the footer
-        try:
-            owner = await self.bot.fetch_user(705770837399306332)
-            if owner and owner.avatar:
-                embed.set_footer(
-                    text=
-                    "DAPAT ANDITO KA SA TAAS! KUNGDI MAGTIPID KA GAGO! | Ginsilog Economy System",
-                    icon_url=owner.avatar.url)
-            else:
-                embed.set_footer(
-                    text=
-                    "DAPAT ANDITO KA SA TAAS! KUNGDI MAGTIPID KA GAGO! | Ginsilog Economy System"
-                )
-        except Exception as e:
-            print(f"Error fetching owner avatar: {e}")
-            # Fallback if there's any error
+        owner = await self._get_owner_user()
+        if owner and owner.avatar:
+            embed.set_footer(
+                text=
+                "DAPAT ANDITO KA SA TAAS! KUNGDI MAGTIPID KA GAGO! | Ginsilog Economy System",
+                icon_url=owner.avatar.url)
+        else:
             embed.set_footer(
                 text=
                 "DAPAT ANDITO KA SA TAAS! KUNGDI MAGTIPID KA GAGO! | Ginsilog Economy System"
             )
 
+        # Remember the embed until a balance in the top ranks changes
+        if version is not None:
+            self._leaderboard_cache[ctx.guild.id] = {
+                "version": version,
+                "embed": embed,
+                "built_at": time.monotonic()
+            }
+
         # Send the embed
         await ctx.send(embed=embed)
+
+    async def get_profile(self, user_id):
+        """Get a user's profile stats, cached briefly per user
+        
+        Balance and rank are overlaid from the balance cache and ranking index
+        when they know the user, since those are fresher than the database.
+        """
+        profile = self.profile_cache.get(user_id)
+        if profile is None:
+            from bot.async_database import get_user_stats
+            profile = await get_user_stats(user_id)
+            self.profile_cache.set(user_id, profile)
+
+        profile = dict(profile)
+        if self.balance_cache and self.balance_cache.peek(user_id) is not None:
+            profile['balance'] = self.balance_cache.peek(user_id)
+        rank = self.ranking.rank(user_id) if self.ranking.ready else None
+        if rank is not None:
+            profile['rank'] = rank
+        game = self.blackjack_games.get(user_id)
+        if game:
+            profile['has_active_game'] = True
+            profile['current_bet'] = game["bet"]
+        return profile
+
+    async def _get_owner_user(self):
+        """Get the bot owner's user object, fetching it over REST only once"""
+        if self._owner_user is None:
+            try:
+                self._owner_user = (self.bot.get_user(Config.OWNER_USER_ID)
+                                    or await self.bot.fetch_user(Config.OWNER_USER_ID))
+            except Exception as e:
+                print(f"Error fetching owner avatar: {e}")
+        return self._owner_user
         
     @commands.command(name="view")
     async def view(self, ctx, member: discord.Member = None):
@@ -1718,15 +1872,31 @@ class ChatCog(commands.Cog):
             color=Config.EMBED_COLOR_INFO
         )
         
-        # Add user's balance if available
-        from bot.database import get_user_balance
-        balance = get_user_balance(member.id)
-        if balance is not None:
+        # Load balance, rank, message count and game state in one read-only query
+        try:
+            profile = await self.get_profile(member.id)
+        except Exception as e:
+            print(f"Error loading profile for {member.id}: {e}")
+            profile = None
+
+        if profile:
             embed.add_field(
                 name="**💰 BALANCE:**",
-                value=f"**₱{balance:,}**",
+                value=f"**₱{profile['balance']:,}**",
                 inline=True
             )
+            if profile['rank'] != "Unranked":
+                embed.add_field(
+                    name="**🏆 RANK:**",
+                    value=f"**#{profile['rank']:,}**",
+                    inline=True
+                )
+            if profile['has_active_game']:
+                embed.add_field(
+                    name="**🃏 ACTIVE BLACKJACK:**",
+                    value=f"Bet: **₱{profile['current_bet']:,}**",
+                    inline=True
+                )
             
         # Add user's roles
         roles = [role.name for role in member.roles if role.name != "@everyone"]
@@ -1812,183 +1982,10 @@ class ChatCog(commands.Cog):
         status = "ON" if new_state else "OFF"
         await ctx.send(f"**MAINTENANCE MODE NOW:** `{status}`")
 
-    async def _regular_nickname_scan(self):
-        """Automatically scan and update all nicknames every few seconds"""
-        await self.bot.wait_until_ready()
-        while not self.bot.is_closed():
-            print("[Auto] Starting rapid nickname scan...")
-            try:
-                for guild in self.bot.guilds:
-                    # Use centralized configuration from config.py
-                    role_emoji_map = Config.ROLE_EMOJI_MAP
-                    role_names = Config.ROLE_NAMES
-                    
-                    # Bots to ignore in our server (these should never be renamed)
-                    BOTS_TO_IGNORE = [
-                        self.bot.user.id,  # Our own bot
-                    ] + Config.BOTS_TO_IGNORE
-                    
-                    # Helper function to convert text to Unicode bold style
-                    def to_unicode_bold(text):
-                        return ''.join(Config.UNICODE_MAP.get(c, c) for c in text)
-                    
-                    updated_count = 0
-                    skipped_count = 0
-                    failed_count = 0
-                    
-                    for member in guild.members:
-                        # Skip bots that are in our ignore list
-                        if member.bot and member.id in BOTS_TO_IGNORE:
-                            skipped_count += 1
-                            continue
-                            
-                        # Get member's roles sorted by position (highest first)
-                        member_roles = sorted(member.roles, key=lambda r: r.position, reverse=True)
-                        
-                        # Skip users with higher roles than the bot (like server owner)
-                        # Special override feature - we'll try to change the name anyway
-                        # FORCE EDIT EVERYONE - even server owner and admin users
-                        bot_member = guild.get_member(self.bot.user.id)
-                        if bot_member and member.top_role >= bot_member.top_role and not member.bot:
-                            try:
-                                # Get the highest role they should have emoji for
-                                highest_emoji = None
-                                highest_role_name = None
-                                for role in member_roles:
-                                    if role.id in role_emoji_map:
-                                        highest_emoji = role_emoji_map[role.id]
-                                        highest_role_name = role_names[role.id]
-                                        break
-                                        
-                                if highest_emoji:
-                                    # Clean name of emojis
-                                    clean_name = member.display_name
-                                    # Special case for cloud emoji (both variants)
-                                    clean_name = clean_name.replace("☁️", "").replace("☁", "")
-                                    # Handle all other emojis from the role map
-                                    for emoji_value in role_emoji_map.values():
-                                        while emoji_value in clean_name:
-                                            clean_name = clean_name.replace(emoji_value, '')
-                                    clean_name = clean_name.strip()
-                                    
-                                    # Unicode conversion
-                                    formatted_name = to_unicode_bold(clean_name)
-                                    suggested_name = f"{formatted_name} {highest_emoji}"
-                                    
-                                    # Log the information for manual handling
-                                    print(f"[HighRole] Need manual update for {member.name}: Change to '{suggested_name}' (Has {highest_role_name})")
-                                    
-                                    # Check if we should send a DM to the high-role user (once per day max)
-                                    high_role_key = f"high_role_dm_{member.id}"
-                                    if high_role_key not in self.user_message_timestamps or time.time() - self.user_message_timestamps.get(high_role_key, 0) > 86400:
-                                        try:
-                                            # We'll try to DM them with the suggested name
-                                            dm_embed = discord.Embed(
-                                                title="🏆 Nickname Format Suggestion",
-                                                description=f"Hi {member.name},\n\nAs a high-role member of the server, I can't automatically update your nickname. If you'd like to match the server format, please consider updating your nickname to:\n\n**{suggested_name}**\n\nThis matches your {highest_role_name} role.",
-                                                color=0x5865F2
-                                            )
-                                            await member.send(embed=dm_embed)
-                                            self.user_message_timestamps[high_role_key] = time.time()
-                                            print(f"[HighRole] Sent DM to {member.name} with nickname suggestion")
-                                        except Exception as e:
-                                            print(f"[HighRole] Couldn't DM {member.name}: {e}")
-                                    else:
-                                        # Skip sending DM as we've sent one recently
-                                        print(f"[HighRole] Skipping DM to {member.name} (sent within last 24 hours)")
-                            except Exception as e:
-                                print(f"[HighRole] Error processing high-role user {member.name}: {e}")
-                                
-                            # FORCE BYPASS: We won't skip high-role users anymore, we'll still try to edit them
-                            # This might cause errors but we'll try anyway since the owner requested it
-                            print(f"[HighRole] FORCE EDITING high-role user {member.name} as requested by server owner")
-                            
-                            # Special handling for server owner
-                            if member.id == member.guild.owner_id:
-                                print(f"[OwnerDetected] User {member.name} is the server owner.")
-                                # Only log, no DM in automatic scanning to avoid spam
-                            
-                            # We'll continue with the normal process instead of skipping
-                        
-                        # Get member's roles sorted by position (highest first)
-                        member_roles = sorted(member.roles, key=lambda r: r.position, reverse=True)
-                        
-                        # Find the highest role that's in our mapping
-                        highest_matched_role_id = None
-                        for role in member_roles:
-                            if role.id in role_emoji_map:
-                                highest_matched_role_id = role.id
-                                break
-                        
-                        # If no matching role found, use default (no emoji)
-                        # We'll still convert their name to Unicode bold style
-                        if not highest_matched_role_id:
-                            # Use a default format with no emoji for @everyone
-                            emoji = ""  # No emoji for default users
-                            role_name = "@everyone"
-                        else:
-                            # Get the emoji for this role
-                            emoji = role_emoji_map[highest_matched_role_id]
-                            role_name = role_names[highest_matched_role_id]
-                        
-                        # Format the name
-                        original_name = member.display_name
-                        
-                        # Clean name of all emojis
-                        clean_name = original_name
-                        
-                        # Special case for cloud emoji (both variants)
-                        clean_name = clean_name.replace("☁️", "").replace("☁", "")
-                        
-                        # Handle all other emojis from the role map
-                        for emoji_value in role_emoji_map.values():
-                            while emoji_value in clean_name:
-                                clean_name = clean_name.replace(emoji_value, '')
-                        
-                        # Remove any extra spaces
-                        clean_name = clean_name.strip()
-                        
-                        # Convert to Unicode bold style
-                        formatted_name = to_unicode_bold(clean_name)
-                        
-                        # Add the role emoji
-                        new_name = f"{formatted_name} {emoji}"
-                        
-                        # Skip if the name is already correctly formatted
-                        if member.display_name == new_name:
-                            skipped_count += 1
-                            continue
-                        
-                        # Update the name
-                        try:
-                            await member.edit(nick=new_name)
-                            updated_count += 1
-                            print(f"[Scan] Updated {member.name} to {new_name} with role {role_name}")
-                            # Very small delay to avoid rate limits but still be responsive
-                            await asyncio.sleep(0.1)
-                        except Exception as e:
-                            failed_count += 1
-                            print(f"[Scan] Failed to update {member.name}: {e}")
-                
-                print(f"[Auto] Rapid nickname scan complete! Updated: {updated_count}, Skipped: {skipped_count}, Failed: {failed_count}")
-            except Exception as e:
-                print(f"[Auto] Error during nickname scan: {e}")
-                
-            # Wait for only a few seconds before scanning again
-            await asyncio.sleep(10)  # 10 seconds between scans
-            
     @commands.command(name="setupnn")
     @commands.check(lambda ctx: any(role.id in Config.ADMIN_ROLE_IDS for role in ctx.author.roles))
     async def setupnn(self, ctx):
         """Set up name formatting based on highest role (admin only)"""
-        # Use the centralized configuration from config.py
-        role_emoji_map = Config.ROLE_EMOJI_MAP
-        role_names = Config.ROLE_NAMES
-        
-        # Function to convert text to Unicode bold style
-        def to_unicode_bold(text):
-            return ''.join(Config.UNICODE_MAP.get(c, c) for c in text)
-        
         # Status message and counter
         status_embed = discord.Embed(
             title="👑 𝐒𝐄𝐓𝐔𝐏𝐍𝐍 - 𝐍𝐀𝐌𝐄 𝐅𝐎𝐑𝐌𝐀𝐓𝐓𝐈𝐍𝐆 👑",
@@ -2012,50 +2009,7 @@ class ChatCog(commands.Cog):
                 skipped_count += 1
                 continue
                 
-            # Get member's roles sorted by position (highest first)
-            member_roles = sorted(member.roles, key=lambda r: r.position, reverse=True)
-            
-            # Find the highest role that's in our mapping
-            highest_matched_role_id = None
-            for role in member_roles:
-                if role.id in role_emoji_map:
-                    highest_matched_role_id = role.id
-                    break
-            
-            # If no matching role found, use default (no emoji)
-            # We'll still convert their name to Unicode bold style
-            if not highest_matched_role_id:
-                # Use a default format with no emoji for @everyone
-                emoji = ""  # No emoji for default users
-                role_name = "@everyone"
-            else:
-                # Get the emoji for this role
-                emoji = role_emoji_map[highest_matched_role_id]
-                role_name = role_names[highest_matched_role_id]
-            
-            # Format the name - completely rewritten for reliability
-            original_name = member.display_name
-            
-            # Step 1: Remove ALL role emojis from the name, regardless of position
-            clean_name = original_name
-            
-            # Special case for cloud emoji (both variants)
-            clean_name = clean_name.replace("☁️", "").replace("☁", "")
-            
-            # Handle all other emojis from the role map
-            for emoji_value in role_emoji_map.values():
-                # Keep removing this emoji until there are none left
-                while emoji_value in clean_name:
-                    clean_name = clean_name.replace(emoji_value, '')
-            
-            # Step 2: Remove any extra spaces that might be left
-            clean_name = clean_name.strip()
-            
-            # Step 3: Convert to Unicode bold style
-            formatted_name = to_unicode_bold(clean_name)
-            
-            # Add the role emoji
-            new_name = f"{formatted_name} {emoji}"
+            new_name, role_name = desired_nickname(member)
             
             # Skip if the name is already correctly formatted
             if member.display_name == new_name:
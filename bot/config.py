@@ -26,15 +26,99 @@ class Config:
     # Rate limiting settings
     RATE_LIMIT_MESSAGES = 5  
     RATE_LIMIT_PERIOD = 60   
+    # Per-scope limits as (messages, period_seconds); unlisted scopes use the values above
+    RATE_LIMITS = {
+        'chat': (RATE_LIMIT_MESSAGES, RATE_LIMIT_PERIOD),  # Mentions, g!usap and g!asklog
+    }
+    RATE_LIMIT_SNAPSHOT = os.getenv('RATE_LIMIT_SNAPSHOT', 'false').lower() == 'true'  # Persist limiter state across restarts
+
+    # Storage backend: "postgres" (DATABASE_URL) or "sqlite" (embedded file, single process)
+    DB_BACKEND = os.getenv('DB_BACKEND', 'postgres').lower()
+    SQLITE_PATH = os.getenv('SQLITE_PATH', 'ginsilog.db')
+
+    # Database connection pool settings
+    DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+    DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+    DB_QUERY_TIMEOUT = float(os.getenv('DB_QUERY_TIMEOUT', '10'))  # Seconds per query
+    DB_PREPING_IDLE = 30  # Ping pooled connections idle longer than this (seconds)
+    DB_MAX_RETRIES = 5  # Attempts to get a connection before giving up
+    DB_RETRY_BASE_DELAY = 0.5  # First retry delay in seconds, doubled each attempt
+    DB_RETRY_MAX_DELAY = 8  # Cap on the retry delay (seconds)
+    DB_MIGRATION_TIMEOUT = 3600  # Schema migrations may build indexes on large tables (seconds)
+
+    # Economy balance cache settings
+    BALANCE_CACHE_ENABLED = os.getenv('BALANCE_CACHE_ENABLED', 'true').lower() == 'true'
+    BALANCE_FLUSH_INTERVAL = 2  # Seconds between batched writes of cached balances
+    BALANCE_CACHE_SIZE = 10000  # Users kept in memory; least recently used balances with nothing to write are dropped
+
+    # Cache invalidation between bot processes sharing one database (LISTEN/NOTIFY)
+    CACHE_INVALIDATION_ENABLED = os.getenv('CACHE_INVALIDATION_ENABLED', 'false').lower() == 'true'
+    CACHE_INVALIDATION_CHANNEL = 'cache_invalidation'
+
+    # Leaderboard settings
+    LEADERBOARD_SIZE = 20
+    LEADERBOARD_CACHE_TTL = 300  # Rebuild a cached leaderboard at least this often (seconds) to refresh names
+    OWNER_USER_ID = 705770837399306332  # Shown in the leaderboard footer
+    PROFILE_CACHE_TTL = 30  # Seconds a g!view profile is reused before reloading it
+
+    # TTS audio store settings
+    AUDIO_STORE_DIR = os.getenv('AUDIO_STORE_DIR', 'audio_store')  # Content-addressed clip files
+    AUDIO_STORE_MAX_BYTES = int(os.getenv('AUDIO_STORE_MAX_BYTES', str(256 * 1024 * 1024)))  # Least recently used clips are evicted past this
+    AUDIO_TTS_KEEP = 200  # Newest TTS metadata rows kept by cleanup
+    TTS_OPUS_BITRATE = "32k"  # Speech is transparent at 32 kbps, well under Discord's default 64 kbps channels
+    TTS_TARGET_DBFS = -20.0  # Clips are normalized to this loudness when encoded
 
     # Conversation memory settings
     MAX_CONTEXT_MESSAGES = 10  # Increased for better conversation memory and coherence
+    HISTORY_FLUSH_INTERVAL = 1  # Seconds between batched writes of conversation turns
+    HISTORY_FLUSH_RETRIES = 5  # Flushes that retry a failed batch before it is split to isolate bad turns
+    CONTEXT_TOKEN_BUDGET = 1500  # Estimated prompt tokens per AI call (system prompt and newest turn always fit)
+    CONTEXT_MIN_TRUNCATED_TOKENS = 32  # Drop an older turn instead of sending less than this much of it
+    MENTION_BATCH_WINDOW = 0.3  # Seconds a channel's mentions are collected before one combined reply
+    MENTION_BATCH_MAX = 5  # Mentions answered in one reply; the rest form the next batch
+    SUMMARY_ENABLED = os.getenv('SUMMARY_ENABLED', 'true').lower() == 'true'  # Summarize turns that fall out of the history
+    SUMMARY_BATCH_TURNS = 6  # Evicted turns collected before the summary is updated
+    SUMMARY_MAX_PENDING = 50  # Evicted turns kept while summarizing keeps failing
+    SUMMARY_MAX_WORDS = 120  # Length asked of the running summary
+    SUMMARY_MAX_TOKENS = 250  # Completion limit for a summary update
+    RETRIEVAL_ENABLED = os.getenv('RETRIEVAL_ENABLED', 'true').lower() == 'true'  # Recall relevant older turns from message_history
+    RETRIEVAL_DIMENSIONS = 2048  # Hashed feature buckets per turn vector
+    RETRIEVAL_MAX_TURNS = 400  # Newest stored turns indexed per channel (sparse rows, about 12 bytes per word)
+    RETRIEVAL_MAX_CHANNELS = 32  # Channels kept indexed in memory, least recently used dropped first
+    RETRIEVAL_TOP_K = 3  # Older turns added to a prompt
+    RETRIEVAL_MIN_SCORE = 0.2  # Cosine similarity a turn needs to be recalled
+    RETRIEVAL_SNIPPET_CHARS = 300  # Recalled turns are cut to this length in the prompt
 
     # Groq API settings
     GROQ_MODEL = "mistral-saba-24b"  # Using exactly Mistral-SABA-24B as requested
     MAX_TOKENS = 200  # Keep this to ensure concise responses
     TEMPERATURE = 0.7  # Lowered to be much more coherent and human-like
 
+    # Async LLM client settings
+    LLM_MAX_CONCURRENCY = 8  # Completions in flight at once; more requests wait on the event loop
+    LLM_MAX_QUEUE = 64  # Waiting requests before new ones are turned away (background ones at half this)
+    LLM_MAX_QUEUE_PER_GUILD = 16  # Waiting text requests one guild may have before its new ones are turned away
+    LLM_WAIT_SAMPLES = 512  # Recent queue waits kept for the p50/p99 in g!aiqueue
+    LLM_TIMEOUT = 20  # Deadline per completion in seconds, including waiting for a slot
+    LLM_MAX_CONNECTIONS = 10  # HTTP/2 keep-alive connections to the API
+    LLM_KEEPALIVE_EXPIRY = 60  # Seconds an idle connection is kept open
+    LLM_BREAKER_FAILURES = 5  # Consecutive failures that open a model's circuit breaker
+    LLM_BREAKER_RESET = 30  # Seconds an open breaker refuses calls before letting one probe through
+    LLM_FALLBACK_MODEL = os.getenv('LLM_FALLBACK_MODEL', 'llama-3.1-8b-instant')  # Faster model for hedges and open circuits ('' to disable)
+    LLM_HEDGE_ENABLED = os.getenv('LLM_HEDGE_ENABLED', 'true').lower() == 'true'  # Also ask the fallback when GROQ_MODEL is slow
+    LLM_HEDGE_PERCENTILE = 0.95  # A completion slower than this share of recent ones gets hedged
+    LLM_HEDGE_MIN_DELAY = 2.0  # Never hedge sooner than this many seconds
+    LLM_LATENCY_SAMPLES = 200  # Recent GROQ_MODEL latencies kept for the hedge percentile
+    LLM_MIN_CALL_TIME = 0.5  # Seconds a request must have left when it gets a slot to be worth sending
+    STREAM_REPLIES = os.getenv('STREAM_REPLIES', 'true').lower() == 'true'  # Show chat replies while they are generated
+    STREAM_EDIT_INTERVAL = 1.0  # Minimum seconds between edits of streamed replies in one channel
+
+    # AI response cache settings
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    RESPONSE_CACHE_SIZE = 512  # Replies kept (least recently used are dropped first)
+    RESPONSE_CACHE_TTL = 120  # Seconds a cached reply can be reused
+    RESPONSE_CACHE_BYPASS = {'asklog'}  # Commands ("mention"/"voice" for those paths) that always get a fresh reply
+
     # Bot personality settings
     BOT_LANGUAGE = "Tagalog"  
     BOT_PERSONALITY = "Aggressively Rude and Insulting"  # Added personality descriptor
@@ -83,6 +167,10 @@ class Config:
         1345727357612195885: "𝐁𝐎𝐁𝐎",
     }
     
+    # Nickname engine settings
+    NICKNAME_SWEEP_INTERVAL = 3600  # Seconds between safety-net sweeps for nicknames that drifted
+    NICKNAME_EDIT_DELAY = 0.1  # Seconds between renames to stay clear of rate limits
+
     # Bots to ignore in nickname formatting
     BOTS_TO_IGNORE = [
         411916947773587456,  # Jockie Music
@@ -0,0 +1,58 @@
+from bot.config import Config
+
+# Tokens each chat message costs on top of its text (role and separators)
+MESSAGE_OVERHEAD = 4
+
+def estimate_tokens(text):
+    """Rough token count for a piece of text (about 4 characters per token)"""
+    return (len(text) + 3) // 4
+
+def message_tokens(turn):
+    """Token estimate for a history turn, computed once and kept on the turn"""
+    tokens = turn.get("tokens")
+    if tokens is None:
+        tokens = turn["tokens"] = estimate_tokens(turn["content"]) + MESSAGE_OVERHEAD
+    return tokens
+
+def build_context(system_prompt, history, budget=None, trimmed=None):
+    """Build chat completion messages that fit in a token budget
+
+    The system prompt and the newest turn are always sent whole. Older turns
+    are added newest first while they fit; the first one that does not fit
+    is cut down to the space left (if that is worth sending) and everything
+    older is dropped.
+
+    Args:
+        system_prompt (str): System message
+        history (list): {"is_user", "content"} turns, oldest first; each
+            turn's token estimate is cached on it under "tokens"
+        budget (int, optional): Defaults to Config.CONTEXT_TOKEN_BUDGET
+        trimmed (list, optional): Gets the turns that were dropped or cut
+            short, oldest first
+
+    Returns:
+        list: {"role", "content"} messages, system prompt first
+    """
+    budget = budget or Config.CONTEXT_TOKEN_BUDGET
+    remaining = budget - estimate_tokens(system_prompt) - MESSAGE_OVERHEAD
+
+    selected = []
+    kept = 0  # Newest turns sent whole
+    for index, turn in enumerate(reversed(history)):
+        role = "user" if turn["is_user"] else "assistant"
+        cost = message_tokens(turn)
+        if index == 0 or cost <= remaining:
+            selected.append({"role": role, "content": turn["content"]})
+            remaining -= cost
+            kept += 1
+            continue
+        room = remaining - MESSAGE_OVERHEAD
+        if room >= Config.CONTEXT_MIN_TRUNCATED_TOKENS:
+            # Keep the end of the turn, which is what the next turn answers
+            selected.append({"role": role, "content": "…" + turn["content"][-room * 4:]})
+        break
+
+    if trimmed is not None:
+        trimmed.extend(list(history)[:len(history) - kept])
+    selected.reverse()
+    return [{"role": "system", "content": system_prompt}] + selected
@@ -1,50 +1,176 @@
 import os
 import psycopg2
 import psycopg2.extras
+import psycopg2.pool
+import csv
+import io
+import json
+from contextlib import contextmanager
 from datetime import datetime
 import pytz
+import threading
 import time
 import sys
+import uuid
+
+from bot.config import Config
+from bot.audio_store import AudioStore
 
 # Get the database URL from environment variables
 DATABASE_URL = os.getenv('DATABASE_URL')
 
-def get_connection(max_retries=5, retry_delay=2):
-    """Create a connection to the PostgreSQL database with retry logic
+# Shared connection pool (created lazily on first use)
+_pool = None
+_pool_lock = threading.Lock()
+_last_used = {}  # id(connection): time the connection was last returned to the pool
+
+# Identifies this process in cache invalidation messages, so it can skip its own
+INSTANCE_ID = uuid.uuid4().hex
+
+class DatabaseUnavailable(Exception):
+    """Raised when no connection could be obtained, before any query was sent
+    
+    Callers can safely retry on this error since nothing reached the server.
+    """
+
+def _create_pool():
+    """Create the shared connection pool
+    
+    A single attempt is made here. Retrying is left to the caller so that the
+    async layer can back off without blocking the event loop.
     
-    Args:
-        max_retries (int): Maximum number of connection attempts
-        retry_delay (int): Delay between retries in seconds
-        
     Returns:
-        Connection: PostgreSQL database connection
+        ThreadedConnectionPool: Pool holding between DB_POOL_MIN and DB_POOL_MAX connections
     """
-    retry_count = 0
-    last_error = None
+    if not DATABASE_URL:
+        print("ERROR: No DATABASE_URL environment variable found.")
+        print("Make sure to set DATABASE_URL in your environment or .env file.")
+        sys.exit(1)
+    
+    # Server-side per-query timeout, applied to every pooled connection
+    timeout_ms = int(Config.DB_QUERY_TIMEOUT * 1000)
+    
+    try:
+        print("Connecting to database pool...")
+        return psycopg2.pool.ThreadedConnectionPool(
+            Config.DB_POOL_MIN,
+            Config.DB_POOL_MAX,
+            DATABASE_URL,
+            connect_timeout=max(1, int(Config.DB_QUERY_TIMEOUT)),
+            options=f"-c statement_timeout={timeout_ms}"
+        )
+    except psycopg2.OperationalError as e:
+        print(f"Database connection failed: {e}")
+        raise DatabaseUnavailable(str(e)) from e
+
+def get_pool():
+    """Get the shared connection pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _create_pool()
+    return _pool
+
+def _checkout():
+    """Take a live connection out of the pool
     
-    # Retry logic for database connection
-    while retry_count < max_retries:
+    Connections that were closed by the server are discarded, and connections
+    that sat idle longer than DB_PREPING_IDLE seconds are pinged first so a
+    stale socket never reaches a query.
+    """
+    pool = get_pool()
+    for _ in range(Config.DB_POOL_MAX + 1):
         try:
-            # If we're on Render, the DATABASE_URL should be set correctly
-            if DATABASE_URL:
-                print(f"Connecting to database (attempt {retry_count + 1}/{max_retries})...")
-                return psycopg2.connect(DATABASE_URL)
-            else:
-                print("ERROR: No DATABASE_URL environment variable found.")
-                print("Make sure to set DATABASE_URL in your environment or .env file.")
-                sys.exit(1)
-        except psycopg2.OperationalError as e:
-            last_error = e
-            retry_count += 1
-            if retry_count < max_retries:
-                print(f"Database connection failed, retrying in {retry_delay} seconds... ({retry_count}/{max_retries})")
-                time.sleep(retry_delay)
-            else:
-                print(f"Failed to connect to database after {max_retries} attempts: {e}")
-                raise
+            conn = pool.getconn()
+        except (psycopg2.OperationalError, psycopg2.pool.PoolError) as e:
+            raise DatabaseUnavailable(str(e)) from e
+        if conn.closed:
+            _last_used.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+            continue
+        last_used = _last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used > Config.DB_PREPING_IDLE:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                _last_used.pop(id(conn), None)
+                pool.putconn(conn, close=True)
+                continue
+        return conn
+    raise DatabaseUnavailable("No live database connection available in the pool")
+
+@contextmanager
+def get_connection():
+    """Borrow a connection from the shared pool
     
-    # If we got here, we've exhausted all retries
-    raise last_error if last_error else Exception("Failed to connect to database")
+    Commits on success, rolls back on error and always returns the
+    connection to the pool.
+    
+    Yields:
+        Connection: PostgreSQL database connection
+    """
+    conn = _checkout()
+    broken = False
+    try:
+        yield conn
+        conn.commit()
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if broken or conn.closed:
+            _last_used.pop(id(conn), None)
+            get_pool().putconn(conn, close=True)
+        else:
+            _last_used[id(conn)] = time.monotonic()
+            get_pool().putconn(conn)
+
+def close_pool():
+    """Close every pooled connection (called on shutdown)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _last_used.clear()
+
+def publish_invalidation(cur, scope, keys):
+    """Tell other bot processes that some cached rows have changed
+    
+    Sends a NOTIFY on CACHE_INVALIDATION_CHANNEL from inside the writer's
+    transaction, so it is only delivered if the write commits. Keys are
+    split across several notifications to stay under the payload limit.
+    Does nothing unless CACHE_INVALIDATION_ENABLED is set.
+    
+    Args:
+        cur (Cursor): Cursor of the writing transaction
+        scope (str): What changed, usually the table name
+        keys (list): IDs of the changed rows
+    """
+    if not Config.CACHE_INVALIDATION_ENABLED or not keys:
+        return
+    keys = list(keys)
+    for start in range(0, len(keys), 400):
+        payload = json.dumps({"origin": INSTANCE_ID, "scope": scope, "keys": keys[start:start + 400]})
+        cur.execute("SELECT pg_notify(%s, %s)", (Config.CACHE_INVALIDATION_CHANNEL, payload))
+
+# TTS clips are metadata only; the audio itself is kept in the AudioStore by hash
+AUDIO_TTS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS audio_tts (
+        id SERIAL PRIMARY KEY,
+        user_id BIGINT,
+        message TEXT,
+        content_hash TEXT,
+        size_bytes INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
 
 def init_db():
     """Initialize the database with required tables"""
@@ -55,7 +181,7 @@ def init_db():
                 CREATE TABLE IF NOT EXISTS users (
                     user_id BIGINT PRIMARY KEY,
                     coins BIGINT DEFAULT 50000,
-                    last_daily TIMESTAMP,
+                    last_daily TIMESTAMPTZ,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
@@ -72,12 +198,14 @@ def init_db():
                 )
             ''')
             
-            # Create rate_limit table for tracking user command usage
+            # Create rate_limit_buckets table for optional rate limiter snapshots
             cur.execute('''
-                CREATE TABLE IF NOT EXISTS rate_limit (
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    scope TEXT,
                     user_id BIGINT,
-                    timestamp TIMESTAMP,
-                    PRIMARY KEY (user_id, timestamp)
+                    tokens DOUBLE PRECISION,
+                    updated_epoch DOUBLE PRECISION,
+                    PRIMARY KEY (scope, user_id)
                 )
             ''')
             
@@ -93,20 +221,275 @@ def init_db():
                 )
             ''')
             
-            # Create audio_tts table for storing TTS audio data
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS audio_tts (
-                    id SERIAL PRIMARY KEY,
-                    user_id BIGINT,
-                    message TEXT,
-                    audio_data BYTEA,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+            # Create audio_tts table for TTS clip metadata (the audio lives in the AudioStore)
+            cur.execute(AUDIO_TTS_TABLE)
             
             conn.commit()
             print("✅ Database initialized successfully")
 
+# Schema Migrations
+def create_index_concurrently(conn, name, definition):
+    """Build an index without blocking writes to the table
+    
+    An index left INVALID by an earlier interrupted build is dropped and
+    rebuilt, since CREATE INDEX IF NOT EXISTS would otherwise skip it.
+    
+    Args:
+        conn (Connection): Connection in autocommit mode
+        name (str): Index name
+        definition (str): Everything after "ON", e.g. "users (coins DESC)"
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = %s",
+            (name,)
+        )
+        existing = cur.fetchone()
+        if existing and existing[0]:
+            return
+        if existing:
+            print(f"Rebuilding invalid index {name}")
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        cur.execute(f"CREATE INDEX CONCURRENTLY {name} ON {definition}")
+
+def backfill_in_batches(conn, statement, batch_size=1000):
+    """Run an UPDATE/DELETE repeatedly in small committed batches
+    
+    Keeps each transaction short so a large table can be rewritten while
+    the bot keeps using it. The statement must contain a LIMIT %s (usually
+    in a "WHERE id IN (SELECT id ... LIMIT %s)" subquery) and must stop
+    matching rows once they have been processed.
+    
+    Args:
+        conn (Connection): Connection in autocommit mode
+        statement (str): SQL with a single %s placeholder for the batch size
+        batch_size (int): Rows per batch
+        
+    Returns:
+        int: Total number of rows changed
+    """
+    total = 0
+    with conn.cursor() as cur:
+        while True:
+            cur.execute(statement, (batch_size,))
+            if cur.rowcount <= 0:
+                return total
+            total += cur.rowcount
+
+def move_audio_blobs_to_store(conn, batch_size=100):
+    """Copy audio_tts BYTEA payloads into the AudioStore and clear them
+    
+    Runs in small committed batches; rows that have been moved get their
+    content_hash set and their audio_data nulled, so an interrupted run
+    picks up where it stopped. Does nothing once audio_data is gone.
+    
+    Args:
+        conn (Connection): Connection in autocommit mode
+        batch_size (int): Clips per batch
+        
+    Returns:
+        int: Number of clips moved
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = 'audio_tts' AND column_name = 'audio_data'"
+        )
+        if cur.fetchone() is None:
+            return 0
+
+        store = AudioStore()
+        moved = 0
+        while True:
+            cur.execute(
+                "SELECT id, audio_data FROM audio_tts "
+                "WHERE audio_data IS NOT NULL AND content_hash IS NULL LIMIT %s",
+                (batch_size,)
+            )
+            rows = cur.fetchall()
+            if not rows:
+                return moved
+            updates = []
+            for audio_id, audio_data in rows:
+                data = bytes(audio_data)
+                updates.append((store.put(data), len(data), audio_id))
+            psycopg2.extras.execute_values(
+                cur,
+                "UPDATE audio_tts SET content_hash = v.hash, size_bytes = v.size, audio_data = NULL "
+                "FROM (VALUES %s) AS v (hash, size, id) WHERE audio_tts.id = v.id",
+                updates
+            )
+            moved += len(updates)
+
+def convert_last_daily_to_timestamptz(conn):
+    """Store users.last_daily as TIMESTAMPTZ, reading old values as Manila time
+    
+    Claims used to be stamped with the bot's Asia/Manila wall clock in a
+    plain TIMESTAMP column, while claim_daily compares against NOW().
+    Converting the column with the zone the values were written in keeps
+    every cooldown where it was. Does nothing once the column is
+    TIMESTAMPTZ (as init_db now creates it).
+    
+    Args:
+        conn (Connection): Connection in autocommit mode
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_name = 'users' AND column_name = 'last_daily'"
+        )
+        column = cur.fetchone()
+        if column is None or column[0] != "timestamp without time zone":
+            return
+        # users is small; the rewrite holds its lock only briefly
+        cur.execute(
+            "ALTER TABLE users ALTER COLUMN last_daily TYPE TIMESTAMPTZ "
+            "USING last_daily AT TIME ZONE 'Asia/Manila'"
+        )
+
+# Each migration is (version, description, steps). A step is either SQL text
+# or a function taking an autocommit connection, so index builds and
+# backfills can run online in as many transactions as they need. Steps must
+# be safe to re-run in case a migration is interrupted part way.
+MIGRATIONS = [
+    (1, "Index conversation history by channel and time", [
+        lambda conn: create_index_concurrently(
+            conn, "idx_message_history_channel_time",
+            "message_history (channel_id, timestamp DESC, id DESC)"),
+    ]),
+    (2, "Index users by balance for leaderboards and ranks", [
+        lambda conn: create_index_concurrently(
+            conn, "idx_users_coins", "users (coins DESC, user_id)"),
+    ]),
+    (3, "Index TTS audio by creation time", [
+        lambda conn: create_index_concurrently(
+            conn, "idx_audio_tts_created_at", "audio_tts (created_at DESC)"),
+    ]),
+    (4, "Move TTS audio out of the database into the content-addressed store", [
+        "ALTER TABLE audio_tts ADD COLUMN IF NOT EXISTS content_hash TEXT",
+        "ALTER TABLE audio_tts ADD COLUMN IF NOT EXISTS size_bytes INTEGER",
+        move_audio_blobs_to_store,
+        "ALTER TABLE audio_tts DROP COLUMN IF EXISTS audio_data",
+        lambda conn: create_index_concurrently(
+            conn, "idx_audio_tts_content_hash", "audio_tts (content_hash)"),
+    ]),
+    (5, "Store daily claim times with their time zone", [
+        convert_last_daily_to_timestamptz,
+    ]),
+]
+
+# Arbitrary constant used as the advisory lock key while migrating
+MIGRATION_LOCK_ID = 7283104
+
+def run_migrations():
+    """Apply every migration newer than the recorded schema version
+    
+    An advisory lock makes concurrently starting bot processes take turns,
+    so each migration is applied exactly once.
+    
+    Returns:
+        int: The schema version after migrating
+    """
+    with get_connection() as conn:
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                # Index builds and backfills may outlive the per-query timeout
+                cur.execute("SET statement_timeout = 0")
+                cur.execute('''
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        version INTEGER PRIMARY KEY,
+                        description TEXT,
+                        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+                    current = cur.fetchone()[0]
+                
+                for version, description, steps in MIGRATIONS:
+                    if version <= current:
+                        continue
+                    print(f"Applying migration {version}: {description}")
+                    for step in steps:
+                        if callable(step):
+                            step(conn)
+                        else:
+                            with conn.cursor() as cur:
+                                cur.execute(step)
+                    with conn.cursor() as cur:
+                        cur.execute(
+                            "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                            (version, description)
+                        )
+                    current = version
+            finally:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+                    cur.execute("RESET statement_timeout")
+        finally:
+            conn.autocommit = False
+    
+    print(f"✅ Database schema at version {current}")
+    return current
+
+# Queries on the hot path, with sample parameters, that must be served by an index
+HOT_QUERIES = {
+    "conversation_history": (
+        "SELECT is_user, content FROM message_history "
+        "WHERE channel_id = %s ORDER BY timestamp DESC, id DESC LIMIT %s",
+        (0, 10)
+    ),
+    "leaderboard": (
+        "SELECT user_id, coins FROM users ORDER BY coins DESC, user_id LIMIT %s",
+        (20,)
+    ),
+    "latest_audio_tts": (
+        "SELECT id, message FROM audio_tts ORDER BY created_at DESC LIMIT 1",
+        ()
+    ),
+}
+
+def _plan_indexes(plan):
+    """Collect the index names used anywhere in an EXPLAIN (FORMAT JSON) plan"""
+    found = []
+    if "Index Name" in plan:
+        found.append(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        found.extend(_plan_indexes(child))
+    return found
+
+def check_hot_query_indexes():
+    """EXPLAIN each hot query and report which index it uses
+    
+    Sequential scans are disabled for the check so that tiny development
+    tables still show whether a usable index exists.
+    
+    Returns:
+        dict: query name -> list of index names (empty means a full scan)
+    """
+    results = {}
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL enable_seqscan = off")
+            for name, (query, params) in HOT_QUERIES.items():
+                cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+                plan = cur.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                results[name] = _plan_indexes(plan[0]["Plan"])
+        conn.rollback()
+    
+    for name, indexes in results.items():
+        if indexes:
+            print(f"✅ {name} uses index {', '.join(indexes)}")
+        else:
+            print(f"⚠️ {name} does a full table scan")
+    return results
+
 # User Balance Functions
 def get_user_balance(user_id):
     """Get user's balance from the database"""
@@ -135,8 +518,9 @@ def add_coins(user_id, amount):
                 "RETURNING coins",
                 (user_id, 50000 + amount, amount)
             )
-            conn.commit()
             result = cur.fetchone()
+            publish_invalidation(cur, "users", [user_id])
+            conn.commit()
             return result[0] if result else 50000
 
 def deduct_coins(user_id, amount):
@@ -157,12 +541,131 @@ def deduct_coins(user_id, amount):
                 (amount, user_id, amount)
             )
             result = cur.fetchone()
+            if result:
+                publish_invalidation(cur, "users", [user_id])
             conn.commit()
             
             if result:
                 return result[0]
             return None  # Insufficient funds
 
+# Single round trip economy operations
+# Each runs as one query string (one round trip, one transaction) that first
+# makes sure the users exist and then updates them with row locks, so
+# concurrent commands cannot lose each other's updates.
+
+def transfer_coins(from_user_id, to_user_id, amount):
+    """Move coins between two users atomically
+    
+    Returns:
+        tuple: (sender_balance, receiver_balance) after the transfer, or
+        (sender_balance, None) if the sender has insufficient funds
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO users (user_id, coins) VALUES (%(sender)s, 50000), (%(receiver)s, 50000) "
+                "ON CONFLICT (user_id) DO NOTHING; "
+                "WITH debit AS ("
+                "  UPDATE users SET coins = coins - %(amount)s, updated_at = CURRENT_TIMESTAMP "
+                "  WHERE user_id = %(sender)s AND coins >= %(amount)s RETURNING coins"
+                "), credit AS ("
+                "  UPDATE users SET coins = coins + %(amount)s, updated_at = CURRENT_TIMESTAMP "
+                "  WHERE user_id = %(receiver)s AND EXISTS (SELECT 1 FROM debit) RETURNING coins"
+                ") "
+                "SELECT COALESCE((SELECT coins FROM debit), coins), (SELECT coins FROM credit) "
+                "FROM users WHERE user_id = %(sender)s",
+                {"sender": from_user_id, "receiver": to_user_id, "amount": amount}
+            )
+            result = cur.fetchone()
+            if result[1] is not None:
+                publish_invalidation(cur, "users", [from_user_id, to_user_id])
+            conn.commit()
+            return result
+
+def settle_bet(user_id, stake, payout):
+    """Take a stake and pay out winnings in a single update
+    
+    Args:
+        user_id (int): Discord user ID
+        stake (int): Coins the user puts up (must be covered by the balance)
+        payout (int): Coins paid back to the user (0 for a loss)
+        
+    Returns:
+        int: The new balance, or None if the user cannot cover the stake
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO users (user_id, coins) VALUES (%(user_id)s, 50000) "
+                "ON CONFLICT (user_id) DO NOTHING; "
+                "UPDATE users SET coins = coins - %(stake)s + %(payout)s, updated_at = CURRENT_TIMESTAMP "
+                "WHERE user_id = %(user_id)s AND coins >= %(stake)s RETURNING coins",
+                {"user_id": user_id, "stake": stake, "payout": payout}
+            )
+            result = cur.fetchone()
+            if result:
+                publish_invalidation(cur, "users", [user_id])
+            conn.commit()
+            return result[0] if result else None
+
+def claim_daily(user_id, amount, cooldown_seconds):
+    """Pay the daily reward if the cooldown has passed, in one statement
+    
+    The cooldown is checked and stamped with the database clock, so it does
+    not depend on the bot's timezone handling.
+    
+    Returns:
+        tuple: (new_balance, 0) when claimed, or (None, seconds_remaining)
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO users (user_id, coins) VALUES (%(user_id)s, 50000) "
+                "ON CONFLICT (user_id) DO NOTHING; "
+                "WITH claim AS ("
+                "  UPDATE users SET coins = coins + %(amount)s, last_daily = NOW(), updated_at = CURRENT_TIMESTAMP "
+                "  WHERE user_id = %(user_id)s AND (last_daily IS NULL "
+                "    OR last_daily <= NOW() - %(cooldown)s * INTERVAL '1 second') "
+                "  RETURNING coins"
+                ") "
+                "SELECT (SELECT coins FROM claim), "
+                "CASE WHEN EXISTS (SELECT 1 FROM claim) THEN 0 "
+                "ELSE GREATEST(0, EXTRACT(EPOCH FROM (last_daily + %(cooldown)s * INTERVAL '1 second' - NOW()))) END "
+                "FROM users WHERE user_id = %(user_id)s",
+                {"user_id": user_id, "amount": amount, "cooldown": cooldown_seconds}
+            )
+            new_balance, remaining = cur.fetchone()
+            if new_balance is not None:
+                publish_invalidation(cur, "users", [user_id])
+            conn.commit()
+            return new_balance, int(remaining)
+
+def apply_balance_deltas(deltas):
+    """Apply a batch of pending balance changes in a single statement
+    
+    Deltas are added to the stored balance rather than overwriting it, so a
+    write that happened elsewhere since the balance was cached is not lost.
+    
+    Args:
+        deltas (list): (user_id, delta) pairs, at most one per user
+    """
+    if not deltas:
+        return
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            psycopg2.extras.execute_values(
+                cur,
+                "INSERT INTO users (user_id, coins) "
+                "SELECT v.user_id::BIGINT, 50000 + v.delta::BIGINT FROM (VALUES %s) AS v(user_id, delta) "
+                "ON CONFLICT (user_id) DO UPDATE SET coins = users.coins + (EXCLUDED.coins - 50000), "
+                "updated_at = CURRENT_TIMESTAMP",
+                deltas,
+                page_size=len(deltas)
+            )
+            publish_invalidation(cur, "users", [user_id for user_id, _ in deltas])
+            conn.commit()
+
 def update_daily_cooldown(user_id):
     """Update user's daily claim timestamp"""
     ph_timezone = pytz.timezone('Asia/Manila')
@@ -175,6 +678,7 @@ def update_daily_cooldown(user_id):
                 "WHERE user_id = %s",
                 (current_time, user_id)
             )
+            publish_invalidation(cur, "users", [user_id])
             conn.commit()
 
 def get_daily_cooldown(user_id):
@@ -186,34 +690,33 @@ def get_daily_cooldown(user_id):
             return result[0] if result else None
 
 # Rate Limiting Functions
-def add_rate_limit_entry(user_id):
-    """Add a rate limit entry for a user"""
+def save_rate_limit_snapshot(rows):
+    """Replace the stored rate limiter state
+    
+    Args:
+        rows (list): (scope, user_id, tokens, updated_epoch) tuples from RateLimiter.snapshot()
+    """
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO rate_limit (user_id, timestamp) VALUES (%s, CURRENT_TIMESTAMP)",
-                (user_id,)
-            )
+            cur.execute("DELETE FROM rate_limit_buckets")
+            if rows:
+                psycopg2.extras.execute_values(
+                    cur,
+                    "INSERT INTO rate_limit_buckets (scope, user_id, tokens, updated_epoch) VALUES %s",
+                    rows
+                )
             conn.commit()
 
-def is_rate_limited(user_id, limit=5, period_seconds=60):
-    """Check if user is rate limited"""
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT COUNT(*) FROM rate_limit "
-                "WHERE user_id = %s AND timestamp > NOW() - INTERVAL '%s seconds'",
-                (user_id, period_seconds)
-            )
-            count = cur.fetchone()[0]
-            return count >= limit
-
-def clear_old_rate_limits():
-    """Clean up old rate limit entries (older than 1 hour)"""
+def load_rate_limit_snapshot():
+    """Get the stored rate limiter state
+    
+    Returns:
+        list: (scope, user_id, tokens, updated_epoch) tuples
+    """
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute("DELETE FROM rate_limit WHERE timestamp < NOW() - INTERVAL '1 hour'")
-            conn.commit()
+            cur.execute("SELECT scope, user_id, tokens, updated_epoch FROM rate_limit_buckets")
+            return cur.fetchall()
 
 # Conversation History Functions
 def add_to_conversation(channel_id, is_user, content):
@@ -226,23 +729,46 @@ def add_to_conversation(channel_id, is_user, content):
             )
             conn.commit()
 
+def add_conversation_batch(rows):
+    """Write many conversation turns with a single COPY
+    
+    Rows are copied in order, so their ids preserve the order of the turns.
+    
+    Args:
+        rows (list): (channel_id, is_user, content) tuples
+    """
+    if not rows:
+        return
+    buffer = io.StringIO()
+    # Quote text so an empty message is not read back as NULL
+    csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(rows)
+    buffer.seek(0)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.copy_expert(
+                "COPY message_history (channel_id, is_user, content) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+            conn.commit()
+
 def get_conversation_history(channel_id, limit=10):
     """Get recent conversation history for a channel"""
     with get_connection() as conn:
         with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
             cur.execute(
                 "SELECT is_user, content FROM message_history "
-                "WHERE channel_id = %s ORDER BY timestamp DESC LIMIT %s",
+                "WHERE channel_id = %s ORDER BY timestamp DESC, id DESC LIMIT %s",
                 (channel_id, limit)
             )
             # Return in reverse order (oldest first)
-            return reversed(cur.fetchall())
+            return list(reversed(cur.fetchall()))
 
 def clear_conversation_history(channel_id):
     """Clear conversation history for a channel"""
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("DELETE FROM message_history WHERE channel_id = %s", (channel_id,))
+            publish_invalidation(cur, "message_history", [channel_id])
             conn.commit()
 
 # Blackjack Game Functions
@@ -258,6 +784,7 @@ def save_blackjack_game(user_id, player_hand, dealer_hand, bet, game_state):
                 (user_id, player_hand, dealer_hand, bet, game_state, 
                  player_hand, dealer_hand, bet, game_state)
             )
+            publish_invalidation(cur, "blackjack_games", [user_id])
             conn.commit()
 
 def get_blackjack_game(user_id):
@@ -275,6 +802,7 @@ def delete_blackjack_game(user_id):
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("DELETE FROM blackjack_games WHERE user_id = %s", (user_id,))
+            publish_invalidation(cur, "blackjack_games", [user_id])
             conn.commit()
 
 # Leaderboard Functions
@@ -283,79 +811,75 @@ def get_leaderboard(limit=10):
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(
-                "SELECT user_id, coins FROM users ORDER BY coins DESC LIMIT %s",
+                "SELECT user_id, coins FROM users ORDER BY coins DESC, user_id LIMIT %s",
                 (limit,)
             )
             return cur.fetchall()
 
+def get_balances(user_ids):
+    """Get the stored balances of several users without creating any rows
+    
+    Returns:
+        dict: user_id: coins for the users that exist
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT user_id, coins FROM users WHERE user_id = ANY(%s)", (list(user_ids),))
+            return dict(cur.fetchall())
+
+def get_all_balances():
+    """Get every user's balance (used to build the in-memory ranking)
+    
+    Returns:
+        list: (user_id, coins) tuples
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT user_id, coins FROM users")
+            return cur.fetchall()
+
 # User Profile/Stats Functions
 def get_user_stats(user_id):
     """Get comprehensive user statistics from database
     
+    Balance, rank and blackjack state come back from a single read-only
+    query; a user without a row is reported with the starting balance
+    instead of being created.
+    
     Args:
         user_id (int): Discord user ID
         
     Returns:
         dict: User statistics including balance, rank, join date, etc.
     """
-    stats = {}
-    
     with get_connection() as conn:
         with conn.cursor() as cur:
-            # Get basic user info
-            cur.execute(
-                "SELECT coins, created_at, last_daily FROM users WHERE user_id = %s",
-                (user_id,)
-            )
-            user_data = cur.fetchone()
-            
-            if user_data:
-                stats['balance'] = user_data[0]
-                stats['join_date'] = user_data[1]
-                stats['last_daily'] = user_data[2]
-            else:
-                # User doesn't exist in database yet
-                stats['balance'] = 50000
-                stats['join_date'] = None
-                stats['last_daily'] = None
-            
-            # Get user rank by balance
             cur.execute(
                 """
-                SELECT position 
-                FROM (
-                    SELECT user_id, coins, 
-                    ROW_NUMBER() OVER (ORDER BY coins DESC) as position
-                    FROM users
-                ) as rankings
-                WHERE user_id = %s
+                SELECT u.coins, u.created_at, u.last_daily,
+                    CASE WHEN u.user_id IS NULL THEN NULL ELSE (
+                        SELECT COUNT(*) + 1 FROM users r
+                        WHERE r.coins > u.coins OR (r.coins = u.coins AND r.user_id < u.user_id)
+                    ) END,
+                    b.game_state, b.bet
+                FROM (SELECT %s::BIGINT AS user_id) AS q
+                LEFT JOIN users u ON u.user_id = q.user_id
+                LEFT JOIN blackjack_games b ON b.user_id = q.user_id
                 """,
                 (user_id,)
             )
-            rank_data = cur.fetchone()
-            stats['rank'] = rank_data[0] if rank_data else "Unranked"
-            
-            # Get message count
-            cur.execute(
-                "SELECT COUNT(*) FROM message_history WHERE channel_id = %s AND is_user = TRUE",
-                (user_id,)
-            )
-            message_count = cur.fetchone()
-            stats['message_count'] = message_count[0] if message_count else 0
-            
-            # Get blackjack stats if game exists
-            cur.execute(
-                "SELECT game_state, bet FROM blackjack_games WHERE user_id = %s",
-                (user_id,)
-            )
-            blackjack_data = cur.fetchone()
-            if blackjack_data:
-                stats['has_active_game'] = True
-                stats['game_state'] = blackjack_data[0]
-                stats['current_bet'] = blackjack_data[1]
-            else:
-                stats['has_active_game'] = False
-            
+            coins, created_at, last_daily, rank, game_state, bet = cur.fetchone()
+    
+    stats = {
+        'balance': coins if coins is not None else 50000,
+        'join_date': created_at,
+        'last_daily': last_daily,
+        'rank': rank if rank is not None else "Unranked",
+        'has_active_game': game_state is not None,
+    }
+    if game_state is not None:
+        stats['game_state'] = game_state
+        stats['current_bet'] = bet
     return stats
 
 # Audio TTS Functions
@@ -363,25 +887,18 @@ def init_audio_tts_table():
     """Initialize the audio_tts table"""
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS audio_tts (
-                    id SERIAL PRIMARY KEY,
-                    user_id BIGINT,
-                    message TEXT,
-                    audio_data BYTEA,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+            cur.execute(AUDIO_TTS_TABLE)
             conn.commit()
             print("✅ Audio TTS table initialized")
 
-def store_audio_tts(user_id, message, audio_data):
-    """Store TTS audio data in the database
+def store_audio_tts(user_id, message, content_hash, size_bytes):
+    """Record a TTS clip that has been saved to the AudioStore
     
     Args:
         user_id (int): Discord user ID
         message (str): The message that was converted to speech
-        audio_data (bytes): Binary audio data
+        content_hash (str): Hash returned by AudioStore.put
+        size_bytes (int): Size of the clip
         
     Returns:
         int: The ID of the stored audio
@@ -389,51 +906,113 @@ def store_audio_tts(user_id, message, audio_data):
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(
-                "INSERT INTO audio_tts (user_id, message, audio_data) VALUES (%s, %s, %s) RETURNING id",
-                (user_id, message, psycopg2.Binary(audio_data))
+                "INSERT INTO audio_tts (user_id, message, content_hash, size_bytes) "
+                "VALUES (%s, %s, %s, %s) RETURNING id",
+                (user_id, message, content_hash, size_bytes)
             )
             result = cur.fetchone()
             conn.commit()
             return result[0] if result else None
 
 def get_latest_audio_tts():
-    """Get the most recent TTS audio data
+    """Get the most recent TTS clip
     
     Returns:
-        tuple: (id, audio_data, message) or None if no audio exists
+        tuple: (id, content_hash, message) or None if no audio exists
     """
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT id, audio_data, message FROM audio_tts ORDER BY created_at DESC LIMIT 1")
+            cur.execute("SELECT id, content_hash, message FROM audio_tts ORDER BY created_at DESC LIMIT 1")
             result = cur.fetchone()
             return result if result else None
 
 def get_audio_tts_by_id(audio_id):
-    """Get TTS audio data by ID
+    """Get a TTS clip's hash by ID
     
     Args:
         audio_id (int): The ID of the audio to retrieve
         
     Returns:
-        bytes: Binary audio data or None if not found
+        str: AudioStore hash or None if not found
     """
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT audio_data FROM audio_tts WHERE id = %s", (audio_id,))
+            cur.execute("SELECT content_hash FROM audio_tts WHERE id = %s", (audio_id,))
             result = cur.fetchone()
             return result[0] if result else None
 
 def cleanup_old_audio_tts(keep_count=10):
-    """Delete old TTS audio data, keeping only the most recent entries
+    """Delete old TTS metadata, keeping only the most recent entries
+    
+    Walks the created_at index past the newest `keep_count` rows instead of
+    comparing every row against a NOT IN list.
     
     Args:
         keep_count (int): Number of recent entries to keep
+        
+    Returns:
+        list: Hashes no longer referenced by any row, whose clips can be removed
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute('''
+                WITH gone AS (
+                    DELETE FROM audio_tts a
+                    USING (
+                        SELECT id FROM audio_tts ORDER BY created_at DESC, id DESC OFFSET %s
+                    ) old
+                    WHERE a.id = old.id
+                    RETURNING a.id, a.content_hash
+                )
+                SELECT DISTINCT g.content_hash FROM gone g
+                WHERE g.content_hash IS NOT NULL
+                  AND NOT EXISTS (
+                      SELECT 1 FROM audio_tts a
+                      WHERE a.content_hash = g.content_hash
+                        AND NOT EXISTS (SELECT 1 FROM gone g2 WHERE g2.id = a.id)
+                  )
+            ''', (keep_count,))
+            orphaned = [row[0] for row in cur.fetchall()]
+            conn.commit()
+            print(f"✅ Cleaned up old TTS audio data, keeping {keep_count} recent entries")
+            return orphaned
+
+def referenced_audio_tts_hashes(content_hashes):
+    """Which of these clip hashes still have audio_tts rows
+    
+    Args:
+        content_hashes (list): AudioStore hashes
+        
+    Returns:
+        set: The hashes that are still referenced
+    """
+    if not content_hashes:
+        return set()
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT DISTINCT content_hash FROM audio_tts WHERE content_hash = ANY(%s)",
+                (list(content_hashes),)
+            )
+            return {row[0] for row in cur.fetchall()}
+
+def delete_audio_tts_by_hash(content_hashes):
+    """Delete the metadata rows of clips evicted from the AudioStore
+    
+    Args:
+        content_hashes (list): AudioStore hashes
+        
+    Returns:
+        int: Number of rows deleted
     """
+    if not content_hashes:
+        return 0
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(
-                "DELETE FROM audio_tts WHERE id NOT IN (SELECT id FROM audio_tts ORDER BY created_at DESC LIMIT %s)",
-                (keep_count,)
+                "DELETE FROM audio_tts WHERE content_hash = ANY(%s)",
+                (list(content_hashes),)
             )
+            deleted = cur.rowcount
             conn.commit()
-            print(f"✅ Cleaned up old TTS audio data, keeping {keep_count} recent entries")
\ No newline at end of file
+            return deleted
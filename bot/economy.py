@@ -0,0 +1,106 @@
+from bot import async_database
+
+class Economy:
+    """Economy operations used by the game and money commands
+
+    Every operation is a single step: an atomic in-memory update when the
+    write-behind balance cache is enabled, otherwise a single database round
+    trip that returns the new balances. Balance changes are also fed to the
+    ranking index.
+    """
+
+    def __init__(self, ranking, balance_cache=None):
+        self.ranking = ranking
+        self.balance_cache = balance_cache
+
+    async def get_balance(self, user_id):
+        """Get a user's balance"""
+        if self.balance_cache:
+            balance = await self.balance_cache.get(user_id)
+        else:
+            balance = await async_database.get_user_balance(user_id)
+        self.ranking.update(user_id, balance)
+        return balance
+
+    async def credit(self, user_id, amount):
+        """Add (or, with a negative amount, remove) coins
+
+        Returns:
+            int: The new balance
+        """
+        if self.balance_cache:
+            balance = await self.balance_cache.credit(user_id, amount)
+        else:
+            balance = await async_database.add_coins(user_id, amount)
+        self.ranking.update(user_id, balance)
+        return balance
+
+    async def transfer(self, from_user_id, to_user_id, amount):
+        """Move coins from one user to another
+
+        Returns:
+            tuple: (sender_balance, receiver_balance), or (sender_balance, None)
+            if the sender has insufficient funds
+        """
+        if from_user_id == to_user_id:
+            balance = await self.get_balance(from_user_id)
+            return balance, (balance if balance >= amount else None)
+
+        if self.balance_cache:
+            sender, receiver = await self.balance_cache.transfer(from_user_id, to_user_id, amount)
+        else:
+            sender, receiver = await async_database.transfer_coins(from_user_id, to_user_id, amount)
+        self.ranking.update(from_user_id, sender)
+        self.ranking.update(to_user_id, receiver)
+        return sender, receiver
+
+    async def settle_bet(self, user_id, stake, payout):
+        """Take a stake and pay out winnings together
+
+        Returns:
+            int: The new balance, or None if the user cannot cover the stake
+        """
+        if self.balance_cache:
+            balance = await self.balance_cache.settle(user_id, stake, payout)
+        else:
+            balance = await async_database.settle_bet(user_id, stake, payout)
+        self.ranking.update(user_id, balance)
+        return balance
+
+    async def refresh(self, user_ids=None):
+        """Pick up balance changes made by another bot process
+
+        Args:
+            user_ids (list, optional): Users whose rows changed; None if
+                anything may have changed, which rebuilds the ranking
+        """
+        if user_ids is None:
+            if self.balance_cache:
+                await self.balance_cache.refresh()
+            await self.ranking.rebuild(self.balance_cache.snapshot() if self.balance_cache else None)
+            return
+
+        balances = await self.balance_cache.refresh(user_ids) if self.balance_cache else {}
+        missing = [user_id for user_id in user_ids if user_id not in balances]
+        if missing:
+            balances.update(await async_database.get_balances(missing))
+        for user_id, balance in balances.items():
+            self.ranking.update(user_id, balance)
+
+    async def claim_daily(self, user_id, amount, cooldown_seconds):
+        """Pay the daily reward if the cooldown has passed
+
+        The cooldown lives only in the database, so this is always one round
+        trip; the cache is then told about the credited coins.
+
+        Returns:
+            tuple: (new_balance, 0) when claimed, or (None, seconds_remaining)
+        """
+        stored_balance, remaining = await async_database.claim_daily(user_id, amount, cooldown_seconds)
+        if stored_balance is None:
+            return None, remaining
+        balance = stored_balance
+        if self.balance_cache:
+            balance = self.balance_cache.observe(user_id, stored_balance, amount)
+        self.ranking.update(user_id, balance)
+        return balance, 0
@@ -15,7 +15,10 @@ import struct
 
 # Import from bot directory
 from bot.config import Config
-from bot.database import get_connection, store_audio_tts, get_audio_tts_by_id
+from bot.async_database import (store_audio_tts, cleanup_old_audio_tts, delete_audio_tts_by_hash,
+                                 referenced_audio_tts_hashes)
+from bot.audio_store import AudioStore
+from bot.opus_clip import encode_opus, read_clip_info, clip_source
 
 class EnhancedMusicQueue:
     """A queue system for music playback with enhanced features"""
@@ -88,6 +91,11 @@ class EnhancedMusicCog(commands.Cog):
         os.makedirs(self.temp_dir, exist_ok=True)
         os.makedirs(self.temp_tts_dir, exist_ok=True)
         
+        # Generated TTS clips, stored once per distinct audio
+        self.audio_store = AudioStore()  # Sized in cog_load, off the event loop
+        self._prune_task = None
+        self._clip_lock = asyncio.Lock()  # Keeps pruning from unlinking a clip that is being recorded
+        
         # Dictionary to store voice clients and queues per guild
         self.guild_music_data = {}
         
@@ -134,6 +142,7 @@ class EnhancedMusicCog(commands.Cog):
 
     async def cog_load(self):
         """Initialize music systems"""
+        await asyncio.get_running_loop().run_in_executor(None, self.audio_store.load)
         print("🔊 Enhanced Music Cog loaded with Edge TTS and local audio support")
     
     async def cog_unload(self):
@@ -201,7 +210,7 @@ class EnhancedMusicCog(commands.Cog):
                 return None
 
     async def generate_tts_audio(self, text, voice_name=None):
-        """Generate TTS audio using Edge TTS and save to file
+        """Generate TTS audio using Edge TTS and save it to the audio store
         
         Args:
             text (str): Text to convert to speech
@@ -212,24 +221,62 @@ class EnhancedMusicCog(commands.Cog):
         """
         if not voice_name:
             voice_name = random.choice(self.tts_voices)
-            
-        # Create a unique filename
-        filename = os.path.join(self.temp_tts_dir, f"tts_{random.randint(10000, 99999)}.mp3")
         
         try:
             communicate = edge_tts.Communicate(text, voice_name)
-            await communicate.save(filename)
+            chunks = []
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    chunks.append(chunk["data"])
+            audio_data = b"".join(chunks)
+            if not audio_data:
+                return None
             
-            # Store in database for future use
-            with open(filename, "rb") as f:
-                audio_data = f.read()
-                store_audio_tts(0, text, audio_data)
+            # Encode and write the clip once, off the event loop; the database only records its hash
+            loop = asyncio.get_running_loop()
+            opus_data = await loop.run_in_executor(None, encode_opus, audio_data)
+            async with self._clip_lock:
+                digest = await loop.run_in_executor(None, self.audio_store.put, opus_data)
+                await store_audio_tts(0, text, digest, len(opus_data))
+            self.schedule_prune()
                 
-            return filename
+            return self.audio_store.path(digest)
         except Exception as e:
             print(f"Error generating TTS audio: {e}")
             return None
     
+    def schedule_prune(self):
+        """Start prune_tts_audio in the background unless it is already running"""
+        if self._prune_task is None or self._prune_task.done():
+            self._prune_task = asyncio.create_task(self.prune_tts_audio())
+    
+    async def prune_tts_audio(self):
+        """Drop old TTS rows and clips, then evict clips if the store is too big"""
+        loop = asyncio.get_running_loop()
+        removed = []
+        try:
+            orphaned = await cleanup_old_audio_tts(Config.AUDIO_TTS_KEEP)
+            async with self._clip_lock:
+                # A clip may have been recorded again since its old rows were deleted
+                in_use = await referenced_audio_tts_hashes(orphaned)
+                for digest in orphaned:
+                    if digest not in in_use:
+                        await loop.run_in_executor(None, self.audio_store.remove, digest)
+                        removed.append(digest)
+            
+            if self.audio_store.needs_eviction():
+                evicted = await loop.run_in_executor(None, self.audio_store.evict)
+                await delete_audio_tts_by_hash(evicted)
+                removed.extend(evicted)
+                print(f"Evicted {len(evicted)} TTS clips from the audio store")
+        except Exception as e:
+            print(f"Error pruning TTS audio: {e}")
+        finally:
+            # The speech cog shares the store and remembers clip hashes of its own
+            speech_cog = self.bot.get_cog("SpeechRecognitionCog")
+            if speech_cog is not None:
+                speech_cog.forget_clips(removed)
+    
     @commands.command(name="join", aliases=["sumali"])
     async def join(self, ctx):
         """Join user's voice channel"""
@@ -388,23 +435,20 @@ class EnhancedMusicCog(commands.Cog):
                 await self.play_song(guild, text_channel)
                 return
                 
-            # Create the audio source
-            audio_source = discord.FFmpegPCMAudio(file_path)
-            
-            # Apply volume transformation
-            audio_source = discord.PCMVolumeTransformer(audio_source, volume=guild_data['volume'])
+            # Opus TTS clips are passed through as-is; other files are decoded with the guild volume
+            audio_source = clip_source(file_path, volume=guild_data['volume'])
+            if song.get('source') == 'tts' and not song.get('duration'):
+                with open(file_path, "rb") as f:
+                    info = read_clip_info(f.read(4096))
+                if info and info['duration']:
+                    song['duration'] = round(info['duration'])
             
             # Define what to do after the song ends
             def after_playing(error):
                 if error:
                     print(f"Player error: {error}")
                 
-                # Delete TTS audio files after playing
-                if song.get('source') == 'tts' and file_path and os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                    except:
-                        pass
+                # TTS clips stay in the audio store; it evicts them by size and recency
                 
                 # Set up the next song
                 asyncio.run_coroutine_threadsafe(self.play_next(guild, text_channel), self.bot.loop)
@@ -583,8 +627,8 @@ class EnhancedMusicCog(commands.Cog):
         # Set the new volume
         guild_data['volume'] = volume / 100
         
-        # Apply to current playback
-        if ctx.guild.voice_client and ctx.guild.voice_client.source:
+        # Apply to current playback (passed-through Opus clips have no volume control)
+        if ctx.guild.voice_client and isinstance(ctx.guild.voice_client.source, discord.PCMVolumeTransformer):
             ctx.guild.voice_client.source.volume = guild_data['volume']
             
         await ctx.send(f"🔊 **VOLUME:** Set to {volume}%")
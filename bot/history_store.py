@@ -0,0 +1,146 @@
+import asyncio
+
+from bot import async_database
+from bot.config import Config
+
+class ConversationStore:
+    """Persists conversation turns to message_history in batches
+
+    Turns are buffered in memory and written with one COPY every
+    HISTORY_FLUSH_INTERVAL seconds and on shutdown, so the number of
+    statements stays flat no matter how busy the channels are. Channels are
+    rehydrated from the database the first time they are used after startup.
+    """
+
+    def __init__(self, flush_interval=None):
+        self.flush_interval = flush_interval or Config.HISTORY_FLUSH_INTERVAL
+        self._buffer = []      # (channel_id, is_user, content) waiting to be written
+        self._loaded = set()   # channel IDs already rehydrated this session
+        self._loading = {}     # channel_id: in-flight rehydration
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+        self._failures = 0     # Flushes in a row that failed
+
+    def record(self, channel_id, is_user, content):
+        """Queue a turn for the next batched write"""
+        self._buffer.append((channel_id, is_user, content))
+
+    async def ensure_loaded(self, channel_id, history):
+        """Fill a channel's in-memory deque from the database once per session
+
+        Turns already in the deque (added before the load finished) are kept
+        after the stored ones.
+
+        Args:
+            channel_id (int): Discord channel ID
+            history (deque): The channel's in-memory history, updated in place
+        """
+        if channel_id in self._loaded:
+            return
+
+        load = self._loading.get(channel_id)
+        if load is None:
+            load = asyncio.ensure_future(
+                async_database.get_conversation_history(channel_id, history.maxlen))
+            self._loading[channel_id] = load
+            load.add_done_callback(lambda _: self._loading.pop(channel_id, None))
+        try:
+            rows = await load
+        except Exception as e:
+            print(f"❌ Failed to load conversation history for channel {channel_id}: {e}")
+            return
+
+        if channel_id in self._loaded:
+            return
+        self._loaded.add(channel_id)
+        recent = list(history)
+        history.clear()
+        for row in rows:
+            history.append({"is_user": row["is_user"], "content": row["content"]})
+        history.extend(recent)
+
+    async def load_with_unwritten(self, channel_id, limit):
+        """A channel's newest turns, stored and still buffered, oldest first
+
+        Flushes are held off while reading, so every turn is returned
+        exactly once.
+
+        Returns:
+            list: Up to `limit` {"is_user", "content"} dicts
+        """
+        async with self._flush_lock:
+            rows = await async_database.get_conversation_history(channel_id, limit)
+            turns = [{"is_user": row["is_user"], "content": row["content"]} for row in rows]
+            turns.extend({"is_user": is_user, "content": content}
+                         for buffered_channel, is_user, content in self._buffer
+                         if buffered_channel == channel_id)
+        return turns[-limit:]
+
+    async def clear(self, channel_id):
+        """Forget a channel's history, including turns not yet written"""
+        async with self._flush_lock:
+            self._buffer = [row for row in self._buffer if row[0] != channel_id]
+            self._loaded.add(channel_id)
+            await async_database.clear_conversation_history(channel_id)
+
+    async def flush(self):
+        """Write all buffered turns in one COPY
+
+        A failed batch is retried by the next HISTORY_FLUSH_RETRIES flushes.
+        After that it is written in halves, so a turn the database keeps
+        rejecting is dropped on its own instead of blocking every turn
+        behind it.
+        """
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+            try:
+                await async_database.add_conversation_batch(batch)
+            except Exception as e:
+                self._failures += 1
+                print(f"❌ Failed to write {len(batch)} conversation turns: {e}")
+                if self._failures <= Config.HISTORY_FLUSH_RETRIES:
+                    # Keep the turns (ahead of newer ones) for the next attempt
+                    self._buffer = batch + self._buffer
+                    return
+                await self._write_split(batch)
+            self._failures = 0
+
+    async def _write_split(self, rows):
+        """Write rows in halves, dropping any single turn that still fails"""
+        half = len(rows) // 2
+        for part in (rows[:half], rows[half:]):
+            if not part:
+                continue
+            try:
+                await async_database.add_conversation_batch(part)
+            except Exception as e:
+                if len(part) > 1:
+                    await self._write_split(part)
+                else:
+                    print(f"❌ Dropping conversation turn for channel {part[0][0]} after repeated failures: {e}")
+
+    async def _flush_loop(self):
+        """Flush buffered turns on a fixed interval"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        """Start the background flush task"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the background flush task and write out anything still buffered"""
+        if self._flush_task is not None:
+            # Cancel only between flushes so a batch is never cut off mid-write
+            async with self._flush_lock:
+                self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
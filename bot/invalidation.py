@@ -0,0 +1,149 @@
+import asyncio
+import json
+
+import psycopg2
+import psycopg2.extensions
+
+from bot import database
+from bot.config import Config
+
+class InvalidationBus:
+    """Receives cache invalidations published by other bot processes
+
+    Writers in bot.database send a NOTIFY with the scope (usually a table)
+    and the keys they changed. This bus keeps one dedicated LISTEN
+    connection, watched by the event loop, and hands each notification from
+    another process to the callbacks subscribed to its scope.
+
+    If the connection drops, notifications may have been missed, so after
+    reconnecting every callback is called with keys=None, meaning "drop
+    everything you cached for this scope".
+    """
+
+    def __init__(self, channel=None, dsn=None):
+        self.channel = channel or Config.CACHE_INVALIDATION_CHANNEL
+        self.dsn = dsn or database.DATABASE_URL
+        self._subscribers = {}  # scope: [async callback(keys)]
+        self._conn = None
+        self._task = None
+        self._lost = None  # Set when the LISTEN connection fails
+        self.received = 0
+
+    def subscribe(self, scope, callback):
+        """Call `callback(keys)` when another process changes rows in `scope`
+
+        Args:
+            scope (str): Scope published by the writers, e.g. "users"
+            callback (coroutine function): Receives a list of keys, or None
+                when everything in the scope must be treated as changed
+        """
+        self._subscribers.setdefault(scope, []).append(callback)
+
+    def _connect(self):
+        """Open the LISTEN connection (blocking, run in an executor)"""
+        # TCP keepalives make a silently dropped connection show up as readable with an error
+        conn = psycopg2.connect(
+            self.dsn,
+            connect_timeout=max(1, int(Config.DB_QUERY_TIMEOUT)),
+            keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3
+        )
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cur:
+            cur.execute(f'LISTEN "{self.channel}"')
+        return conn
+
+    def _on_readable(self):
+        """Drain notifications whenever the LISTEN socket has data"""
+        try:
+            self._conn.poll()
+        except psycopg2.Error as e:
+            print(f"❌ Cache invalidation connection lost: {e}")
+            self._lost.set()
+            return
+        while self._conn.notifies:
+            self._dispatch(self._conn.notifies.pop(0).payload)
+
+    def _dispatch(self, payload):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if message.get("origin") == database.INSTANCE_ID:
+            return
+        self.received += 1
+        self._notify(message.get("scope"), message.get("keys"))
+
+    def _notify(self, scope, keys):
+        for callback in self._subscribers.get(scope, []):
+            asyncio.create_task(self._run(callback, scope, keys))
+
+    async def _run(self, callback, scope, keys):
+        try:
+            await callback(keys)
+        except Exception as e:
+            print(f"❌ Cache invalidation handler for {scope} failed: {e}")
+
+    async def _listen_loop(self):
+        """Keep a LISTEN connection open, reconnecting with backoff"""
+        loop = asyncio.get_running_loop()
+        delay = Config.DB_RETRY_BASE_DELAY
+        first = True
+        while True:
+            try:
+                self._conn = await loop.run_in_executor(None, self._connect)
+            except psycopg2.Error as e:
+                print(f"❌ Cache invalidation listener could not connect, retrying in {delay:.1f} seconds: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, Config.DB_RETRY_MAX_DELAY)
+                continue
+
+            delay = Config.DB_RETRY_BASE_DELAY
+            if first:
+                print(f"✅ Listening for cache invalidations on {self.channel}")
+                first = False
+            else:
+                # Anything may have changed while we were not listening
+                for scope in self._subscribers:
+                    self._notify(scope, None)
+
+            self._lost = asyncio.Event()
+            fd = self._conn.fileno()
+            loop.add_reader(fd, self._on_readable)
+            try:
+                await self._lost.wait()
+            finally:
+                loop.remove_reader(fd)
+                self._conn.close()
+                self._conn = None
+
+    def start(self):
+        """Start listening in the background"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen_loop())
+
+    async def stop(self):
+        """Stop listening and close the connection"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+async def _watch():
+    """Print every invalidation published on the database (for manual testing)"""
+    bus = InvalidationBus()
+
+    def show(scope):
+        async def callback(keys):
+            print(f"{scope}: {keys if keys is not None else 'everything'}")
+        return callback
+
+    for scope in ("users", "blackjack_games", "message_history"):
+        bus.subscribe(scope, show(scope))
+    bus.start()
+    await asyncio.Event().wait()
+
+if __name__ == "__main__":
+    asyncio.run(_watch())
@@ -0,0 +1,287 @@
+import asyncio
+import time
+from collections import defaultdict
+
+import httpx
+from groq import APIConnectionError, APIStatusError, AsyncGroq
+
+from bot.config import Config
+from bot.llm_scheduler import LLMScheduler, PRIORITY_BACKGROUND, PRIORITY_TEXT
+from bot.resilience import CircuitBreaker, CircuitOpen, LatencyTracker
+
+class LLMClient:
+    """Shared async client for Groq's OpenAI-compatible chat completions
+
+    Every cog talks to the model through one instance, so all requests reuse
+    one pool of HTTP/2 keep-alive connections instead of tying up an
+    executor thread each. An LLMScheduler bounds how many completions are
+    in flight and decides, fairly across guilds and channels, who goes
+    next. Each request has a deadline that covers both the wait and the call,
+    and goes through a per-model circuit breaker.
+    """
+
+    def __init__(self, api_key=None, base_url="https://api.groq.com",
+                 max_concurrency=None, timeout=None):
+        self.timeout = timeout or Config.LLM_TIMEOUT
+        self.max_concurrency = max_concurrency or Config.LLM_MAX_CONCURRENCY
+        self._http = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=Config.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.LLM_MAX_CONNECTIONS,
+                keepalive_expiry=Config.LLM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(self.timeout, connect=5.0),
+        )
+        self._client = AsyncGroq(
+            api_key=api_key or Config.GROQ_API_KEY,
+            base_url=base_url,
+            http_client=self._http,
+            max_retries=1,
+        )
+        self.scheduler = LLMScheduler(self.max_concurrency)
+        self.breakers = defaultdict(CircuitBreaker)  # model: its circuit breaker
+        self.latency = LatencyTracker()  # Seconds taken by recent GROQ_MODEL completions
+        self.hedges = 0      # Fallback requests started because the primary was slow
+        self.hedge_wins = 0  # Hedges that answered first
+        self.fallbacks = 0   # Requests sent straight to the fallback model while the primary's circuit was open
+
+    def _pick_model(self, model):
+        """The model to call, switching to the fallback while model's circuit is open"""
+        if self.breakers[model].allow():
+            return model
+        fallback = Config.LLM_FALLBACK_MODEL
+        if fallback and fallback != model and self.breakers[fallback].allow():
+            self.fallbacks += 1
+            return fallback
+        raise CircuitOpen(f"{model} is failing; not calling it for now")
+
+    def hedge_delay(self):
+        """Seconds to wait on the primary model before also asking the fallback"""
+        slow = self.latency.percentile(Config.LLM_HEDGE_PERCENTILE) or 0
+        return max(Config.LLM_HEDGE_MIN_DELAY, slow)
+
+    def _should_hedge(self, model, priority):
+        fallback = Config.LLM_FALLBACK_MODEL
+        return (Config.LLM_HEDGE_ENABLED and fallback and model == Config.GROQ_MODEL
+                and fallback != model and priority != PRIORITY_BACKGROUND)
+
+    def _can_hedge_now(self):
+        """Hedge only with a free slot and nobody queued, so a hedge never delays other requests"""
+        return not self.scheduler.queued and self.scheduler.running < self.scheduler.max_concurrency
+
+    def _record_outcome(self, breaker, error):
+        """Count an error against the breaker only if the provider is to blame
+
+        Timeouts, connection errors, rate limits and 5xx responses are; a
+        rejected request (bad prompt, bad key, other 4xx) says nothing
+        about the provider's health.
+        """
+        if isinstance(error, (asyncio.TimeoutError, APIConnectionError, httpx.TransportError)):
+            breaker.record_failure()
+        elif isinstance(error, APIStatusError) and (error.status_code == 429 or error.status_code >= 500):
+            breaker.record_failure()
+
+    async def _call(self, model, deadline, route, dispatched=None, **kwargs):
+        """One completion on a scheduler slot, reported to the model's breaker
+
+        The breaker must already have allowed the call. Time spent waiting
+        for a slot is not the provider's fault: latency is measured from
+        dispatch, and a request dispatched with less than
+        LLM_MIN_CALL_TIME left gives up without calling the provider.
+
+        Args:
+            dispatched (asyncio.Event, optional): Set once the slot is held
+        """
+        breaker = self.breakers[model]
+        try:
+            await asyncio.wait_for(self.scheduler.acquire(*route), deadline - time.monotonic())
+        except BaseException:
+            breaker.release()
+            raise
+        try:
+            started = time.monotonic()
+            if deadline - started < Config.LLM_MIN_CALL_TIME:
+                raise asyncio.TimeoutError("Deadline used up waiting for a slot")
+            if dispatched is not None:
+                dispatched.set()
+            try:
+                response = await asyncio.wait_for(
+                    self._client.chat.completions.create(model=model, **kwargs),
+                    deadline - started,
+                )
+            except Exception as e:
+                self._record_outcome(breaker, e)
+                raise
+        finally:
+            breaker.release()
+            self.scheduler.release()
+        breaker.record_success()
+        if model == Config.GROQ_MODEL:
+            self.latency.record(time.monotonic() - started)
+        return response.choices[0].message.content
+
+    async def _hedged(self, model, deadline, route, info, **kwargs):
+        """Call model, and the fallback too if model has not answered within hedge_delay()
+
+        The delay counts from when the primary request got its slot. The
+        first successful reply wins and the other request is cancelled.
+        """
+        dispatched = asyncio.Event()
+        primary = asyncio.create_task(self._call(model, deadline, route, dispatched, **kwargs))
+        pending = {primary}
+        try:
+            waiting = asyncio.create_task(dispatched.wait())
+            try:
+                await asyncio.wait({primary, waiting}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                waiting.cancel()
+            if not primary.done():
+                await asyncio.wait(pending, timeout=self.hedge_delay())
+            if (primary.done() or not self._can_hedge_now()
+                    or not self.breakers[Config.LLM_FALLBACK_MODEL].allow()):
+                info["model"] = model
+                return await primary
+
+            hedge = asyncio.create_task(
+                self._call(Config.LLM_FALLBACK_MODEL, deadline, route, **kwargs))
+            self.hedges += 1
+            pending.add(hedge)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                            info["model"] = Config.LLM_FALLBACK_MODEL
+                        else:
+                            info["model"] = model
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def complete(self, messages, model=None, max_tokens=None, temperature=None,
+                       timeout=None, guild_id=None, channel_id=None, priority=PRIORITY_TEXT,
+                       info=None, **kwargs):
+        """Get a chat completion
+
+        Calls fail fast with CircuitOpen while the model (and the fallback)
+        keep failing. A text or voice request to GROQ_MODEL that takes longer
+        than hedge_delay() is also sent to LLM_FALLBACK_MODEL, and whichever
+        answers first is used.
+
+        Args:
+            messages (list): OpenAI-style {"role", "content"} dicts
+            model (str, optional): Defaults to Config.GROQ_MODEL
+            timeout (float, optional): Deadline in seconds, including time
+                spent waiting for a free slot. Defaults to Config.LLM_TIMEOUT.
+            guild_id, channel_id (int, optional): Who the request is for,
+                used to share slots fairly
+            priority (int): One of the llm_scheduler PRIORITY_* classes
+            info (dict, optional): Gets "model", the model that answered
+
+        Returns:
+            str: The reply text
+
+        Raises:
+            asyncio.TimeoutError: If the deadline passes
+            LLMOverloaded: If the scheduler shed the request
+            CircuitOpen: If the model is not being called right now
+        """
+        info = {} if info is None else info
+        deadline = time.monotonic() + (timeout or self.timeout)
+        model = self._pick_model(model or Config.GROQ_MODEL)
+        route = (guild_id, channel_id, priority)
+        params = dict(
+            messages=messages,
+            max_tokens=max_tokens or Config.MAX_TOKENS,
+            temperature=temperature if temperature is not None else Config.TEMPERATURE,
+            **kwargs,
+        )
+        if self._should_hedge(model, priority):
+            return await self._hedged(model, deadline, route, info, **params)
+        info["model"] = model
+        return await self._call(model, deadline, route, **params)
+
+    async def stream(self, messages, model=None, max_tokens=None, temperature=None,
+                     timeout=None, guild_id=None, channel_id=None, priority=PRIORITY_TEXT,
+                     info=None, **kwargs):
+        """Stream a chat completion as it is generated
+
+        The slot is held until the stream is exhausted or closed. The
+        deadline applies to the first token and then to each gap between
+        chunks, so a long reply is fine but a stalled one is not. Streams
+        go through the circuit breaker but are never hedged, since their
+        text is shown as it arrives. If `info` is given, info["model"] is
+        set to the model being streamed.
+
+        Yields:
+            str: Pieces of the reply text, in order
+
+        Raises:
+            asyncio.TimeoutError: If the deadline passes
+            LLMOverloaded: If the scheduler shed the request
+            CircuitOpen: If the model is not being called right now
+        """
+        timeout = timeout or self.timeout
+        model = self._pick_model(model or Config.GROQ_MODEL)
+        if info is not None:
+            info["model"] = model
+        breaker = self.breakers[model]
+        try:
+            await asyncio.wait_for(self.scheduler.acquire(guild_id, channel_id, priority), timeout)
+        except BaseException:
+            breaker.release()
+            raise
+        try:
+            response = await asyncio.wait_for(
+                self._client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens or Config.MAX_TOKENS,
+                    temperature=temperature if temperature is not None else Config.TEMPERATURE,
+                    stream=True,
+                    **kwargs,
+                ),
+                timeout,
+            )
+            try:
+                chunks = response.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                    except StopAsyncIteration:
+                        break
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                await response.close()
+        except Exception as e:
+            self._record_outcome(breaker, e)
+            raise
+        else:
+            breaker.record_success()
+        finally:
+            # Frees a half-open probe if the stream was closed early
+            breaker.release()
+            self.scheduler.release()
+
+    def resilience_stats(self):
+        """Breaker state per model, and how often hedging and the fallback were used"""
+        return {
+            "breakers": {model: breaker.state for model, breaker in self.breakers.items()},
+            "times_opened": sum(breaker.times_opened for breaker in self.breakers.values()),
+            "fallbacks": self.fallbacks,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_win_rate": self.hedge_wins / self.hedges if self.hedges else 0.0,
+            "hedge_delay": self.hedge_delay(),
+        }
+
+    async def aclose(self):
+        """Close the pooled connections"""
+        await self._http.aclose()
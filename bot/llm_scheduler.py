@@ -0,0 +1,171 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+
+from bot.config import Config
+
+# Priority classes, served strictly in this order
+PRIORITY_VOICE = 0       # Someone is waiting in a voice channel
+PRIORITY_TEXT = 1        # Mentions and chat commands
+PRIORITY_BACKGROUND = 2  # Work nobody is waiting on, like history summaries
+
+class LLMOverloaded(Exception):
+    """Raised instead of queueing a request when the queues are too deep
+
+    Nothing was sent to the API, so the caller can tell the user to try
+    again shortly.
+    """
+
+class _Request:
+    __slots__ = ("flow", "guild", "future", "queued_at", "cancelled")
+
+    def __init__(self, flow, guild, future):
+        self.flow = flow
+        self.guild = guild
+        self.future = future
+        self.queued_at = time.monotonic()
+        self.cancelled = False
+
+class LLMScheduler:
+    """Hands out completion slots fairly across guilds and channels
+
+    At most max_concurrency requests hold a slot at once. Waiting requests
+    are ordered by priority class first, then by start-time fair queuing:
+    every guild gets an equal share of the slots, split evenly between its
+    channels that have requests waiting, so one busy server cannot push
+    everyone else to the back of the line. New requests are shed with
+    LLMOverloaded once the queue, or the guild's share of it, is full;
+    background requests are shed at half the global limit.
+    """
+
+    def __init__(self, max_concurrency=None, max_queue=None, max_queue_per_guild=None):
+        self.max_concurrency = max_concurrency or Config.LLM_MAX_CONCURRENCY
+        self.max_queue = max_queue or Config.LLM_MAX_QUEUE
+        self.max_queue_per_guild = max_queue_per_guild or Config.LLM_MAX_QUEUE_PER_GUILD
+        self.running = 0
+        self._queue = []                  # (priority, start tag, seq, _Request)
+        self._seq = itertools.count()
+        self._virtual_time = 0.0          # Start tag of the request served last
+        self._finish = {}                 # flow: finish tag of its newest queued request
+        self._flow_depth = Counter()      # flow: requests waiting
+        self._guild_depth = Counter()     # guild: requests waiting
+        self._guild_flows = Counter()     # guild: flows with requests waiting
+        self._waits = deque(maxlen=Config.LLM_WAIT_SAMPLES)  # Seconds recent requests waited
+        self.dispatched = 0
+        self.shed = 0
+
+    @property
+    def queued(self):
+        return sum(self._flow_depth.values())
+
+    def _admit(self, guild, priority):
+        queued = self.queued
+        limit = self.max_queue // 2 if priority == PRIORITY_BACKGROUND else self.max_queue
+        if queued >= limit:
+            return False
+        if priority != PRIORITY_VOICE and self._guild_depth[guild] >= self.max_queue_per_guild:
+            return False
+        return True
+
+    def _enqueue(self, guild, channel, priority):
+        flow = (guild, channel)
+        if self._flow_depth[flow] == 0:
+            self._guild_flows[guild] += 1
+        self._flow_depth[flow] += 1
+        self._guild_depth[guild] += 1
+
+        # Each guild's weight of 1 is shared by its channels that are waiting
+        cost = self._guild_flows[guild]
+        start = max(self._virtual_time, self._finish.get(flow, 0.0))
+        self._finish[flow] = start + cost
+
+        request = _Request(flow, guild, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, (priority, start, next(self._seq), request))
+        return request
+
+    def _dequeued(self, request):
+        flow, guild = request.flow, request.guild
+        self._flow_depth[flow] -= 1
+        self._guild_depth[guild] -= 1
+        if self._flow_depth[flow] == 0:
+            del self._flow_depth[flow]
+            self._finish.pop(flow, None)
+            self._guild_flows[guild] -= 1
+            if self._guild_flows[guild] == 0:
+                del self._guild_flows[guild]
+        if self._guild_depth[guild] == 0:
+            del self._guild_depth[guild]
+
+    def _dispatch(self):
+        while self._queue and self.running < self.max_concurrency:
+            _, start, _, request = heapq.heappop(self._queue)
+            if request.cancelled or request.future.done():
+                # Gave up waiting; acquire() settles its counts
+                continue
+            self._dequeued(request)
+            self._virtual_time = max(self._virtual_time, start)
+            self.running += 1
+            self._waits.append(time.monotonic() - request.queued_at)
+            self.dispatched += 1
+            request.future.set_result(None)
+
+    async def acquire(self, guild_id=None, channel_id=None, priority=PRIORITY_TEXT):
+        """Wait for a slot
+
+        Raises:
+            LLMOverloaded: If the request was shed instead of queued
+        """
+        if self.running < self.max_concurrency and not self.queued:
+            self.running += 1
+            self._waits.append(0.0)
+            self.dispatched += 1
+            return
+        if not self._admit(guild_id, priority):
+            self.shed += 1
+            raise LLMOverloaded(f"{self.queued} LLM requests already waiting")
+
+        request = self._enqueue(guild_id, channel_id, priority)
+        try:
+            await request.future
+        except asyncio.CancelledError:
+            if request.future.done() and not request.future.cancelled():
+                # The slot was granted just as we gave up; pass it on
+                self.release()
+            elif not request.cancelled:
+                request.cancelled = True
+                self._dequeued(request)
+            raise
+
+    def release(self):
+        """Give a slot back and start the next waiting request"""
+        self.running -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, guild_id=None, channel_id=None, priority=PRIORITY_TEXT):
+        """Hold a slot for the duration of the block"""
+        await self.acquire(guild_id, channel_id, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        """Running and queued requests, the busiest guilds and recent wait times"""
+        waits = sorted(self._waits)
+
+        def percentile(p):
+            return waits[min(len(waits) - 1, int(len(waits) * p))] if waits else 0.0
+
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "busiest_guilds": self._guild_depth.most_common(3),
+            "dispatched": self.dispatched,
+            "shed": self.shed,
+            "wait_p50": percentile(0.5),
+            "wait_p99": percentile(0.99),
+        }
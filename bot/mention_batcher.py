@@ -0,0 +1,67 @@
+import asyncio
+
+from bot.config import Config
+
+class MentionBatcher:
+    """Collects a channel's mentions for a short window and answers them together
+
+    The first mention in a quiet channel starts a MENTION_BATCH_WINDOW timer;
+    mentions that arrive before it fires join the same batch, so a burst
+    costs one completion instead of one per message. Batches are handled
+    while holding the channel's lock from `locks`, which anything else that
+    reads and appends to the channel's history should hold too. Mentions
+    that arrive while a batch is being answered start the next batch.
+    """
+
+    def __init__(self, handler, locks, window=None, max_batch=None):
+        """
+        Args:
+            handler (coroutine function): Called as handler(channel, items)
+            locks (mapping): channel_id: asyncio.Lock, e.g. defaultdict(asyncio.Lock)
+        """
+        self.handler = handler
+        self.locks = locks
+        self.window = window if window is not None else Config.MENTION_BATCH_WINDOW
+        self.max_batch = max_batch or Config.MENTION_BATCH_MAX
+        self._pending = {}  # channel_id: items waiting for the window to close
+        self._timers = {}   # channel_id: task that will handle the pending items
+        self._tasks = set()  # Every batch task, waiting or answering
+
+    def submit(self, channel, item):
+        """Queue an item for the channel's next batch"""
+        self._pending.setdefault(channel.id, []).append(item)
+        if channel.id not in self._timers:
+            self._schedule(channel)
+
+    def _schedule(self, channel):
+        task = asyncio.create_task(self._run(channel))
+        self._timers[channel.id] = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, channel):
+        await asyncio.sleep(self.window)
+        async with self.locks[channel.id]:
+            pending = self._pending.pop(channel.id, [])
+            batch, rest = pending[:self.max_batch], pending[self.max_batch:]
+            if rest:
+                # Too many for one reply; they go out as the next batch
+                self._pending[channel.id] = rest
+                self._schedule(channel)
+            else:
+                self._timers.pop(channel.id, None)
+            if not batch:
+                return
+            try:
+                await self.handler(channel, batch)
+            except Exception as e:
+                print(f"❌ Failed to answer {len(batch)} mentions in channel {channel.id}: {e}")
+
+    async def stop(self):
+        """Drop pending mentions and cancel any batch still being answered"""
+        tasks = list(self._tasks)
+        self._timers.clear()
+        self._pending.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,87 @@
+from bot.config import Config
+
+# Writing this ID anywhere in a message calls the bot, even without a real mention
+SECRET_ID = '1346359556711776299'
+
+# Routes a message can take
+ROUTE_COMMAND = "command"
+ROUTE_SECRET_MENTION = "secret_mention"
+ROUTE_MENTION = "mention"
+ROUTE_VOICE_TEXT = "voice_text"
+
+class MessageRouter:
+    """Classifies every incoming message once and hands it to one handler
+
+    Replaces per-cog on_message listeners, so a message is inspected once
+    instead of by every cog. The checks run cheapest first, and most
+    messages in a busy server fall through all of them without a handler:
+
+    1. Starts with the command prefix: discord.py command processing
+    2. Contains the secret ID: ChatCog mention reply
+    3. Mentions the bot: ChatCog mention reply
+    4. Sent in a guild where voice listening is on: SpeechRecognitionCog
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.prefix = Config.COMMAND_PREFIX
+        self._mention_tokens = None  # ("<@id>", "<@!id>"), set once the bot has logged in
+
+    def _mentions_bot(self, message):
+        if not message.mentions:
+            return False
+        bot_id = self.bot.user.id
+        # message.mentions also covers replies that ping the bot
+        return any(user.id == bot_id for user in message.mentions)
+
+    def _strip_mention(self, content):
+        if self._mention_tokens is None:
+            bot_id = self.bot.user.id
+            self._mention_tokens = (f'<@{bot_id}>', f'<@!{bot_id}>')
+        for token in self._mention_tokens:
+            content = content.replace(token, '')
+        return content.strip()
+
+    def classify(self, message):
+        """Pick a message's route
+
+        Returns:
+            tuple: (route, content) with the text meant for the handler, or
+                (None, None) if no handler wants the message
+        """
+        if message.author.bot:
+            return None, None
+        content = message.content
+        if content.startswith(self.prefix):
+            return ROUTE_COMMAND, content
+        if SECRET_ID in content:
+            return ROUTE_SECRET_MENTION, content.replace(SECRET_ID, '').strip()
+        if self._mentions_bot(message):
+            return ROUTE_MENTION, self._strip_mention(content)
+        if message.guild is not None:
+            speech_cog = self.bot.get_cog("SpeechRecognitionCog")
+            if speech_cog and message.guild.id in speech_cog.listening_guilds:
+                return ROUTE_VOICE_TEXT, content
+        return None, None
+
+    async def dispatch(self, message):
+        """Route a message to its handler"""
+        route, content = self.classify(message)
+        if route is None:
+            return
+        if route == ROUTE_COMMAND:
+            await self.bot.process_commands(message)
+            return
+
+        if route == ROUTE_VOICE_TEXT:
+            speech_cog = self.bot.get_cog("SpeechRecognitionCog")
+            await speech_cog.handle_text_message(message)
+            return
+
+        chat_cog = self.bot.get_cog("ChatCog")
+        if chat_cog is None:
+            return
+        if route == ROUTE_SECRET_MENTION:
+            print(f"✅ Bot secret ID mention detected from {message.author.name}")
+            content = content or "Bakit mo ako tinatawag gamit ang ID ko?"
+        await chat_cog.handle_mention(message, content)
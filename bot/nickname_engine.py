@@ -0,0 +1,171 @@
+import asyncio
+import time
+
+import discord
+
+from bot.config import Config
+
+def highest_mapped_role(member):
+    """The member's highest role that has an emoji in ROLE_EMOJI_MAP, or None"""
+    # member.roles is already ordered lowest to highest
+    for role in reversed(member.roles):
+        if role.id in Config.ROLE_EMOJI_MAP:
+            return role
+    return None
+
+def format_nickname(display_name, emoji):
+    """Server nickname format: the name without role emojis, in Unicode bold, then the role emoji"""
+    # Cloud emoji appears both with and without the variation selector
+    clean_name = display_name.replace("☁️", "").replace("☁", "")
+    for emoji_value in Config.ROLE_EMOJI_MAP.values():
+        clean_name = clean_name.replace(emoji_value, '')
+    formatted_name = ''.join(Config.UNICODE_MAP.get(c, c) for c in clean_name.strip())
+    # Discord trims nicknames, so members without an emoji get no trailing space
+    return f"{formatted_name} {emoji}".rstrip()
+
+def desired_nickname(member):
+    """The nickname a member should have, and the name of the role that decided it
+
+    Returns:
+        tuple: (nickname, role name)
+    """
+    role = highest_mapped_role(member)
+    if role is None:
+        return format_nickname(member.display_name, ""), "@everyone"
+    return (format_nickname(member.display_name, Config.ROLE_EMOJI_MAP[role.id]),
+            Config.ROLE_NAMES[role.id])
+
+class NicknameEngine:
+    """Keeps member nicknames in the server format as members and roles change
+
+    Member joins, member updates and changes to mapped roles mark members
+    dirty; one worker fixes dirty members one at a time, paced by
+    NICKNAME_EDIT_DELAY. Members already in the right format cost a string
+    comparison and no API call or log line, so an idle server costs nothing.
+    A sweep every NICKNAME_SWEEP_INTERVAL seconds (and once at startup)
+    marks anyone that drifted while events were missed, e.g. during a
+    disconnect.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._dirty = {}  # (guild_id, member_id): None, in the order they were marked
+        self._wakeup = asyncio.Event()
+        self._worker_task = None
+        self._sweep_task = None
+        self.high_role_dm_times = {}  # user_id: time of the last nickname suggestion DM
+
+    def _ignored(self, member):
+        return member.bot and (member.id == self.bot.user.id or member.id in Config.BOTS_TO_IGNORE)
+
+    def mark_dirty(self, member):
+        """Queue a member to be checked"""
+        if self._ignored(member):
+            return
+        self._dirty[(member.guild.id, member.id)] = None
+        self._wakeup.set()
+
+    def mark_role(self, role):
+        """Queue everyone with a role whose emoji or position matters"""
+        if role.id in Config.ROLE_EMOJI_MAP:
+            for member in role.members:
+                self.mark_dirty(member)
+
+    async def sweep(self, guild):
+        """Queue every member of a guild whose nickname is out of format"""
+        marked = 0
+        for index, member in enumerate(guild.members):
+            if not self._ignored(member) and member.display_name != desired_nickname(member)[0]:
+                self.mark_dirty(member)
+                marked += 1
+            if index % 1000 == 999:
+                # Let other events through while walking a large guild
+                await asyncio.sleep(0)
+        if marked:
+            print(f"[Nicknames] Sweep of {guild.name} found {marked} members to update")
+
+    async def _sweep_loop(self):
+        await self.bot.wait_until_ready()
+        while True:
+            for guild in list(self.bot.guilds):
+                try:
+                    await self.sweep(guild)
+                except Exception as e:
+                    print(f"[Nicknames] Sweep of {guild.name} failed: {e}")
+            await asyncio.sleep(Config.NICKNAME_SWEEP_INTERVAL)
+
+    async def _suggest_to_high_role(self, member, suggested_name, role_name):
+        """DM a member the bot cannot rename their suggested nickname, at most once a day"""
+        if time.time() - self.high_role_dm_times.get(member.id, 0) <= 86400:
+            return
+        self.high_role_dm_times[member.id] = time.time()
+        try:
+            dm_embed = discord.Embed(
+                title="🏆 Nickname Format Suggestion",
+                description=f"Hi {member.name},\n\nAs a high-role member of the server, I can't automatically update your nickname. If you'd like to match the server format, please consider updating your nickname to:\n\n**{suggested_name}**\n\nThis matches your {role_name} role.",
+                color=0x5865F2
+            )
+            await member.send(embed=dm_embed)
+            print(f"[HighRole] Sent DM to {member.name} with nickname suggestion")
+        except Exception as e:
+            print(f"[HighRole] Couldn't DM {member.name}: {e}")
+
+    async def apply(self, member):
+        """Bring one member's nickname into format if it is not already
+
+        Returns:
+            bool: Whether a rename was sent to Discord
+        """
+        new_name, role_name = desired_nickname(member)
+        if member.display_name == new_name:
+            return False
+
+        bot_member = member.guild.me
+        if bot_member and member.top_role >= bot_member.top_role:
+            # Discord will not let us rename them; suggest the name instead
+            if highest_mapped_role(member) is not None:
+                await self._suggest_to_high_role(member, new_name, role_name)
+            if member.id == member.guild.owner_id:
+                return False
+
+        try:
+            await member.edit(nick=new_name)
+            print(f"[Nicknames] Updated {member.name} to {new_name} with role {role_name}")
+        except Exception as e:
+            print(f"[Nicknames] Failed to update {member.name}: {e}")
+        return True
+
+    async def _worker(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._dirty:
+                guild_id, member_id = next(iter(self._dirty))
+                del self._dirty[(guild_id, member_id)]
+                guild = self.bot.get_guild(guild_id)
+                member = guild.get_member(member_id) if guild else None
+                if member is None:
+                    continue
+                try:
+                    renamed = await self.apply(member)
+                except Exception as e:
+                    print(f"[Nicknames] Error checking {member.name}: {e}")
+                    continue
+                if renamed:
+                    # Space out renames to stay clear of rate limits
+                    await asyncio.sleep(Config.NICKNAME_EDIT_DELAY)
+
+    def start(self):
+        """Start the worker and the reconciliation sweep"""
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = asyncio.create_task(self._worker())
+        if self._sweep_task is None or self._sweep_task.done():
+            self._sweep_task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        """Stop the worker and the sweep; members still queued are picked up by the next startup sweep"""
+        tasks = [task for task in (self._worker_task, self._sweep_task) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker_task = self._sweep_task = None
@@ -0,0 +1,135 @@
+import io
+import struct
+
+import discord
+from pydub import AudioSegment
+
+from bot.config import Config
+
+# Comment fields written into each clip's OpusTags header
+DURATION_TAG = "DURATION_MS"
+LOUDNESS_TAG = "LOUDNESS_DBFS"
+
+def encode_opus(audio_data, source_format="mp3"):
+    """Re-encode a TTS clip as Ogg/Opus ready to be sent to Discord as-is
+
+    The clip is resampled to 48 kHz stereo (what Discord voice expects),
+    normalized to TTS_TARGET_DBFS so clips play at an even level without a
+    volume transform, and encoded at TTS_OPUS_BITRATE. The measured duration
+    and loudness are written into the OpusTags header.
+
+    This decodes once, so run it off the event loop.
+
+    Args:
+        audio_data (bytes): Clip in `source_format`
+        source_format (str): Anything ffmpeg can read, e.g. "mp3"
+
+    Returns:
+        bytes: The Ogg/Opus file
+    """
+    segment = AudioSegment.from_file(io.BytesIO(audio_data), format=source_format)
+    loudness = segment.dBFS
+    if loudness != float("-inf"):
+        segment = segment.apply_gain(Config.TTS_TARGET_DBFS - loudness)
+    segment = segment.set_frame_rate(48000).set_channels(2)
+
+    output = io.BytesIO()
+    segment.export(
+        output,
+        format="ogg",
+        codec="libopus",
+        bitrate=Config.TTS_OPUS_BITRATE,
+        parameters=["-application", "voip", "-frame_duration", "20"],
+        tags={
+            DURATION_TAG: str(len(segment)),
+            LOUDNESS_TAG: f"{loudness:.1f}",
+        },
+    )
+    return output.getvalue()
+
+def _ogg_packets(data):
+    """Yield the packets of an Ogg stream in order"""
+    offset = 0
+    packet = b""
+    while offset + 27 <= len(data) and data[offset:offset + 4] == b"OggS":
+        segment_count = data[offset + 26]
+        lacing = data[offset + 27:offset + 27 + segment_count]
+        body = offset + 27 + segment_count
+        for size in lacing:
+            packet += data[body:body + size]
+            body += size
+            if size < 255:
+                yield packet
+                packet = b""
+        offset = body
+
+def read_clip_info(data):
+    """Read the duration and loudness recorded in a clip's header
+
+    Only the first pages are parsed; nothing is decoded.
+
+    Args:
+        data (bytes): Start of an Ogg/Opus file (the first few KB are enough)
+
+    Returns:
+        dict: {'duration': seconds, 'loudness': dBFS}, with None for any
+        value the header does not have; None if this is not an Ogg/Opus clip
+    """
+    packets = _ogg_packets(data)
+    head = next(packets, b"")
+    tags = next(packets, b"")
+    if not head.startswith(b"OpusHead") or not tags.startswith(b"OpusTags"):
+        return None
+
+    comments = {}
+    try:
+        vendor_length, = struct.unpack_from("<I", tags, 8)
+        position = 12 + vendor_length
+        count, = struct.unpack_from("<I", tags, position)
+        position += 4
+        for _ in range(count):
+            length, = struct.unpack_from("<I", tags, position)
+            position += 4
+            key, _, value = tags[position:position + length].decode("utf-8", "replace").partition("=")
+            comments[key.upper()] = value
+            position += length
+    except struct.error:
+        pass
+
+    info = {"duration": None, "loudness": None}
+    try:
+        info["duration"] = int(comments[DURATION_TAG]) / 1000
+    except (KeyError, ValueError):
+        pass
+    try:
+        info["loudness"] = float(comments[LOUDNESS_TAG])
+    except (KeyError, ValueError):
+        pass
+    return info
+
+def is_opus_file(path):
+    """Check whether a file is an Ogg/Opus clip"""
+    try:
+        with open(path, "rb") as f:
+            start = f.read(64)
+    except OSError:
+        return False
+    return start.startswith(b"OggS") and b"OpusHead" in start
+
+def clip_source(path, volume=None):
+    """Audio source for a stored clip
+
+    Ogg/Opus clips are passed through to Discord without decoding; anything
+    else (e.g. clips stored before the switch to Opus) is decoded to PCM.
+
+    Args:
+        path (str): Clip file
+        volume (float, optional): Volume for decoded clips; Opus clips are
+            already loudness-normalized and cannot be scaled without decoding
+    """
+    if is_opus_file(path):
+        return discord.FFmpegOpusAudio(path, codec="copy")
+    source = discord.FFmpegPCMAudio(path)
+    if volume is not None:
+        source = discord.PCMVolumeTransformer(source, volume=volume)
+    return source
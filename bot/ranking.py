@@ -0,0 +1,203 @@
+import random
+
+from bot import async_database
+
+class _Node:
+    """Skiplist node; width[i] is how many level-0 steps link i skips"""
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, levels):
+        self.key = key
+        self.next = [None] * levels
+        self.width = [1] * levels
+
+class IndexableSkiplist:
+    """Sorted skiplist with O(log n) insert, remove, rank and select
+
+    Keys must be unique and orderable. Each link also stores how many
+    elements it jumps over, which is what makes positional lookups
+    logarithmic instead of linear.
+    """
+
+    MAX_LEVELS = 32
+
+    def __init__(self):
+        self.head = _Node(None, self.MAX_LEVELS)
+        self.levels = 1
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _random_level(self):
+        level = 1
+        while level < self.MAX_LEVELS and random.random() < 0.5:
+            level += 1
+        return level
+
+    def insert(self, key):
+        """Insert a key that is not already present"""
+        update = [self.head] * self.MAX_LEVELS
+        steps = [0] * self.MAX_LEVELS  # Position of update[i] from the front
+        node = self.head
+        position = 0
+        for i in range(self.levels - 1, -1, -1):
+            while node.next[i] is not None and node.next[i].key < key:
+                position += node.width[i]
+                node = node.next[i]
+            update[i] = node
+            steps[i] = position
+
+        level = self._random_level()
+        if level > self.levels:
+            for i in range(self.levels, level):
+                update[i] = self.head
+                steps[i] = 0
+                self.head.width[i] = self.size + 1
+            self.levels = level
+
+        new_node = _Node(key, level)
+        for i in range(level):
+            prev = update[i]
+            skipped = position - steps[i]  # Elements between prev and the new node
+            new_node.next[i] = prev.next[i]
+            new_node.width[i] = prev.width[i] - skipped
+            prev.next[i] = new_node
+            prev.width[i] = skipped + 1
+        for i in range(level, self.levels):
+            update[i].width[i] += 1
+        self.size += 1
+
+    def remove(self, key):
+        """Remove a key; does nothing if it is not present"""
+        update = [self.head] * self.MAX_LEVELS
+        node = self.head
+        for i in range(self.levels - 1, -1, -1):
+            while node.next[i] is not None and node.next[i].key < key:
+                node = node.next[i]
+            update[i] = node
+
+        target = node.next[0]
+        if target is None or target.key != key:
+            return
+        for i in range(self.levels):
+            prev = update[i]
+            if prev.next[i] is target:
+                prev.next[i] = target.next[i]
+                prev.width[i] += target.width[i] - 1
+            else:
+                prev.width[i] -= 1
+        while self.levels > 1 and self.head.next[self.levels - 1] is None:
+            self.head.width[self.levels - 1] = 1
+            self.levels -= 1
+        self.size -= 1
+
+    def rank(self, key):
+        """1-based position of a key, or None if it is not present"""
+        node = self.head
+        position = 0
+        for i in range(self.levels - 1, -1, -1):
+            while node.next[i] is not None and node.next[i].key <= key:
+                position += node.width[i]
+                node = node.next[i]
+        if node is not self.head and node.key == key:
+            return position
+        return None
+
+    def first(self, count):
+        """The first `count` keys in order"""
+        keys = []
+        node = self.head.next[0]
+        while node is not None and len(keys) < count:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+    def clear(self):
+        """Remove every key"""
+        self.head = _Node(None, self.MAX_LEVELS)
+        self.levels = 1
+        self.size = 0
+
+class RankingService:
+    """Maintained wealth ranking shared by g!leaderboard and g!view
+
+    Users are ordered by coins (highest first), then by user ID so that every
+    user has a distinct rank. The index is rebuilt from the users table on
+    startup and then kept current by calling update() whenever a balance
+    changes.
+    """
+
+    def __init__(self, watch_top=20):
+        self._index = IndexableSkiplist()
+        self._keys = {}  # user_id: key currently stored in the index
+        self.ready = False
+        # Bumped whenever a change enters, leaves or moves within the top `watch_top`
+        self.watch_top = watch_top
+        self.top_version = 0
+        self._rebuilding = None  # Updates seen while a rebuild is in flight
+
+    @staticmethod
+    def _key(user_id, coins):
+        return (-coins, user_id)
+
+    def update(self, user_id, coins):
+        """Record a user's new balance"""
+        if coins is None:
+            return
+        if self._rebuilding is not None:
+            self._rebuilding[user_id] = coins
+        key = self._key(user_id, coins)
+        old_key = self._keys.get(user_id)
+        if old_key == key:
+            return
+        touches_top = old_key is not None and self._index.rank(old_key) <= self.watch_top
+        if old_key is not None:
+            self._index.remove(old_key)
+        self._index.insert(key)
+        self._keys[user_id] = key
+        if touches_top or self._index.rank(key) <= self.watch_top:
+            self.top_version += 1
+
+    def rank(self, user_id):
+        """1-based rank of a user, or None if the user has no balance yet"""
+        key = self._keys.get(user_id)
+        if key is None:
+            return None
+        return self._index.rank(key)
+
+    def top(self, count):
+        """The richest `count` users as (user_id, coins) pairs"""
+        return [(user_id, -neg_coins) for neg_coins, user_id in self._index.first(count)]
+
+    def __len__(self):
+        return len(self._index)
+
+    async def rebuild(self, overrides=None):
+        """Reload the whole ranking from the database
+
+        Args:
+            overrides (dict, optional): user_id: balance values that are newer
+                than the database, such as unflushed cached balances
+        """
+        self._rebuilding = {}
+        try:
+            rows = await async_database.get_all_balances()
+        except Exception:
+            self._rebuilding = None
+            raise
+
+        # Anything that changed while we were reading wins over the snapshot
+        newer = dict(overrides or {})
+        newer.update(self._rebuilding)
+        self._rebuilding = None
+
+        self._index.clear()
+        self._keys.clear()
+        for user_id, coins in rows:
+            self.update(user_id, newer.pop(user_id, coins))
+        for user_id, coins in newer.items():
+            self.update(user_id, coins)
+        self.top_version += 1
+        self.ready = True
+        print(f"✅ Ranking index built with {len(self)} users")
@@ -0,0 +1,95 @@
+import time
+
+from bot.config import Config
+
+class TokenBucket:
+    """Token bucket holding up to `capacity` tokens, refilled continuously"""
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens, updated):
+        self.tokens = tokens
+        self.updated = updated
+
+class RateLimiter:
+    """In-memory rate limiting for every user and command
+
+    Each (scope, user_id) pair gets its own token bucket, so checking a user
+    is O(1) no matter how many messages they have sent. A scope is usually a
+    command name; several commands can share one scope to share one limit.
+    Buckets that have refilled completely carry no state and are evicted.
+    """
+
+    def __init__(self, limits=None, default_limit=None, sweep_interval=300):
+        # scope: (messages, period_seconds)
+        self.limits = dict(limits if limits is not None else Config.RATE_LIMITS)
+        self.default_limit = default_limit or (Config.RATE_LIMIT_MESSAGES, Config.RATE_LIMIT_PERIOD)
+        self.sweep_interval = sweep_interval
+        self._buckets = {}  # (scope, user_id): TokenBucket
+        self._last_sweep = time.monotonic()
+
+    def _refill(self, bucket, scope, now):
+        capacity, period = self.limits.get(scope, self.default_limit)
+        bucket.tokens = min(capacity, bucket.tokens + (now - bucket.updated) * capacity / period)
+        bucket.updated = now
+        return capacity
+
+    def hit(self, user_id, scope="chat"):
+        """Use up one token for a user
+
+        Returns:
+            bool: True if the action is allowed, False if the user is rate limited
+        """
+        now = time.monotonic()
+        if now - self._last_sweep > self.sweep_interval:
+            self.sweep(now)
+
+        key = (scope, user_id)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            capacity, _ = self.limits.get(scope, self.default_limit)
+            bucket = self._buckets[key] = TokenBucket(capacity, now)
+        else:
+            self._refill(bucket, scope, now)
+
+        if bucket.tokens < 1:
+            return False
+        bucket.tokens -= 1
+        return True
+
+    def is_limited(self, user_id, scope="chat"):
+        """Check whether a user is out of tokens without using one"""
+        bucket = self._buckets.get((scope, user_id))
+        if bucket is None:
+            return False
+        self._refill(bucket, scope, time.monotonic())
+        return bucket.tokens < 1
+
+    def sweep(self, now=None):
+        """Drop buckets that have refilled completely (they hold no state)"""
+        now = now if now is not None else time.monotonic()
+        for key, bucket in list(self._buckets.items()):
+            scope = key[0]
+            if self._refill(bucket, scope, now) <= bucket.tokens:
+                del self._buckets[key]
+        self._last_sweep = now
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def snapshot(self):
+        """Export partially used buckets with wall-clock timestamps
+
+        Returns:
+            list: (scope, user_id, tokens, updated_epoch) tuples
+        """
+        self.sweep()
+        offset = time.time() - time.monotonic()
+        return [(scope, user_id, bucket.tokens, bucket.updated + offset)
+                for (scope, user_id), bucket in self._buckets.items()]
+
+    def restore(self, rows):
+        """Load buckets exported by snapshot(), e.g. after a restart"""
+        offset = time.time() - time.monotonic()
+        for scope, user_id, tokens, updated_epoch in rows:
+            self._buckets[(scope, user_id)] = TokenBucket(tokens, updated_epoch - offset)
+        self.sweep()
@@ -0,0 +1,78 @@
+import time
+from collections import deque
+
+from bot.config import Config
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a model whose circuit breaker is open"""
+
+class CircuitBreaker:
+    """Stops calling a failing model for a while so requests fail fast
+
+    After `failure_threshold` failures in a row the breaker opens and every
+    call is refused for `reset_timeout` seconds. Then it lets a single probe
+    through (half open): success closes it again, failure reopens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=None, reset_timeout=None):
+        self.failure_threshold = failure_threshold or Config.LLM_BREAKER_FAILURES
+        self.reset_timeout = reset_timeout or Config.LLM_BREAKER_RESET
+        self.state = self.CLOSED
+        self.failures = 0  # Consecutive failures
+        self.opened_at = None
+        self.times_opened = 0
+        self._probing = False
+
+    def allow(self):
+        """Whether a call may go ahead now (claims the probe when half open)"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+                print(f"⚠️ LLM circuit opened after {self.failures} failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """Give back a probe that ended without a result (e.g. it was cancelled)"""
+        self._probing = False
+
+class LatencyTracker:
+    """Keeps recent call latencies to answer percentile queries"""
+
+    def __init__(self, samples=None):
+        self._samples = deque(maxlen=samples or Config.LLM_LATENCY_SAMPLES)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def record(self, seconds):
+        self._samples.append(seconds)
+
+    def percentile(self, p):
+        """The p (0-1) latency percentile, or None with no samples"""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+import json
+import re
+
+from bot.cache import TTLCache
+from bot.config import Config
+
+class ResponseCache:
+    """Caches AI replies and shares identical requests that are in flight
+
+    Requests are keyed on a hash of the model and the normalized messages
+    (system prompt included), so the same prompt over the same recent
+    history gets the same reply for a while. While a reply is being
+    generated, identical requests wait on it instead of calling the API
+    again. Failed requests are never cached.
+    """
+
+    def __init__(self, maxsize=None, ttl=None):
+        self._cache = TTLCache(maxsize=maxsize or Config.RESPONSE_CACHE_SIZE,
+                               ttl=ttl or Config.RESPONSE_CACHE_TTL)
+        self._inflight = {}  # key: future resolved with the reply
+        self.coalesced = 0
+
+    @staticmethod
+    def key(model, messages):
+        """Hash of the model and messages, ignoring case and extra whitespace"""
+        normalized = [(m["role"], re.sub(r"\s+", " ", m["content"]).strip().lower()) for m in messages]
+        return hashlib.sha256(json.dumps([model, normalized]).encode()).hexdigest()
+
+    def lookup(self, key):
+        """A cached reply, or None"""
+        return self._cache.get(key)
+
+    def inflight(self, key):
+        """The future of an identical request being generated, or None"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        return future
+
+    def begin(self, key):
+        """Register a request that is about to be generated"""
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        return future
+
+    def complete(self, key, reply, cache=True):
+        """Cache a finished reply and hand it to any waiting requests
+
+        Args:
+            cache (bool): False to only hand the reply to waiting requests
+        """
+        if cache:
+            self._cache.set(key, reply)
+        future = self._inflight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(reply)
+
+    def abandon(self, key, error):
+        """Fail the waiting requests without caching anything"""
+        future = self._inflight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_exception(error)
+            # Mark the exception retrieved in case nobody was waiting
+            future.exception()
+
+    async def get_or_create(self, key, factory, cacheable=None):
+        """Return the cached reply, join an identical request, or call factory()
+
+        Args:
+            key (str): From ResponseCache.key
+            factory (coroutine function): Generates the reply; exceptions
+                propagate to every caller sharing the request
+            cacheable (callable, optional): Called with the new reply; if it
+                returns False the reply is shared but not cached
+        """
+        reply = self.lookup(key)
+        if reply is not None:
+            return reply
+        pending = self.inflight(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        self.begin(key)
+        try:
+            reply = await factory()
+        except BaseException as e:
+            self.abandon(key, e if isinstance(e, Exception) else RuntimeError("Request cancelled"))
+            raise
+        self.complete(key, reply, cacheable is None or cacheable(reply))
+        return reply
+
+    def stats(self):
+        """Cache size, hit/miss counts, hit rate and coalesced requests"""
+        stats = self._cache.stats()
+        stats["coalesced"] = self.coalesced
+        stats["in_flight"] = len(self._inflight)
+        return stats
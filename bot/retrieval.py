@@ -0,0 +1,238 @@
+import asyncio
+import math
+import re
+import zlib
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from bot import async_database
+from bot.config import Config
+
+TOKEN_RE = re.compile(r"\w+")
+
+def hashed_features(text, dimensions):
+    """Hash a text's words and word pairs into (bucket indices, TF weights)
+
+    CRC32 is used instead of hash() so buckets are the same in every
+    process. Counts are damped with 1 + log(count) so one repeated word
+    does not dominate a turn, and each feature gets a hashed sign.
+    """
+    words = [word for word in TOKEN_RE.findall(text.lower()) if len(word) > 1]
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    counts = Counter(zlib.crc32(feature.encode()) for feature in features)
+    buckets = {}
+    for digest, count in counts.items():
+        # The top bit picks a sign so colliding features tend to cancel out
+        weight = 1 + math.log(count)
+        bucket = digest % dimensions
+        buckets[bucket] = buckets.get(bucket, 0.0) + (-weight if digest & 0x80000000 else weight)
+    indices = np.fromiter(buckets.keys(), dtype=np.int64, count=len(buckets))
+    weights = np.fromiter(buckets.values(), dtype=np.float32, count=len(buckets))
+    return indices, weights
+
+class ChannelIndex:
+    """Sparse hashed TF vectors of one channel's turns, oldest first
+
+    Rows are kept CSR-style: the buckets and weights of every turn are
+    appended to flat arrays that grow by doubling, with `owners` giving the
+    turn of each entry. A turn costs 12 bytes per word or word pair it
+    contains instead of a dense row of every bucket. Past max_turns the
+    oldest quarter is dropped. IDF weights come from the per-bucket
+    document counts and are applied at query time, so adding a turn never
+    rewrites other rows.
+    """
+
+    def __init__(self, dimensions, max_turns):
+        self.dimensions = dimensions
+        self.max_turns = max_turns
+        self.indices = np.zeros(256, dtype=np.int32)    # Bucket of every entry
+        self.weights = np.zeros(256, dtype=np.float32)  # TF weight of every entry
+        self.owners = np.zeros(256, dtype=np.int32)     # Row of every entry, ascending
+        self.nnz = 0  # Entries in use
+        self.norms = np.zeros(max_turns, dtype=np.float32)  # IDF-weighted row norms
+        self.doc_freq = np.zeros(dimensions, dtype=np.float32)
+        self.turns = []  # {"is_user", "content"}, one per row
+        self._norms_size = 0  # Turn count when every norm was last recomputed
+
+    def __len__(self):
+        return len(self.turns)
+
+    def idf(self):
+        """Smoothed inverse document frequency of every bucket"""
+        return np.log((1 + len(self.turns)) / (1 + self.doc_freq)) + 1
+
+    def _make_room(self, entries):
+        size = len(self.turns)
+        if size >= self.max_turns:
+            drop = max(1, size // 4)
+            cut = int(np.searchsorted(self.owners[:self.nnz], drop))
+            self.doc_freq -= np.bincount(self.indices[:cut], minlength=self.dimensions)
+            kept = self.nnz - cut
+            self.indices[:kept] = self.indices[cut:self.nnz]
+            self.weights[:kept] = self.weights[cut:self.nnz]
+            self.owners[:kept] = self.owners[cut:self.nnz] - drop
+            self.nnz = kept
+            self.norms[:size - drop] = self.norms[drop:size]
+            del self.turns[:drop]
+            self._norms_size = min(self._norms_size, len(self.turns))
+
+        if self.nnz + entries > len(self.indices):
+            capacity = max(len(self.indices) * 2, self.nnz + entries)
+            for name in ("indices", "weights", "owners"):
+                old = getattr(self, name)
+                grown = np.zeros(capacity, dtype=old.dtype)
+                grown[:self.nnz] = old[:self.nnz]
+                setattr(self, name, grown)
+
+    def add(self, is_user, content):
+        """Append a turn"""
+        indices, weights = hashed_features(content, self.dimensions)
+        # Buckets whose signed features cancelled out carry nothing
+        keep = weights != 0
+        indices, weights = indices[keep], weights[keep]
+        self._make_room(len(indices))
+        row = len(self.turns)
+        end = self.nnz + len(indices)
+        self.indices[self.nnz:end] = indices
+        self.weights[self.nnz:end] = weights
+        self.owners[self.nnz:end] = row
+        self.nnz = end
+        self.doc_freq[indices] += 1
+        self.turns.append({"is_user": is_user, "content": content})
+        self.norms[row] = np.linalg.norm(weights * self.idf()[indices])
+
+    def search(self, text, k, exclude_recent=0, min_score=0.0):
+        """Cosine top-k of the turns before the newest exclude_recent
+
+        Returns:
+            list: Matching turns, oldest first
+        """
+        candidates = len(self.turns) - exclude_recent
+        indices, weights = hashed_features(text, self.dimensions)
+        if candidates <= 0 or not len(indices):
+            return []
+
+        idf = self.idf()
+        size = len(self.turns)
+        # Norms drift as document counts change; refresh them all once the index has grown by a quarter
+        if size > self._norms_size * 1.25:
+            weighted = self.weights[:self.nnz] * idf[self.indices[:self.nnz]]
+            self.norms[:size] = np.sqrt(np.bincount(
+                self.owners[:self.nnz], weights=np.square(weighted), minlength=size))
+            self._norms_size = size
+
+        query = weights * idf[indices]
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return []
+        # Dense query over the buckets, so each stored entry is one lookup
+        dense = np.zeros(self.dimensions, dtype=np.float32)
+        np.add.at(dense, indices, query * idf[indices])
+        end = int(np.searchsorted(self.owners[:self.nnz], candidates))
+        scores = np.bincount(self.owners[:end],
+                             weights=self.weights[:end] * dense[self.indices[:end]],
+                             minlength=candidates)
+        scores /= np.maximum(self.norms[:candidates], 1e-6) * query_norm
+
+        k = min(k, candidates)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[scores[top] > min_score]
+        return [self.turns[i] for i in np.sort(top)]
+
+class RetrievalIndex:
+    """Local long-term memory over message_history
+
+    Each channel's stored turns are loaded once, vectorized with a hashing
+    TF-IDF scheme and kept in memory, so relevant older turns can be found
+    for a prompt without any network calls. Channels beyond
+    RETRIEVAL_MAX_CHANNELS are dropped least recently used first and
+    reloaded from the database when needed again.
+    """
+
+    def __init__(self, store=None, dimensions=None, max_turns=None, max_channels=None):
+        """
+        Args:
+            store (ConversationStore, optional): Turns it has not written
+                to the database yet are indexed on load too
+        """
+        self.store = store
+        self.dimensions = dimensions or Config.RETRIEVAL_DIMENSIONS
+        self.max_turns = max_turns or Config.RETRIEVAL_MAX_TURNS
+        self.max_channels = max_channels or Config.RETRIEVAL_MAX_CHANNELS
+        self._channels = OrderedDict()  # channel_id: ChannelIndex, least recently used first
+        self._loading = {}              # channel_id: in-flight load
+        self._arrived = {}              # channel_id: turns added while its load is building
+
+    def _build(self, turns):
+        index = ChannelIndex(self.dimensions, self.max_turns)
+        for turn in turns:
+            index.add(turn["is_user"], turn["content"])
+        return index
+
+    def _store(self, channel_id, index):
+        self._channels[channel_id] = index
+        self._channels.move_to_end(channel_id)
+        while len(self._channels) > self.max_channels:
+            self._channels.popitem(last=False)
+
+    async def ensure_loaded(self, channel_id):
+        """Index a channel's stored turns if they are not in memory"""
+        if channel_id in self._channels:
+            self._channels.move_to_end(channel_id)
+            return
+
+        load = self._loading.get(channel_id)
+        if load is None:
+            load = asyncio.ensure_future(self._load(channel_id))
+            self._loading[channel_id] = load
+
+            def done(_):
+                self._loading.pop(channel_id, None)
+                self._arrived.pop(channel_id, None)
+
+            load.add_done_callback(done)
+        try:
+            await load
+        except Exception as e:
+            print(f"❌ Failed to build retrieval index for channel {channel_id}: {e}")
+
+    async def _load(self, channel_id):
+        if self.store is not None:
+            turns = await self.store.load_with_unwritten(channel_id, self.max_turns)
+        else:
+            turns = await async_database.get_conversation_history(channel_id, self.max_turns)
+        # Turns added from here on are not in `turns`; collect them while building
+        arrived = self._arrived[channel_id] = []
+        loop = asyncio.get_running_loop()
+        index = await loop.run_in_executor(None, self._build, turns)
+        for turn in arrived:
+            index.add(turn["is_user"], turn["content"])
+        self._store(channel_id, index)
+
+    def add(self, channel_id, is_user, content):
+        """Index a new turn (ignored until the channel starts loading)"""
+        index = self._channels.get(channel_id)
+        if index is not None:
+            index.add(is_user, content)
+        elif channel_id in self._arrived:
+            self._arrived[channel_id].append({"is_user": is_user, "content": content})
+
+    def search(self, channel_id, text, k=None, exclude_recent=0):
+        """Older turns of a channel most relevant to text, oldest first
+
+        Args:
+            channel_id (int): Discord channel ID
+            text (str): Usually the newest user message
+            k (int, optional): Defaults to Config.RETRIEVAL_TOP_K
+            exclude_recent (int): Newest turns to skip, usually the ones
+                already in the prompt
+        """
+        index = self._channels.get(channel_id)
+        if index is None:
+            return []
+        return index.search(text, k or Config.RETRIEVAL_TOP_K, exclude_recent, Config.RETRIEVAL_MIN_SCORE)
+
+    def clear(self, channel_id):
+        """Forget a channel's turns (its stored history was deleted)"""
+        self._store(channel_id, ChannelIndex(self.dimensions, self.max_turns))
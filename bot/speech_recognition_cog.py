@@ -9,7 +9,10 @@ import subprocess
 import speech_recognition as sr
 from discord.ext import commands
 import edge_tts
-from pydub import AudioSegment
+
+from bot.cache import TTLCache
+from bot.opus_clip import encode_opus, clip_source
+from bot.llm_scheduler import PRIORITY_VOICE
 
 class SpeechRecognitionCog(commands.Cog):
     """Cog for handling speech recognition and voice interactions"""
@@ -27,6 +30,10 @@ class SpeechRecognitionCog(commands.Cog):
         # Make sure temp directory exists
         os.makedirs(self.temp_dir, exist_ok=True)
         
+        # Spoken clips are kept as Opus in EnhancedMusicCog's audio store, so
+        # repeated phrases replay without any encoding
+        self.clip_cache = TTLCache(maxsize=512, ttl=3600)  # (voice, message): clip hash
+        
         # Default voice settings
         self.default_voice = "en-US-GuyNeural"
         self.user_voice_prefs = {}  # user_id: "male" or "female"
@@ -42,6 +49,10 @@ class SpeechRecognitionCog(commands.Cog):
         
         print("✅ Speech Recognition Cog initialized with voice command support")
     
+    def forget_clips(self, digests):
+        """Drop cached clip hashes that were removed from the audio store"""
+        self.clip_cache.discard_values(digests)
+
     @commands.Cog.listener()
     async def on_ready(self):
         """Called when the cog is ready"""
@@ -149,17 +160,8 @@ class SpeechRecognitionCog(commands.Cog):
         else:
             await ctx.send("**LOKO KA BA?** I wasn't listening in any channel.")
     
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        """Listen for special speech recognition commands"""
-        # Skip messages from bots or non-guild messages
-        if message.author.bot or not message.guild:
-            return
-            
-        # Check if we're actively listening in this guild
-        if message.guild.id not in self.listening_guilds:
-            return
-        
+    async def handle_text_message(self, message):
+        """Handle a message typed in a guild where we are listening (routed here by MessageRouter)"""
         # SIMPLIFIED APPROACH - Direct processing of any message in channels where listening is active
         # This makes it much easier for users to interact
         
@@ -180,7 +182,7 @@ class SpeechRecognitionCog(commands.Cog):
         else:
             # Treat any message as a voice command when in listening mode
             command = message.content.strip()
-            if command and not command.startswith(self.bot.command_prefix):  # Skip actual bot commands
+            if command:  # Bot commands never reach here
                 await self.handle_voice_command(message.guild.id, message.author.id, command)
     
     async def handle_voice_command(self, guild_id, user_id, command):
@@ -300,7 +302,11 @@ class SpeechRecognitionCog(commands.Cog):
         # Get AI response
         try:
             print(f"🧠 Generating AI response for command: '{command}'")
-            response = await self.get_ai_response(conversation)
+            chat_cog = self.bot.get_cog("ChatCog")
+            use_cache = chat_cog.use_response_cache("voice") if chat_cog else True
+            # Voice requests jump ahead of queued text replies
+            response = await self.get_ai_response(
+                conversation, use_cache, guild_id=guild_id, priority=PRIORITY_VOICE)
             print(f"✅ AI response generated: '{response[:50]}...'")
             
             # No text channel logging - only speak the response
@@ -404,33 +410,36 @@ class SpeechRecognitionCog(commands.Cog):
                 # English voices
                 voice = "en-US-GuyNeural" if gender_preference == "m" else "en-US-JennyNeural"
             
-            # Generate TTS audio in memory
-            tts = edge_tts.Communicate(text=message, voice=voice, rate="+10%", volume="+30%")
-            
-            # Create buffer to hold audio data
-            audio_buffer = io.BytesIO()
-            
-            # Stream audio data directly to memory
-            async for audio_chunk in tts.stream():
-                if audio_chunk["type"] == "audio":
-                    audio_buffer.write(audio_chunk["data"])
-                    
-            # Reset buffer position for reading
-            audio_buffer.seek(0)
-            
-            # Create a pydub AudioSegment from the buffer
-            audio_segment = AudioSegment.from_file(audio_buffer, format="mp3")
-            
-            # Convert to WAV format with Discord-compatible settings
-            audio_segment = audio_segment.set_frame_rate(48000).set_channels(2)
-            
-            # Export to a new buffer as WAV
-            output_buffer = io.BytesIO()
-            audio_segment.export(output_buffer, format="wav")
-            output_buffer.seek(0)
-            
-            # Create custom audio source
-            source = discord.PCMAudio(output_buffer)
+            # One audio store is shared with EnhancedMusicCog, which also prunes it
+            music_cog = self.bot.get_cog("EnhancedMusicCog")
+            if music_cog is None:
+                raise RuntimeError("EnhancedMusicCog is not loaded, so there is no audio store")
+            audio_store = music_cog.audio_store
+            
+            # Reuse the stored clip if this exact message was spoken recently
+            digest = self.clip_cache.get((voice, message))
+            if digest is None or not audio_store.exists(digest):
+                # Generate TTS audio in memory
+                tts = edge_tts.Communicate(text=message, voice=voice, rate="+10%", volume="+30%")
+                
+                # Create buffer to hold audio data
+                audio_buffer = io.BytesIO()
+                
+                # Stream audio data directly to memory
+                async for audio_chunk in tts.stream():
+                    if audio_chunk["type"] == "audio":
+                        audio_buffer.write(audio_chunk["data"])
+                
+                # Encode to Opus once, off the event loop, and keep it in the audio store
+                loop = asyncio.get_running_loop()
+                opus_data = await loop.run_in_executor(None, encode_opus, audio_buffer.getvalue())
+                digest = await loop.run_in_executor(None, audio_store.put, opus_data)
+                self.clip_cache.set((voice, message), digest)
+                # Eviction goes through the music cog, which also drops the clips' rows
+                music_cog.schedule_prune()
+            
+            # Opus passthrough: the clip goes to Discord without being decoded
+            source = clip_source(audio_store.path(digest))
             
             # Play the TTS message
             self.voice_clients[guild_id].play(
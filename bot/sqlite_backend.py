@@ -0,0 +1,520 @@
+import json
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytz
+
+from bot.config import Config
+
+# Embedded storage backend with the same functions as bot.database, for
+# single-process deployments and offline runs (DB_BACKEND=sqlite). Every
+# executor thread keeps its own connection; sqlite3 caches each connection's
+# prepared statements, so the constant SQL below is only compiled once.
+
+SCHEMA_VERSION = 5  # Matches the last Postgres migration
+
+_connections = {}  # thread ident: connection
+_connections_lock = threading.Lock()
+
+class DatabaseUnavailable(Exception):
+    """Raised when the database file could not be opened or stayed locked
+
+    The transaction was rolled back, so callers can safely retry.
+    """
+
+def _to_datetime(value):
+    return datetime.fromisoformat(value.decode())
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("TIMESTAMP", _to_datetime)
+sqlite3.register_converter("BOOLEAN", lambda value: value not in (b"0", b""))
+
+def _connect():
+    """Open a connection for the calling thread"""
+    try:
+        conn = sqlite3.connect(
+            Config.SQLITE_PATH,
+            timeout=Config.DB_QUERY_TIMEOUT,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            isolation_level=None,  # Transactions are started explicitly in get_connection
+            check_same_thread=False,
+            cached_statements=256,
+        )
+    except sqlite3.OperationalError as e:
+        raise DatabaseUnavailable(str(e)) from e
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA busy_timeout = {int(Config.DB_QUERY_TIMEOUT * 1000)}")
+    return conn
+
+def _thread_connection():
+    ident = threading.get_ident()
+    conn = _connections.get(ident)
+    if conn is None:
+        conn = _connect()
+        with _connections_lock:
+            _connections[ident] = conn
+    return conn
+
+@contextmanager
+def get_connection(immediate=False):
+    """Run a block in one transaction on this thread's connection
+
+    Commits when the block finishes and rolls back if it raises.
+
+    Args:
+        immediate (bool): Take the write lock up front, for read-then-write blocks
+    """
+    conn = _thread_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        yield conn
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        if conn.in_transaction:
+            conn.rollback()
+        if "locked" in str(e) or "unable to open" in str(e):
+            raise DatabaseUnavailable(str(e)) from e
+        raise
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+
+def close_pool():
+    """Close every thread's connection (called on shutdown)"""
+    with _connections_lock:
+        for conn in _connections.values():
+            conn.close()
+        _connections.clear()
+
+def init_db():
+    """Initialize the database with required tables and indexes"""
+    with get_connection() as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY,
+                coins INTEGER DEFAULT 50000,
+                last_daily TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS message_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel_id INTEGER,
+                is_user BOOLEAN,
+                content TEXT,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                scope TEXT,
+                user_id INTEGER,
+                tokens REAL,
+                updated_epoch REAL,
+                PRIMARY KEY (scope, user_id)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS blackjack_games (
+                user_id INTEGER PRIMARY KEY,
+                player_hand TEXT,
+                dealer_hand TEXT,
+                bet INTEGER,
+                game_state TEXT,
+                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS audio_tts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                message TEXT,
+                content_hash TEXT,
+                size_bytes INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_message_history_channel_time "
+                     "ON message_history (channel_id, timestamp DESC, id DESC)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_users_coins ON users (coins DESC, user_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_audio_tts_created_at ON audio_tts (created_at DESC)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_audio_tts_content_hash ON audio_tts (content_hash)")
+    print(f"✅ SQLite database initialized at {Config.SQLITE_PATH}")
+
+def init_audio_tts_table():
+    """Kept for API compatibility; init_db already creates audio_tts"""
+    init_db()
+
+def run_migrations():
+    """Record the schema version; init_db already creates the current schema
+
+    Returns:
+        int: The schema version
+    """
+    conn = _thread_connection()
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    print(f"✅ Database schema at version {SCHEMA_VERSION}")
+    return SCHEMA_VERSION
+
+# Queries on the hot path, with sample parameters, that must be served by an index
+HOT_QUERIES = {
+    "conversation_history": (
+        "SELECT is_user, content FROM message_history "
+        "WHERE channel_id = ? ORDER BY timestamp DESC, id DESC LIMIT ?",
+        (0, 10)
+    ),
+    "leaderboard": (
+        "SELECT user_id, coins FROM users ORDER BY coins DESC, user_id LIMIT ?",
+        (20,)
+    ),
+    "latest_audio_tts": (
+        "SELECT id, message FROM audio_tts ORDER BY created_at DESC LIMIT 1",
+        ()
+    ),
+}
+
+def check_hot_query_indexes():
+    """EXPLAIN QUERY PLAN each hot query and report which index it uses
+
+    Returns:
+        dict: query name -> list of index names (empty means a full scan)
+    """
+    results = {}
+    with get_connection() as conn:
+        for name, (query, params) in HOT_QUERIES.items():
+            details = [row["detail"] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+            results[name] = [match for detail in details
+                             for match in re.findall(r"USING (?:COVERING )?INDEX (\w+)", detail)]
+
+    for name, indexes in results.items():
+        if indexes:
+            print(f"✅ {name} uses index {', '.join(indexes)}")
+        else:
+            print(f"⚠️ {name} does a full table scan")
+    return results
+
+# User Balance Functions
+def get_user_balance(user_id):
+    """Get user's balance, creating the user if needed"""
+    with get_connection() as conn:
+        row = conn.execute("SELECT coins FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        if row:
+            return row[0]
+        conn.execute("INSERT INTO users (user_id, coins) VALUES (?, 50000) "
+                     "ON CONFLICT (user_id) DO NOTHING", (user_id,))
+        return 50000
+
+def add_coins(user_id, amount):
+    """Add coins to user's balance"""
+    with get_connection() as conn:
+        row = conn.execute(
+            "INSERT INTO users (user_id, coins) VALUES (?, 50000 + ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET coins = coins + ?, updated_at = CURRENT_TIMESTAMP "
+            "RETURNING coins",
+            (user_id, amount, amount)
+        ).fetchone()
+        return row[0]
+
+def deduct_coins(user_id, amount):
+    """Deduct coins from user's balance"""
+    with get_connection() as conn:
+        conn.execute("INSERT INTO users (user_id, coins) VALUES (?, 50000) "
+                     "ON CONFLICT (user_id) DO NOTHING", (user_id,))
+        row = conn.execute(
+            "UPDATE users SET coins = coins - ?, updated_at = CURRENT_TIMESTAMP "
+            "WHERE user_id = ? AND coins >= ? RETURNING coins",
+            (amount, user_id, amount)
+        ).fetchone()
+        return row[0] if row else None  # None means insufficient funds
+
+def transfer_coins(from_user_id, to_user_id, amount):
+    """Move coins between two users atomically
+
+    Returns:
+        tuple: (sender_balance, receiver_balance) after the transfer, or
+        (sender_balance, None) if the sender has insufficient funds
+    """
+    with get_connection(immediate=True) as conn:
+        conn.executemany("INSERT INTO users (user_id, coins) VALUES (?, 50000) "
+                         "ON CONFLICT (user_id) DO NOTHING", [(from_user_id,), (to_user_id,)])
+        debit = conn.execute(
+            "UPDATE users SET coins = coins - ?, updated_at = CURRENT_TIMESTAMP "
+            "WHERE user_id = ? AND coins >= ? RETURNING coins",
+            (amount, from_user_id, amount)
+        ).fetchone()
+        if debit is None:
+            sender = conn.execute("SELECT coins FROM users WHERE user_id = ?", (from_user_id,)).fetchone()
+            return sender[0], None
+        credit = conn.execute(
+            "UPDATE users SET coins = coins + ?, updated_at = CURRENT_TIMESTAMP "
+            "WHERE user_id = ? RETURNING coins",
+            (amount, to_user_id)
+        ).fetchone()
+        return debit[0], credit[0]
+
+def settle_bet(user_id, stake, payout):
+    """Take a stake and pay out winnings in a single update
+
+    Returns:
+        int: The new balance, or None if the user cannot cover the stake
+    """
+    with get_connection() as conn:
+        conn.execute("INSERT INTO users (user_id, coins) VALUES (?, 50000) "
+                     "ON CONFLICT (user_id) DO NOTHING", (user_id,))
+        row = conn.execute(
+            "UPDATE users SET coins = coins - ? + ?, updated_at = CURRENT_TIMESTAMP "
+            "WHERE user_id = ? AND coins >= ? RETURNING coins",
+            (stake, payout, user_id, stake)
+        ).fetchone()
+        return row[0] if row else None
+
+def claim_daily(user_id, amount, cooldown_seconds):
+    """Pay the daily reward if the cooldown has passed
+
+    Returns:
+        tuple: (new_balance, 0) when claimed, or (None, seconds_remaining)
+    """
+    with get_connection(immediate=True) as conn:
+        conn.execute("INSERT INTO users (user_id, coins) VALUES (?, 50000) "
+                     "ON CONFLICT (user_id) DO NOTHING", (user_id,))
+        row = conn.execute(
+            "UPDATE users SET coins = coins + ?, last_daily = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP "
+            "WHERE user_id = ? AND (last_daily IS NULL "
+            "  OR julianday(last_daily) <= julianday('now') - ? / 86400.0) "
+            "RETURNING coins",
+            (amount, user_id, cooldown_seconds)
+        ).fetchone()
+        if row:
+            return row[0], 0
+        remaining = conn.execute(
+            "SELECT (julianday(last_daily) - julianday('now')) * 86400 + ? FROM users WHERE user_id = ?",
+            (cooldown_seconds, user_id)
+        ).fetchone()[0]
+        return None, max(0, int(remaining))
+
+def apply_balance_deltas(deltas):
+    """Apply a batch of pending balance changes in one transaction
+
+    Args:
+        deltas (list): (user_id, delta) pairs, at most one per user
+    """
+    if not deltas:
+        return
+    with get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO users (user_id, coins) VALUES (?, 50000 + ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET coins = coins + excluded.coins - 50000, "
+            "updated_at = CURRENT_TIMESTAMP",
+            deltas
+        )
+
+def update_daily_cooldown(user_id):
+    """Update user's daily claim timestamp"""
+    current_time = datetime.now(pytz.timezone('Asia/Manila'))
+    with get_connection() as conn:
+        conn.execute("UPDATE users SET last_daily = ?, updated_at = CURRENT_TIMESTAMP "
+                     "WHERE user_id = ?", (current_time, user_id))
+
+def get_daily_cooldown(user_id):
+    """Get user's last daily claim timestamp"""
+    with get_connection() as conn:
+        row = conn.execute("SELECT last_daily FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else None
+
+# Rate Limiting Functions
+def save_rate_limit_snapshot(rows):
+    """Replace the stored rate limiter state"""
+    with get_connection() as conn:
+        conn.execute("DELETE FROM rate_limit_buckets")
+        conn.executemany("INSERT INTO rate_limit_buckets (scope, user_id, tokens, updated_epoch) "
+                         "VALUES (?, ?, ?, ?)", rows)
+
+def load_rate_limit_snapshot():
+    """Get the stored rate limiter state"""
+    with get_connection() as conn:
+        return [tuple(row) for row in
+                conn.execute("SELECT scope, user_id, tokens, updated_epoch FROM rate_limit_buckets")]
+
+# Conversation History Functions
+def add_to_conversation(channel_id, is_user, content):
+    """Add a message to the conversation history"""
+    add_conversation_batch([(channel_id, is_user, content)])
+
+def add_conversation_batch(rows):
+    """Write many conversation turns in one transaction, in order"""
+    if not rows:
+        return
+    with get_connection() as conn:
+        conn.executemany("INSERT INTO message_history (channel_id, is_user, content) VALUES (?, ?, ?)", rows)
+
+def get_conversation_history(channel_id, limit=10):
+    """Get recent conversation history for a channel (oldest first)"""
+    with get_connection() as conn:
+        rows = conn.execute(
+            "SELECT is_user, content FROM message_history "
+            "WHERE channel_id = ? ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (channel_id, limit)
+        ).fetchall()
+        return list(reversed(rows))
+
+def clear_conversation_history(channel_id):
+    """Clear conversation history for a channel"""
+    with get_connection() as conn:
+        conn.execute("DELETE FROM message_history WHERE channel_id = ?", (channel_id,))
+
+# Blackjack Game Functions
+def save_blackjack_game(user_id, player_hand, dealer_hand, bet, game_state):
+    """Save blackjack game state"""
+    with get_connection() as conn:
+        conn.execute(
+            "INSERT INTO blackjack_games (user_id, player_hand, dealer_hand, bet, game_state) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET player_hand = excluded.player_hand, "
+            "dealer_hand = excluded.dealer_hand, bet = excluded.bet, "
+            "game_state = excluded.game_state, last_updated = CURRENT_TIMESTAMP",
+            (user_id, player_hand, dealer_hand, bet, game_state)
+        )
+
+def get_blackjack_game(user_id):
+    """Get blackjack game state"""
+    with get_connection() as conn:
+        return conn.execute(
+            "SELECT player_hand, dealer_hand, bet, game_state FROM blackjack_games WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()
+
+def delete_blackjack_game(user_id):
+    """Delete blackjack game state"""
+    with get_connection() as conn:
+        conn.execute("DELETE FROM blackjack_games WHERE user_id = ?", (user_id,))
+
+# Leaderboard Functions
+def get_leaderboard(limit=10):
+    """Get top users by balance"""
+    with get_connection() as conn:
+        return [tuple(row) for row in conn.execute(
+            "SELECT user_id, coins FROM users ORDER BY coins DESC, user_id LIMIT ?", (limit,))]
+
+def get_balances(user_ids):
+    """Get the stored balances of several users without creating any rows
+
+    Returns:
+        dict: user_id: coins for the users that exist
+    """
+    with get_connection() as conn:
+        return dict(conn.execute(
+            "SELECT user_id, coins FROM users WHERE user_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(user_ids)),)
+        ).fetchall())
+
+def get_all_balances():
+    """Get every user's balance (used to build the in-memory ranking)"""
+    with get_connection() as conn:
+        return [tuple(row) for row in conn.execute("SELECT user_id, coins FROM users")]
+
+# User Profile/Stats Functions
+def get_user_stats(user_id):
+    """Get balance, rank and blackjack state in one query"""
+    with get_connection() as conn:
+        coins, created_at, last_daily, rank, game_state, bet = conn.execute(
+            """
+            SELECT u.coins, u.created_at, u.last_daily,
+                CASE WHEN u.user_id IS NULL THEN NULL ELSE (
+                    SELECT COUNT(*) + 1 FROM users r
+                    WHERE r.coins > u.coins OR (r.coins = u.coins AND r.user_id < u.user_id)
+                ) END,
+                b.game_state, b.bet
+            FROM (SELECT ? AS user_id) AS q
+            LEFT JOIN users u ON u.user_id = q.user_id
+            LEFT JOIN blackjack_games b ON b.user_id = q.user_id
+            """,
+            (user_id,)
+        ).fetchone()
+
+    stats = {
+        'balance': coins if coins is not None else 50000,
+        'join_date': created_at,
+        'last_daily': last_daily,
+        'rank': rank if rank is not None else "Unranked",
+        'has_active_game': game_state is not None,
+    }
+    if game_state is not None:
+        stats['game_state'] = game_state
+        stats['current_bet'] = bet
+    return stats
+
+# Audio TTS Functions
+def store_audio_tts(user_id, message, content_hash, size_bytes):
+    """Record a TTS clip that has been saved to the AudioStore
+
+    Returns:
+        int: The ID of the stored audio
+    """
+    with get_connection() as conn:
+        return conn.execute(
+            "INSERT INTO audio_tts (user_id, message, content_hash, size_bytes) "
+            "VALUES (?, ?, ?, ?) RETURNING id",
+            (user_id, message, content_hash, size_bytes)
+        ).fetchone()[0]
+
+def get_latest_audio_tts():
+    """Get the most recent TTS clip as (id, content_hash, message), or None"""
+    with get_connection() as conn:
+        # CURRENT_TIMESTAMP has one-second resolution, so break ties by id
+        row = conn.execute("SELECT id, content_hash, message FROM audio_tts "
+                           "ORDER BY created_at DESC, id DESC LIMIT 1").fetchone()
+        return tuple(row) if row else None
+
+def get_audio_tts_by_id(audio_id):
+    """Get a TTS clip's hash by ID"""
+    with get_connection() as conn:
+        row = conn.execute("SELECT content_hash FROM audio_tts WHERE id = ?", (audio_id,)).fetchone()
+        return row[0] if row else None
+
+def cleanup_old_audio_tts(keep_count=10):
+    """Delete old TTS metadata, keeping only the most recent entries
+
+    Returns:
+        list: Hashes no longer referenced by any row, whose clips can be removed
+    """
+    with get_connection(immediate=True) as conn:
+        old = conn.execute(
+            "SELECT id, content_hash FROM audio_tts ORDER BY created_at DESC, id DESC LIMIT -1 OFFSET ?",
+            (keep_count,)
+        ).fetchall()
+        conn.executemany("DELETE FROM audio_tts WHERE id = ?", [(row["id"],) for row in old])
+        hashes = {row["content_hash"] for row in old if row["content_hash"]}
+        orphaned = [digest for digest in hashes if conn.execute(
+            "SELECT 1 FROM audio_tts WHERE content_hash = ? LIMIT 1", (digest,)).fetchone() is None]
+    print(f"✅ Cleaned up old TTS audio data, keeping {keep_count} recent entries")
+    return orphaned
+
+def referenced_audio_tts_hashes(content_hashes):
+    """Which of these clip hashes still have audio_tts rows
+
+    Returns:
+        set: The hashes that are still referenced
+    """
+    with get_connection() as conn:
+        return {digest for digest in content_hashes if conn.execute(
+            "SELECT 1 FROM audio_tts WHERE content_hash = ? LIMIT 1", (digest,)).fetchone() is not None}
+
+def delete_audio_tts_by_hash(content_hashes):
+    """Delete the metadata rows of clips evicted from the AudioStore
+
+    Returns:
+        int: Number of rows deleted
+    """
+    if not content_hashes:
+        return 0
+    with get_connection() as conn:
+        return conn.executemany("DELETE FROM audio_tts WHERE content_hash = ?",
+                                [(digest,) for digest in content_hashes]).rowcount
@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+from bot.config import Config
+
+# Discord rejects messages longer than this
+MAX_MESSAGE_LENGTH = 2000
+
+class EditThrottle:
+    """Spaces out message edits so each channel gets at most one per interval"""
+
+    def __init__(self, interval=None):
+        self.interval = interval if interval is not None else Config.STREAM_EDIT_INTERVAL
+        self._last_edit = {}  # channel_id: monotonic time of the last send or edit
+
+    def wait_time(self, channel_id):
+        """Seconds until the channel may be edited again (0 if it may be now)"""
+        last = self._last_edit.get(channel_id)
+        if last is None:
+            return 0
+        return max(0, self.interval - (time.monotonic() - last))
+
+    def mark(self, channel_id):
+        self._last_edit[channel_id] = time.monotonic()
+
+async def stream_to_channel(channel, chunks, throttle):
+    """Show a reply in a channel while it is still being generated
+
+    The first text is sent as a new message as soon as it arrives; later
+    text is coalesced into edits of that message, no more often than the
+    throttle allows. A final edit always shows the complete reply.
+
+    Args:
+        channel (Messageable): Where to send the reply
+        chunks (async iterator): Pieces of the reply text
+        throttle (EditThrottle): Shared per-channel edit limiter
+
+    Returns:
+        str: The complete reply text
+    """
+    text = ""
+    shown = ""
+    message = None
+    async for chunk in chunks:
+        text += chunk
+        if not text.strip():
+            continue
+        if message is None:
+            shown = text[:MAX_MESSAGE_LENGTH]
+            message = await channel.send(shown)
+            throttle.mark(channel.id)
+        elif throttle.wait_time(channel.id) == 0 and text[:MAX_MESSAGE_LENGTH] != shown:
+            shown = text[:MAX_MESSAGE_LENGTH]
+            await message.edit(content=shown)
+            throttle.mark(channel.id)
+
+    if message is None:
+        return text
+    if text[:MAX_MESSAGE_LENGTH] != shown:
+        await asyncio.sleep(throttle.wait_time(channel.id))
+        await message.edit(content=text[:MAX_MESSAGE_LENGTH])
+        throttle.mark(channel.id)
+    return text
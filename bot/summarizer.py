@@ -0,0 +1,90 @@
+import asyncio
+from collections import defaultdict
+
+from bot.config import Config
+from bot.llm_scheduler import PRIORITY_BACKGROUND
+
+SUMMARY_PROMPT = (
+    "You maintain a short running summary of a Discord conversation with Ginsilog Bot. "
+    "Update the summary with the new messages. Keep names, facts, requests and running jokes "
+    "that may matter later; drop greetings and filler. Write in the language the users use. "
+    "Reply with the updated summary only, at most {words} words."
+)
+
+class ConversationSummarizer:
+    """Folds turns that fall out of a channel's history into a running summary
+
+    Evicted turns are queued per channel and summarized in the background
+    once SUMMARY_BATCH_TURNS have built up, so no chat request ever waits on
+    a summary. Turns the token budget leaves out of a prompt are queued as
+    soon as that happens instead of when they leave the history. The
+    prompt then carries the summary plus the recent turns, which keeps
+    long-range memory without re-sending old messages. Summaries live in
+    memory only.
+    """
+
+    def __init__(self, llm):
+        self.llm = llm
+        self._summaries = {}               # channel_id: running summary
+        self._pending = defaultdict(list)  # channel_id: evicted turns not yet summarized
+        self._tasks = {}                   # channel_id: running summarization
+
+    def summary(self, channel_id):
+        """The channel's running summary, or None"""
+        return self._summaries.get(channel_id)
+
+    def add_evicted(self, channel_id, turn):
+        """Queue a turn that dropped out of the channel's history or prompt
+
+        A turn is queued once; it is marked with "summarized" so it is
+        skipped when it is trimmed again or finally leaves the history.
+        """
+        if turn.get("summarized"):
+            return
+        turn["summarized"] = True
+        pending = self._pending[channel_id]
+        pending.append(turn)
+        # If summarizing keeps failing, forget the oldest turns rather than grow forever
+        del pending[:-Config.SUMMARY_MAX_PENDING]
+        if len(pending) >= Config.SUMMARY_BATCH_TURNS:
+            task = self._tasks.get(channel_id)
+            if task is None or task.done():
+                self._tasks[channel_id] = asyncio.create_task(self._summarize(channel_id))
+
+    async def _summarize(self, channel_id):
+        """Fold queued turns into the channel's summary until the queue is short"""
+        while len(self._pending[channel_id]) >= Config.SUMMARY_BATCH_TURNS:
+            batch = self._pending.pop(channel_id)
+            transcript = "\n".join(
+                f"{'User' if turn['is_user'] else 'Bot'}: {turn['content']}" for turn in batch)
+            previous = self._summaries.get(channel_id) or "(none yet)"
+            messages = [
+                {"role": "system", "content": SUMMARY_PROMPT.format(words=Config.SUMMARY_MAX_WORDS)},
+                {"role": "user", "content": f"Current summary:\n{previous}\n\nNew messages:\n{transcript}"},
+            ]
+            try:
+                summary = await self.llm.complete(
+                    messages, max_tokens=Config.SUMMARY_MAX_TOKENS, temperature=0.2,
+                    channel_id=channel_id, priority=PRIORITY_BACKGROUND)
+            except Exception as e:
+                print(f"❌ Failed to summarize history for channel {channel_id}: {e}")
+                # Put the turns back in front of any newer ones for the next attempt
+                self._pending[channel_id][:0] = batch
+                return
+            self._summaries[channel_id] = summary.strip()
+
+    def clear(self, channel_id):
+        """Forget a channel's summary and queued turns"""
+        task = self._tasks.pop(channel_id, None)
+        if task is not None:
+            task.cancel()
+        self._pending.pop(channel_id, None)
+        self._summaries.pop(channel_id, None)
+
+    async def stop(self):
+        """Cancel any summaries still being generated"""
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -12,7 +12,8 @@ import threading
 import datetime
 import random
 import pytz  # For timezone support
-from bot.database import init_db, init_audio_tts_table
+from bot import async_database
+from bot.message_router import MessageRouter
 
 # Initialize bot with command prefix and remove default help command
 intents = discord.Intents.all()
@@ -20,6 +21,9 @@ bot = commands.Bot(command_prefix=Config.COMMAND_PREFIX,
                    intents=intents,
                    help_command=None)  # Removed default help command
 
+# Sends each message to exactly one handler (commands, mentions or voice text)
+router = MessageRouter(bot)
+
 # Global variables for tracking greetings
 last_morning_greeting_date = None
 last_night_greeting_date = None
@@ -32,8 +36,18 @@ async def on_ready():
     print('------')
 
     # Initialize the database and audio TTS table
-    init_db()
-    init_audio_tts_table()
+    await async_database.init_db()
+    await async_database.init_audio_tts_table()
+    try:
+        # A migration that fails is not recorded, so the next startup retries it
+        await async_database.run_migrations()
+    except Exception as e:
+        print(f"❌ Database migrations failed, running on the previous schema: {e}")
+    try:
+        # Confirm the hot queries are served by indexes (logged only)
+        await async_database.check_hot_query_indexes()
+    except Exception as e:
+        print(f"⚠️ Could not check query plans: {e}")
     
     # Ensure cogs are loaded in the correct order
     # Always load ChatCog first, since other cogs depend on it
@@ -117,6 +131,11 @@ async def on_ready():
     #         print(f"❌ Error sending welcome message: {e}")
     print("Welcome message disabled during maintenance")
 
+@bot.event
+async def on_message(message):
+    """Classify the message once and route it"""
+    await router.dispatch(message)
+
 @tasks.loop(minutes=1)
 async def check_greetings():
     """Check if it's time to send good morning or good night greetings"""
@@ -231,6 +250,9 @@ def main():
         bot.run(Config.DISCORD_TOKEN)
     except Exception as e:
         print(f"❌ Error running bot: {e}")
+    finally:
+        # Release pooled database connections
+        async_database.shutdown()
 
 if __name__ == "__main__":
     main()